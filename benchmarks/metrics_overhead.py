@@ -0,0 +1,88 @@
+"""
+Microbenchmark of the metrics updates Hurricane does for every request. Prints the overhead per request in
+nanoseconds, compared to updating the equivalent prometheus_client metrics directly.
+
+Usage: python benchmarks/metrics_overhead.py [iterations]
+"""
+import sys
+import time
+
+from django.conf import settings
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+from hurricane.metrics import (
+    PathCounterMetric,
+    RequestCounterMetric,
+    ResponseSizeMetric,
+    ResponseTimeAverageMetric,
+    ResponseTimeMetric,
+    RouteResponseSizeMetric,
+    RouteResponseTimeMetric,
+)
+
+ROUNDS = 5
+
+
+def hurricane_request():
+    RequestCounterMetric.increment()
+    ResponseTimeAverageMetric.add_value(1.5)
+    ResponseTimeMetric.observe(0.0015)
+    PathCounterMetric.increment("GET", "/")
+    ResponseSizeMetric.observe(512)
+    RouteResponseTimeMetric.observe_request(0.0015, "/", 200, "GET")
+    RouteResponseSizeMetric.observe_request(512, "/", 200, "GET")
+
+
+def make_prometheus_request():
+    registry = CollectorRegistry()
+    counter = Counter("request_counter", "", registry=registry)
+    average = Gauge("response_time_average", "", registry=registry)
+    response_time = Histogram("response_time_seconds", "", registry=registry)
+    path_counter = Counter("path_requests", "", ["method", "path"], registry=registry)
+    response_size = Histogram("response_size_bytes", "", registry=registry)
+    route_time = Histogram(
+        "route_response_time_seconds", "", ["route", "status"], registry=registry
+    )
+    route_size = Histogram(
+        "route_response_size_bytes", "", ["route", "status"], registry=registry
+    )
+
+    def prometheus_request():
+        counter.inc()
+        average.set(1.5)
+        response_time.observe(0.0015)
+        path_counter.labels("GET", "/").inc()
+        response_size.observe(512)
+        route_time.labels("/", "2xx").observe(0.0015)
+        route_size.labels("/", "2xx").observe(512)
+
+    return prometheus_request
+
+
+def measure(func, iterations):
+    """
+    Returns the best time per call in nanoseconds over several rounds.
+    """
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            func()
+        elapsed = (time.perf_counter_ns() - start) / iterations
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    if not settings.configured:
+        settings.configure()
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    baseline = measure(lambda: None, iterations)
+    hurricane = measure(hurricane_request, iterations) - baseline
+    prometheus = measure(make_prometheus_request(), iterations) - baseline
+    print(f"hurricane metrics:  {hurricane:8.0f} ns per request")
+    print(f"prometheus_client:  {prometheus:8.0f} ns per request")
+
+
+if __name__ == "__main__":
+    main()
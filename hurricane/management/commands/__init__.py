@@ -1,6 +1,21 @@
+import functools
 import importlib.metadata
 
-try:
-    HURRICANE_DIST_VERSION = importlib.metadata.version("django-hurricane")
-except importlib.metadata.PackageNotFoundError:
-    raise RuntimeError("django-hurricane not found in environment.")
+
+@functools.lru_cache(maxsize=None)
+def get_hurricane_dist_version() -> str:
+    """
+    Resolves the version of the installed django-hurricane distribution. The lookup scans the installed distributions,
+    hence it is done only once and cached afterwards.
+    """
+    try:
+        return importlib.metadata.version("django-hurricane")
+    except importlib.metadata.PackageNotFoundError:
+        raise RuntimeError("django-hurricane not found in environment.")
+
+
+def __getattr__(name):
+    # HURRICANE_DIST_VERSION is resolved lazily upon first access instead of at import time
+    if name == "HURRICANE_DIST_VERSION":
+        return get_hurricane_dist_version()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
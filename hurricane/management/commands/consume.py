@@ -16,7 +16,7 @@ from hurricane.amqp import logger
 from hurricane.amqp.basehandler import _AMQPConsumer
 from hurricane.amqp.worker import AMQPClient
 from hurricane.metrics import StartupTimeMetric
-from hurricane.server import make_probe_server, sanitize_probes
+from hurricane.server import make_probe_server, sanitize_probes, start_probe_thread
 
 
 class Command(BaseCommand):
@@ -33,11 +33,17 @@ class Command(BaseCommand):
         - ``--amqp-vhost`` - the virtual host of the message broker to use with this consumer
         - ``--handler`` - the Hurricane AMQP handler class (dotted path)
         - ``--metrics`` - the exposed path (default is /metrics) to export Prometheus metrics
+        - ``--metrics-cache-ttl`` - time (in seconds) the exported metrics are cached for, default is 0 (no caching)
+        - ``--metrics-timeout`` - timeout (in seconds) for collecting a single asynchronous metric, default is 5
         - ``--startup-probe`` - the exposed path (default is /startup) for probes to check startup
         - ``--readiness-probe`` - the exposed path (default is /ready) for probes to check readiness
         - ``--liveness-probe`` - the exposed path (default is /alive) for probes to check liveness
         - ``--probe-port`` - the port for Tornado probe route to listen on
         - ``--req-queue-len`` - threshold of length of queue of request, which is considered for readiness probe
+        - ``--probe-check-interval`` - run probe checks in the background with this interval (in seconds) and
+          answer probes with the latest result
+        - ``--probe-check-timeout`` - timeout (in seconds) of a single probe check
+        - ``--probe-thread`` - run the probe application on a separate thread with its own IOLoop
         - ``--no-probe`` - disable probe endpoint
         - ``--no-metrics`` - disable metrics collection
         - ``--autoreload`` - reload code on change
@@ -87,6 +93,18 @@ class Command(BaseCommand):
             default="/metrics",
             help="The exposed path (default is /metrics) to export Prometheus metrics",
         )
+        parser.add_argument(
+            "--metrics-cache-ttl",
+            type=float,
+            default=0.0,
+            help="Time (in seconds) the exported metrics are cached for, default is 0 (no caching)",
+        )
+        parser.add_argument(
+            "--metrics-timeout",
+            type=float,
+            default=5.0,
+            help="Timeout (in seconds) for collecting a single asynchronous metric, default is 5",
+        )
         parser.add_argument(
             "--liveness-probe",
             type=str,
@@ -114,6 +132,23 @@ class Command(BaseCommand):
         parser.add_argument(
             "--req-queue-len", type=int, default=10, help="Length of the request queue"
         )
+        parser.add_argument(
+            "--probe-check-interval",
+            type=float,
+            default=None,
+            help="Run probe checks in the background with this interval in seconds and serve the latest result",
+        )
+        parser.add_argument(
+            "--probe-check-timeout",
+            type=float,
+            default=10.0,
+            help="Timeout of a single probe check in seconds",
+        )
+        parser.add_argument(
+            "--probe-thread",
+            action="store_true",
+            help="Run the probe application on a separate thread with its own IOLoop",
+        )
         parser.add_argument(
             "--no-probe", action="store_true", help="Disable probe endpoint"
         )
@@ -161,8 +196,11 @@ class Command(BaseCommand):
         # set the probe routes
         if not options["no_probe"]:
             logger.info(f"Probe application running on port {options['probe_port']}")
-            probe_application = make_probe_server(options, self.check)
-            probe_application.listen(options["probe_port"])
+            if options["probe_thread"]:
+                start_probe_thread(options, self.check, options["probe_port"])
+            else:
+                probe_application = make_probe_server(options, self.check)
+                probe_application.listen(options["probe_port"])
         else:
             logger.info("No probe application running")
 
@@ -11,7 +11,7 @@ import tornado.wsgi
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
-from hurricane.management.commands import HURRICANE_DIST_VERSION
+from hurricane.management.commands import get_hurricane_dist_version
 from hurricane.server import (
     check_db_and_migrations,
     check_mem_allocations,
@@ -20,10 +20,17 @@ from hurricane.server import (
     make_http_server_and_listen,
     make_probe_server,
     sanitize_probes,
+    start_cgroup_monitor,
+    start_multiprocess_metrics,
+    start_probe_thread,
     static_watch,
 )
+from hurricane.server.allocator import make_malloc_trimmer
+from hurricane.server.cgroup import DEFAULT_CGROUP_ROOT, configure_workers
 from hurricane.server.debugging import setup_debugging
+from hurricane.server.garbage import configure_gc
 from hurricane.server.loggers import STRUCTLOG_ENABLED
+from hurricane.server.memory import SNAPSHOT_STORE
 
 PROBE_CONFIGURED_EVENT = "Probe configured"
 PROMETHEUS_CONFIGURED_EVENT = "Prometheus configured"
@@ -45,19 +52,67 @@ class Command(BaseCommand):
         - ``--debug`` - set Tornado's Debug flag
         - ``--port`` - the port for Tornado to listen on
         - ``--metrics`` - the exposed path (default is /metrics) to export Prometheus metrics
+        - ``--metrics-cache-ttl`` - time (in seconds) the exported metrics are cached for, default is 0 (no caching)
+        - ``--metrics-timeout`` - timeout (in seconds) for collecting a single asynchronous metric, default is 5
+        - ``--access-log-async`` - write access logs in batches on a background thread
+        - ``--access-log-sample`` - share of responses with status below 400 (0 to 1), which are logged, default is 1
+        - ``--access-log-slow`` - requests taking at least this time (in ms) are always logged
+        - ``--access-log-queue-size`` - maximum number of access log records waiting to be written, default is 10000
+        - ``--server-timing-rate`` - share of responses (0 to 1) with a Server-Timing header, default is 0
+        - ``--server-timing-token`` - requests sending this token in the X-Server-Timing header always get a
+          Server-Timing header
+        - ``--metrics-dir`` - directory to share metrics with other Hurricane processes (multi-process mode)
         - ``--startup-probe`` - the exposed path (default is /startup) for probes to check startup
         - ``--readiness-probe`` - the exposed path (default is /ready) for probes to check readiness
         - ``--liveness-probe`` - the exposed path (default is /alive) for probes to check liveness
         - ``--probe-port`` - the port for Tornado probe route to listen on
         - ``--req-queue-len`` - threshold of length of queue of request, which is considered for readiness probe
+        - ``--readiness-max-latency`` - readiness fails, once the p99 response time (in seconds) reaches this value
+        - ``--readiness-max-queue-wait`` - readiness fails, once the p99 time (in seconds) requests wait for an
+          executor thread reaches this value
+        - ``--readiness-max-loop-lag`` - readiness fails, once the p99 event loop lag (in seconds) reaches this value
+        - ``--readiness-max-error-rate`` - readiness fails, once the share of 5xx responses reaches this value
+        - ``--readiness-recovery`` - readiness recovers, once the values dropped below this fraction of their
+          thresholds, default is 0.8
+        - ``--readiness-window`` - window of the readiness policies (10s, 1m or 5m), default is 1m
+        - ``--probe-check-interval`` - run probe checks in the background with this interval (in seconds) and
+          answer probes with the latest result
+        - ``--probe-check-timeout`` - timeout (in seconds) of a single probe check
+        - ``--probe-thread`` - run the probe application on a separate thread with its own IOLoop
+        - ``--slow-request-threshold`` - log the stack of requests running longer than this time (in seconds)
+        - ``--stuck-executor-timeout`` - consider the executor stuck, if requests are waiting and no request finished
+          for this time (in seconds)
+        - ``--stuck-executor-liveness`` - fail the liveness probe with a thread dump, while the executor is stuck
+        - ``--debug-token`` - enable the debugging endpoints (e.g. /profile) on the probe port, requests have to send
+          this token in the Authorization header
         - ``--no-probe`` - disable probe endpoint
         - ``--no-metrics`` - disable metrics collection
-        - ``--command`` - repetitive command for adding execution of management commands before serving
+        - ``--command`` - repetitive command for adding execution of management commands before serving, several
+          commands given to one ``--command`` are executed in parallel
         - ``--check-migrations`` - check if all migrations were applied before starting application
         - ``--check-migrations-apply`` - same as --check-migrations but also applies them if needed
         - ``--webhook-url``- If specified, webhooks will be sent to this url
         - ``--max-lifetime``- If specified,  maximum requests after which pod is restarted
         - ``--max-memory``- If specified, process reloads after exceeding maximum memory (RSS) usage (in Mb)
+        - ``--memory-snapshot-dir`` - write a tracemalloc snapshot to this directory before a memory-triggered reload
+        - ``--malloc-trim`` - return free heap memory to the system with malloc_trim before a memory-triggered reload
+        - ``--malloc-trim-interval`` - return free heap memory to the system with malloc_trim every n seconds
+        - ``--malloc-trim-spike`` - return free heap memory to the system after the memory grew by n Mb
+        - ``--cgroup-root`` - mount point of the cgroup (v2) file system, default /sys/fs/cgroup
+        - ``--max-memory-fraction`` - recycle the process, once the working set of the cgroup exceeds this fraction of
+          its memory limit
+        - ``--memory-pressure-shed`` - reject requests and fail readiness, while the memory pressure of the cgroup is
+          above this percentage
+        - ``--cpu-pressure-shed`` - reject requests and fail readiness, while the CPU pressure of the cgroup
+          averaged over the readiness window is above this percentage
+        - ``--io-pressure-shed`` - reject requests and fail readiness, while the I/O pressure of the cgroup
+          averaged over the readiness window is above this percentage
+        - ``--memory-pressure-recycle`` - recycle the process, once the memory pressure of all tasks of the cgroup
+          reaches this percentage
+        - ``--tracemalloc-frames`` - start tracemalloc on startup with this number of frames per traceback
+        - ``--route-memory-sample`` - measure the memory allocated and retained by every n-th request
+        - ``--gc-thresholds`` - thresholds of the garbage collector as comma separated list, e.g. 50000,20,100
+        - ``--gc-freeze`` - move all objects of the startup into the permanent generation of the garbage collector
         - ``--static-watch`` - If specified, static files will be watched for changes and recollected
         - ``--max-body-size`` - The maximum size of the body of a tornado request in bytes
         - ``--max-buffer-size`` - The maximum size of the buffer of a tornado request in bytes
@@ -89,6 +144,24 @@ class Command(BaseCommand):
             default="/metrics",
             help="The exposed path (default is /metrics) to export Prometheus metrics",
         )
+        parser.add_argument(
+            "--metrics-cache-ttl",
+            type=float,
+            default=0.0,
+            help="Time (in seconds) the exported metrics are cached for, default is 0 (no caching)",
+        )
+        parser.add_argument(
+            "--metrics-timeout",
+            type=float,
+            default=5.0,
+            help="Timeout (in seconds) for collecting a single asynchronous metric, default is 5",
+        )
+        parser.add_argument(
+            "--metrics-dir",
+            type=str,
+            default=None,
+            help="Directory to share metrics with other Hurricane processes (multi-process mode)",
+        )
         parser.add_argument(
             "--liveness-probe",
             type=str,
@@ -115,6 +188,120 @@ class Command(BaseCommand):
         parser.add_argument(
             "--req-queue-len", type=int, default=10, help="Length of the request queue"
         )
+        parser.add_argument(
+            "--access-log-async",
+            action="store_true",
+            help="Write access logs in batches on a background thread",
+        )
+        parser.add_argument(
+            "--access-log-sample",
+            type=float,
+            default=1.0,
+            help="Share of responses with status below 400 (0 to 1), which are logged (default = 1)",
+        )
+        parser.add_argument(
+            "--access-log-slow",
+            type=float,
+            default=None,
+            help="Requests taking at least this time in ms are always logged (default = None)",
+        )
+        parser.add_argument(
+            "--access-log-queue-size",
+            type=int,
+            default=10000,
+            help="Maximum number of access log records waiting to be written (default = 10000)",
+        )
+        parser.add_argument(
+            "--server-timing-rate",
+            type=float,
+            default=0.0,
+            help="Share of responses (0 to 1) with a Server-Timing header (default = 0)",
+        )
+        parser.add_argument(
+            "--server-timing-token",
+            type=str,
+            default=None,
+            help="Requests sending this token in the X-Server-Timing header always get a Server-Timing header",
+        )
+        parser.add_argument(
+            "--readiness-max-latency",
+            type=float,
+            default=None,
+            help="Readiness fails, once the p99 response time in seconds reaches this value (default = None)",
+        )
+        parser.add_argument(
+            "--readiness-max-queue-wait",
+            type=float,
+            default=None,
+            help="Readiness fails, once the p99 executor queue wait in seconds reaches this value (default = None)",
+        )
+        parser.add_argument(
+            "--readiness-max-loop-lag",
+            type=float,
+            default=None,
+            help="Readiness fails, once the p99 event loop lag in seconds reaches this value (default = None)",
+        )
+        parser.add_argument(
+            "--readiness-max-error-rate",
+            type=float,
+            default=None,
+            help="Readiness fails, once the share of 5xx responses reaches this value (default = None)",
+        )
+        parser.add_argument(
+            "--readiness-recovery",
+            type=float,
+            default=0.8,
+            help="Readiness recovers below this fraction of the thresholds (default = 0.8)",
+        )
+        parser.add_argument(
+            "--readiness-window",
+            type=str,
+            choices=["10s", "1m", "5m"],
+            default="1m",
+            help="Window of the readiness policies (default = 1m)",
+        )
+        parser.add_argument(
+            "--probe-check-interval",
+            type=float,
+            default=None,
+            help="Run probe checks in the background with this interval in seconds and serve the latest result "
+            "(default = None, checks run with every probe request)",
+        )
+        parser.add_argument(
+            "--probe-check-timeout",
+            type=float,
+            default=10.0,
+            help="Timeout of a single probe check in seconds (default = 10)",
+        )
+        parser.add_argument(
+            "--probe-thread",
+            action="store_true",
+            help="Run the probe application on a separate thread with its own IOLoop",
+        )
+        parser.add_argument(
+            "--slow-request-threshold",
+            type=float,
+            default=None,
+            help="Log the stack of requests running longer than this time in seconds (default = None)",
+        )
+        parser.add_argument(
+            "--stuck-executor-timeout",
+            type=float,
+            default=None,
+            help="Consider the executor stuck, if requests are waiting and no request finished for this time in "
+            "seconds (default = None)",
+        )
+        parser.add_argument(
+            "--stuck-executor-liveness",
+            action="store_true",
+            help="Fail the liveness probe with a thread dump, while the executor is stuck",
+        )
+        parser.add_argument(
+            "--debug-token",
+            type=str,
+            default=None,
+            help="Enable the debugging endpoints on the probe port with this token (default = None, disabled)",
+        )
         parser.add_argument(
             "--no-probe", action="store_true", help="Disable probe endpoint"
         )
@@ -160,11 +347,98 @@ class Command(BaseCommand):
             default=None,
             help="Maximum memory (Resident Set Size) in Mb before process reloads (default = None, no reload)",
         )
+        parser.add_argument(
+            "--memory-snapshot-dir",
+            type=str,
+            default=None,
+            help="Write a tracemalloc snapshot to this directory before a memory-triggered reload (default = None)",
+        )
+        parser.add_argument(
+            "--malloc-trim",
+            action="store_true",
+            help="Return free heap memory to the system with malloc_trim before a memory-triggered reload",
+        )
+        parser.add_argument(
+            "--malloc-trim-interval",
+            type=float,
+            default=None,
+            help="Return free heap memory to the system with malloc_trim every n seconds (default = None)",
+        )
+        parser.add_argument(
+            "--malloc-trim-spike",
+            type=float,
+            default=None,
+            help="Return free heap memory to the system after the memory grew by n Mb (default = None)",
+        )
+        parser.add_argument(
+            "--cgroup-root",
+            type=str,
+            default=None,
+            help="Mount point of the cgroup (v2) file system (default = /sys/fs/cgroup)",
+        )
+        parser.add_argument(
+            "--max-memory-fraction",
+            type=float,
+            default=None,
+            help="Recycle the process, once the working set of the cgroup exceeds this fraction of its memory limit "
+            "(default = None)",
+        )
+        parser.add_argument(
+            "--memory-pressure-shed",
+            type=float,
+            default=None,
+            help="Reject requests and fail readiness, while the memory pressure of the cgroup is above this percentage "
+            "(default = None)",
+        )
+        parser.add_argument(
+            "--cpu-pressure-shed",
+            type=float,
+            default=None,
+            help="Reject requests and fail readiness, while the CPU pressure of the cgroup averaged over the readiness "
+            "window is above this percentage (default = None)",
+        )
+        parser.add_argument(
+            "--io-pressure-shed",
+            type=float,
+            default=None,
+            help="Reject requests and fail readiness, while the I/O pressure of the cgroup averaged over the readiness "
+            "window is above this percentage (default = None)",
+        )
+        parser.add_argument(
+            "--memory-pressure-recycle",
+            type=float,
+            default=None,
+            help="Recycle the process, once the memory pressure of all tasks of the cgroup reaches this percentage "
+            "(default = None)",
+        )
+        parser.add_argument(
+            "--tracemalloc-frames",
+            type=int,
+            default=None,
+            help="Start tracemalloc on startup with this number of frames per traceback (default = None)",
+        )
+        parser.add_argument(
+            "--route-memory-sample",
+            type=int,
+            default=None,
+            help="Measure the memory allocated and retained by every n-th request (default = None)",
+        )
+        parser.add_argument(
+            "--gc-thresholds",
+            type=str,
+            default=None,
+            help="Thresholds of the garbage collector as comma separated list, e.g. 50000,20,100 (default = None)",
+        )
+        parser.add_argument(
+            "--gc-freeze",
+            action="store_true",
+            help="Move all objects of the startup into the permanent generation of the garbage collector",
+        )
         parser.add_argument(
             "--workers",
             type=int,
             default=None,
-            help="Number of thread workers to be used for the server (default = Number of CPUs + 4)",
+            help="Number of thread workers to be used for the server (default = effective CPUs + 4, at most 32)",
         )
         parser.add_argument(
             "--static-watch",
@@ -262,6 +536,39 @@ class Command(BaseCommand):
         self.merge_option(
             "metrics_path", "HURRICANE_METRICS", options, default="/metrics"
         )
+        self.merge_option(
+            "metrics_cache_ttl", "HURRICANE_METRICS_CACHE_TTL", options, default=0.0
+        )
+        self.merge_option(
+            "metrics_timeout", "HURRICANE_METRICS_TIMEOUT", options, default=5.0
+        )
+        self.merge_option(
+            "metrics_dir", "HURRICANE_METRICS_DIR", options, optional=True
+        )
+        self.merge_option(
+            "access_log_async", "HURRICANE_ACCESS_LOG_ASYNC", options, default=False
+        )
+        self.merge_option(
+            "access_log_sample", "HURRICANE_ACCESS_LOG_SAMPLE", options, default=1.0
+        )
+        self.merge_option(
+            "access_log_slow", "HURRICANE_ACCESS_LOG_SLOW", options, optional=True
+        )
+        self.merge_option(
+            "access_log_queue_size",
+            "HURRICANE_ACCESS_LOG_QUEUE_SIZE",
+            options,
+            default=10000,
+        )
+        self.merge_option(
+            "server_timing_rate", "HURRICANE_SERVER_TIMING_RATE", options, default=0.0
+        )
+        self.merge_option(
+            "server_timing_token",
+            "HURRICANE_SERVER_TIMING_TOKEN",
+            options,
+            optional=True,
+        )
         self.merge_option(
             "liveness_probe", "HURRICANE_LIVENESS_PROBE", options, default="/alive"
         )
@@ -275,6 +582,74 @@ class Command(BaseCommand):
         self.merge_option(
             "req_queue_len", "HURRICANE_REQ_QUEUE_LEN", options, default=10
         )
+        self.merge_option(
+            "readiness_max_latency",
+            "HURRICANE_READINESS_MAX_LATENCY",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "readiness_max_queue_wait",
+            "HURRICANE_READINESS_MAX_QUEUE_WAIT",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "readiness_max_loop_lag",
+            "HURRICANE_READINESS_MAX_LOOP_LAG",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "readiness_max_error_rate",
+            "HURRICANE_READINESS_MAX_ERROR_RATE",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "readiness_recovery", "HURRICANE_READINESS_RECOVERY", options, default=0.8
+        )
+        self.merge_option(
+            "readiness_window", "HURRICANE_READINESS_WINDOW", options, default="1m"
+        )
+        self.merge_option(
+            "probe_check_interval",
+            "HURRICANE_PROBE_CHECK_INTERVAL",
+            options,
+            optional=True,
+            default=None,
+        )
+        self.merge_option(
+            "probe_check_timeout",
+            "HURRICANE_PROBE_CHECK_TIMEOUT",
+            options,
+            optional=True,
+            default=10.0,
+        )
+        self.merge_option(
+            "probe_thread", "HURRICANE_PROBE_THREAD", options, default=False
+        )
+        self.merge_option(
+            "slow_request_threshold",
+            "HURRICANE_SLOW_REQUEST_THRESHOLD",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "stuck_executor_timeout",
+            "HURRICANE_STUCK_EXECUTOR_TIMEOUT",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "stuck_executor_liveness",
+            "HURRICANE_STUCK_EXECUTOR_LIVENESS",
+            options,
+            default=False,
+        )
+        self.merge_option(
+            "debug_token", "HURRICANE_DEBUG_TOKEN", options, optional=True
+        )
         self.merge_option("no_probe", "HURRICANE_NO_PROBE", options, default=False)
         self.merge_option("no_metrics", "HURRICANE_NO_METRICS", options, default=False)
         self.merge_option("command", "HURRICANE_COMMAND", options, optional=True)
@@ -304,6 +679,64 @@ class Command(BaseCommand):
         self.merge_option(
             "max_memory", "HURRICANE_MAX_MEMORY", options, optional=True, default=None
         )
+        self.merge_option(
+            "memory_snapshot_dir",
+            "HURRICANE_MEMORY_SNAPSHOT_DIR",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "tracemalloc_frames", "HURRICANE_TRACEMALLOC_FRAMES", options, optional=True
+        )
+        self.merge_option(
+            "route_memory_sample",
+            "HURRICANE_ROUTE_MEMORY_SAMPLE",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "malloc_trim", "HURRICANE_MALLOC_TRIM", options, default=False
+        )
+        self.merge_option(
+            "malloc_trim_interval",
+            "HURRICANE_MALLOC_TRIM_INTERVAL",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "malloc_trim_spike", "HURRICANE_MALLOC_TRIM_SPIKE", options, optional=True
+        )
+        self.merge_option(
+            "cgroup_root", "HURRICANE_CGROUP_ROOT", options, optional=True
+        )
+        self.merge_option(
+            "max_memory_fraction",
+            "HURRICANE_MAX_MEMORY_FRACTION",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "memory_pressure_shed",
+            "HURRICANE_MEMORY_PRESSURE_SHED",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "cpu_pressure_shed", "HURRICANE_CPU_PRESSURE_SHED", options, optional=True
+        )
+        self.merge_option(
+            "io_pressure_shed", "HURRICANE_IO_PRESSURE_SHED", options, optional=True
+        )
+        self.merge_option(
+            "memory_pressure_recycle",
+            "HURRICANE_MEMORY_PRESSURE_RECYCLE",
+            options,
+            optional=True,
+        )
+        self.merge_option(
+            "gc_thresholds", "HURRICANE_GC_THRESHOLDS", options, optional=True
+        )
+        self.merge_option("gc_freeze", "HURRICANE_GC_FREEZE", options, default=False)
         self.merge_option(
             "workers", "HURRICANE_WORKERS", options, optional=True, default=None
         )
@@ -349,11 +782,11 @@ class Command(BaseCommand):
         if STRUCTLOG_ENABLED:
             logger.info(
                 "Tornado-powered Django web server.",
-                hurricane=HURRICANE_DIST_VERSION,
+                hurricane=get_hurricane_dist_version(),
             )
         else:
             logger.info(
-                f"Tornado-powered Django web server. Version: {HURRICANE_DIST_VERSION}"
+                f"Tornado-powered Django web server. Version: {get_hurricane_dist_version()}"
             )
 
         if options["autoreload"]:
@@ -371,6 +804,11 @@ class Command(BaseCommand):
                 tornado.autoreload.add_reload_hook(static_watch)
             logger.info("Autoreload was performed")
 
+        # the executor is created with the first application, the probe application may be the first one
+        configure_workers(options)
+        # the monitor recycles the process on the main loop, so it is started here and not by the probe thread
+        start_cgroup_monitor(options)
+
         # set the probe port
         # the probe port by default is supposed to run the next port of the application
         probe_port = (
@@ -398,8 +836,11 @@ class Command(BaseCommand):
                         f"startup-probe: {probe_representations['startup_probe']}"
                     )
                 self.log_prometheus(options, probe_port)
-                probe_application = make_probe_server(options, self.check)
-                probe_application.listen(probe_port)
+                if options["probe_thread"]:
+                    start_probe_thread(options, self.check, probe_port)
+                else:
+                    probe_application = make_probe_server(options, self.check)
+                    probe_application.listen(probe_port)
             else:
                 include_probe = True
                 if STRUCTLOG_ENABLED:
@@ -428,6 +869,12 @@ class Command(BaseCommand):
             options["no_metrics"] = True
 
         setup_debugging(options)
+        configure_gc(options)
+        if options["tracemalloc_frames"]:
+            SNAPSHOT_STORE.start(int(options["tracemalloc_frames"]))
+
+        if options["metrics_dir"] and not options.get("no_metrics"):
+            start_multiprocess_metrics(options["metrics_dir"])
 
         loop = asyncio.get_event_loop()
 
@@ -448,6 +895,7 @@ class Command(BaseCommand):
                 commands=options["command"],
                 webhook_url=options["webhook_url"] or None,
                 loop=loop,
+                cgroup_root=options.get("cgroup_root") or DEFAULT_CGROUP_ROOT,
             )
             exec_list.append(management_commands_wrapper)
         if options["check_migrations"] or options["check_migrations_apply"]:
@@ -473,7 +921,8 @@ class Command(BaseCommand):
         loop.run_in_executor(
             executor, bundle_func, exec_list, loop, make_http_server_wrapper
         )
-        if options["max_memory"]:
+        malloc_trimmer = make_malloc_trimmer(options)
+        if options["max_memory"] or malloc_trimmer is not None:
             if STRUCTLOG_ENABLED:
                 logger.info(
                     "Memory allocation check",
@@ -484,7 +933,13 @@ class Command(BaseCommand):
                 logger.info(
                     f"Starting memory allocation check with maximum memory set to {options['max_memory']} Mb"
                 )
-            loop.create_task(check_mem_allocations(options["max_memory"]))
+            loop.create_task(
+                check_mem_allocations(
+                    options["max_memory"],
+                    options["memory_snapshot_dir"],
+                    malloc_trimmer,
+                )
+            )
         else:
             if STRUCTLOG_ENABLED:
                 logger.warning("Memory allocation check", active=False)
@@ -1,14 +1,39 @@
 from hurricane.metrics.registry import MetricsRegistry
 from hurricane.metrics.requests import (
+    AccessLogDroppedMetric,
+    AccessLogQueueLengthMetric,
+    CgroupCPUThrottlingMetric,
+    CgroupMemoryEventsMetric,
+    CgroupMemoryMetric,
+    CgroupPressureMetric,
+    CPUCountMetric,
+    EventLoopLagMetric,
+    ExecutorQueueWaitMetric,
+    ExecutorWorkersMetric,
+    GCCollectionsMetric,
+    GCPauseMetric,
     HealthMetric,
     InfoMetrics,
+    MallocFreeChunksMetric,
+    MallocMemoryMetric,
+    MallocTrimMetric,
+    MallocTrimRSSMetric,
     PathCounterMetric,
     ReadinessMetric,
     RequestCounterMetric,
+    RequestPhaseMetric,
     RequestQueueLengthMetric,
+    ResponseErrorWindowMetric,
     ResponseSizeMetric,
     ResponseTimeAverageMetric,
     ResponseTimeMetric,
+    ResponseTimeWindowMetric,
+    RouteMemoryMetric,
+    RouteResponseSizeMetric,
+    RouteResponseTimeMetric,
+    ShedRequestMetric,
+    SlowRequestMetric,
+    StartupPhaseMetric,
     StartupTimeMetric,
 )
 
@@ -18,9 +43,34 @@ registry.register(RequestCounterMetric)
 registry.register(RequestQueueLengthMetric)
 registry.register(ResponseTimeAverageMetric)
 registry.register(StartupTimeMetric)
+registry.register(StartupPhaseMetric)
 registry.register(HealthMetric)
 registry.register(ReadinessMetric)
 registry.register(ResponseTimeMetric)
 registry.register(ResponseSizeMetric)
 registry.register(PathCounterMetric)
+registry.register(RouteResponseTimeMetric)
+registry.register(RouteResponseSizeMetric)
+registry.register(RouteMemoryMetric)
+registry.register(RequestPhaseMetric)
+registry.register(ResponseTimeWindowMetric)
+registry.register(ResponseErrorWindowMetric)
+registry.register(ExecutorQueueWaitMetric)
+registry.register(EventLoopLagMetric)
+registry.register(AccessLogDroppedMetric)
+registry.register(AccessLogQueueLengthMetric)
+registry.register(SlowRequestMetric)
+registry.register(GCCollectionsMetric)
+registry.register(GCPauseMetric)
+registry.register(MallocMemoryMetric)
+registry.register(MallocFreeChunksMetric)
+registry.register(MallocTrimMetric)
+registry.register(MallocTrimRSSMetric)
+registry.register(CgroupMemoryMetric)
+registry.register(CgroupMemoryEventsMetric)
+registry.register(CgroupPressureMetric)
+registry.register(CgroupCPUThrottlingMetric)
+registry.register(ShedRequestMetric)
+registry.register(CPUCountMetric)
+registry.register(ExecutorWorkersMetric)
 registry.register(InfoMetrics)
@@ -1,9 +1,92 @@
-from typing import Any, Optional
-
-from prometheus_client import Counter, Gauge, Histogram
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from prometheus_client import Counter, Gauge, Histogram
 
 CONTINUOUS_LOOP_TASKS = 5  # 5 is the number of tasks that are always running
 
+# the default buckets of prometheus_client histograms
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+    float("inf"),
+)
+
+
+class LazyPrometheusMetric:
+    """
+    Descriptor, which creates the Prometheus metric of a Hurricane metric upon first access. This way
+    ``prometheus_client`` is only imported once a metric is actually collected or exported.
+    """
+
+    def __init__(
+        self,
+        metric_type: str,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        **kwargs: Any,
+    ) -> None:
+        self.metric_type = metric_type
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.kwargs = kwargs
+        self._metric: Any = None
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        if self._metric is None:
+            with self._lock:
+                if self._metric is None:
+                    import prometheus_client
+
+                    self._metric = getattr(prometheus_client, self.metric_type)(
+                        self.name, self.documentation, self.labelnames, **self.kwargs
+                    )
+        return self._metric
+
+
+def lazy_prometheus_metric(
+    metric_type: str,
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    **kwargs: Any,
+) -> Any:
+    """
+    Returns a descriptor, which creates the Prometheus metric of type ``metric_type`` (e.g. "Counter") upon first
+    access.
+    """
+    return LazyPrometheusMetric(metric_type, name, documentation, labelnames, **kwargs)
+
 
 class HurricaneMetric:
     """
@@ -16,6 +99,8 @@ class HurricaneMetric:
 
 class StoredMetric(HurricaneMetric):
     value: Optional[Any] = None
+    # set to share the value with other processes in multi-process mode
+    multiprocess_mode: Optional[str] = None
 
     def __init__(self, code=None, initial=None):
         if code:
@@ -87,7 +172,7 @@ class CounterMetric(StoredMetric):
     """
 
     value = 0
-    prometheus: Optional[Counter] = None
+    prometheus: Optional["Counter"] = None
 
     @classmethod
     def increment(cls):
@@ -115,7 +200,7 @@ class AverageMetric(StoredMetric):
 
     counter = 0
     value = 0
-    prometheus: Optional[Gauge] = None
+    prometheus: Optional["Gauge"] = None
 
     @classmethod
     def add_value(cls, value):
@@ -137,10 +222,582 @@ class ObservedMetric(StoredMetric):
     """
 
     value = 0
-    prometheus: Optional[Histogram] = None
+    prometheus: Optional["Histogram"] = None
 
     @classmethod
     def observe(cls, value):
         if cls.prometheus:
             cls.prometheus.observe(value)
         cls.set(value)
+
+
+class MetricShards:
+    """
+    Per-thread storage of metric updates. Every thread (and with it every IOLoop) updates its own shard with plain
+    attribute operations, so no lock is taken on the request hot path. The shards are merged, when the metric is read
+    by a scrape or a probe. A lock is only taken once per thread, when its shard is created.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self.factory = factory
+        self._local = threading.local()
+        self._shards: List[Any] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """
+        Returns the shard of the current thread.
+        """
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self.factory()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def __iter__(self) -> Iterator[Any]:
+        with self._lock:
+            return iter(list(self._shards))
+
+
+class CounterShard:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+
+class AverageShard:
+    __slots__ = ("count", "total")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+
+
+class HistogramShard:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int) -> None:
+        # observations per bucket, not cumulative
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, buckets: List[int], count: int, total: float) -> None:
+        """
+        Adds the observations of another histogram with the same buckets. Histograms with other buckets (e.g. of a
+        process with other settings) are skipped.
+        """
+        if len(buckets) != len(self.buckets):
+            return
+        for index, value in enumerate(buckets):
+            self.buckets[index] += value
+        self.count += count
+        self.sum += total
+
+
+class ShardedMetricCollector:
+    """
+    Prometheus collector, which exports a sharded metric. The metric families are built from the merged shards upon
+    every scrape.
+    """
+
+    def __init__(
+        self, metric_cls, name: str, documentation: str, labelnames: Sequence[str]
+    ) -> None:
+        self.metric_cls = metric_cls
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self.created = time.time()
+
+    def collect(self):
+        return self.metric_cls.collect_families(self)
+
+    def describe(self):
+        # the families describe the metric names, which are needed for restricted registries and duplicate checks
+        return list(self.collect())
+
+
+class LazyPrometheusCollector:
+    """
+    Descriptor, which creates and registers the Prometheus collector of a sharded metric upon first access.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._collectors: Dict[Any, ShardedMetricCollector] = {}
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        metric_cls = owner if instance is None else type(instance)
+        collector = self._collectors.get(metric_cls)
+        if collector is None:
+            with self._lock:
+                collector = self._collectors.get(metric_cls)
+                if collector is None:
+                    from prometheus_client import REGISTRY
+
+                    collector = ShardedMetricCollector(
+                        metric_cls, self.name, self.documentation, self.labelnames
+                    )
+                    REGISTRY.register(collector)
+                    self._collectors[metric_cls] = collector
+        return collector
+
+
+def lazy_prometheus_collector(
+    name: str, documentation: str, labelnames: Sequence[str] = ()
+) -> Any:
+    """
+    Returns a descriptor, which exports a sharded metric to Prometheus upon first access.
+    """
+    return LazyPrometheusCollector(name, documentation, labelnames)
+
+
+class ShardedMetric:
+    """
+    Mixin for metrics, which keep their values in per-thread shards. Every subclass gets shards of its own.
+    """
+
+    code: str
+    shards: MetricShards
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.shards = MetricShards(cls.new_shard)
+
+    @classmethod
+    def new_shard(cls) -> Any:
+        raise NotImplementedError
+
+    @classmethod
+    def local_state(cls) -> Any:
+        """
+        Returns the merged shards of this process as JSON serializable state, which is shared with other processes in
+        multi-process mode.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def combine(cls, states: List[Any]) -> Any:
+        """
+        Combines the states of several processes.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def merged_state(cls) -> Any:
+        """
+        Returns the combined state of this process and, in multi-process mode, of all other live processes.
+        """
+        from hurricane.metrics.multiprocess import get_multiprocess_store
+
+        states = [cls.local_state()]
+        store = get_multiprocess_store()
+        if store is not None:
+            states.extend(store.states(cls.code))
+        return cls.combine(states)
+
+
+class ShardedCounterMetric(ShardedMetric, CounterMetric):
+    """
+    Counter for the request hot path: increments only update the shard of the current thread.
+    """
+
+    @classmethod
+    def new_shard(cls):
+        return CounterShard()
+
+    @classmethod
+    def increment(cls, amount=1):
+        """
+        Increment value to the metric.
+        """
+        cls.shards.get().value += amount
+
+    @classmethod
+    def decrement(cls):
+        """
+        Decrement value from the metric.
+        """
+        cls.shards.get().value -= 1
+
+    @classmethod
+    def set(cls, value):
+        cls.increment(value - cls.get())
+
+    @classmethod
+    def get(cls):
+        return sum(shard.value for shard in cls.shards)
+
+    @classmethod
+    def local_state(cls):
+        return cls.get()
+
+    @classmethod
+    def combine(cls, states):
+        return sum(states)
+
+    @classmethod
+    def collect_families(cls, collector):
+        from prometheus_client.core import CounterMetricFamily
+
+        yield CounterMetricFamily(
+            collector.name,
+            collector.documentation,
+            value=cls.merged_state(),
+            created=collector.created,
+        )
+
+
+class LabelSetLimit:
+    """
+    Mixin for labeled metrics, which caps the number of distinct label sets: once the limit is reached, new label sets
+    are counted in an overflow bucket, which has all labels set to ``overflow_label``.
+    """
+
+    overflow_label = "overflow"
+    label_sets: Set[tuple] = set()
+    _label_lock = threading.Lock()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.label_sets = set()
+
+    @classmethod
+    def max_label_sets(cls) -> Optional[int]:
+        """
+        The maximum number of distinct label sets, None for no limit.
+        """
+        return None
+
+    @classmethod
+    def admit(cls, labelvalues: tuple) -> tuple:
+        """
+        Returns the label values to count a new label set with: the label set itself, if the limit is not reached yet,
+        otherwise the overflow bucket.
+        """
+        with cls._label_lock:
+            if labelvalues not in cls.label_sets:
+                limit = cls.max_label_sets()
+                if limit is not None and len(cls.label_sets) >= limit:
+                    return (cls.overflow_label,) * len(labelvalues)
+                cls.label_sets.add(labelvalues)
+        return labelvalues
+
+
+class ShardedLabeledCounterMetric(LabelSetLimit, ShardedCounterMetric):
+    """
+    Counter with labels for the request hot path. Every shard maps the label values to their count.
+    """
+
+    @classmethod
+    def new_shard(cls):
+        return {}
+
+    @classmethod
+    def increment(cls, *labelvalues, amount=1):
+        """
+        Increment value of the given label values.
+        """
+        if labelvalues not in cls.label_sets:
+            labelvalues = cls.admit(labelvalues)
+        shard = cls.shards.get()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    @classmethod
+    def decrement(cls, *labelvalues):
+        cls.increment(*labelvalues, amount=-1)
+
+    @classmethod
+    def set(cls, value, *labelvalues):
+        """
+        Sets the count of the given label values or, if none are given, the total count by adding the difference to
+        the shard of the current thread. The difference of the total count is kept without labels.
+        """
+        if labelvalues and labelvalues not in cls.label_sets:
+            labelvalues = cls.admit(labelvalues)
+        cls.increment(*labelvalues, amount=value - cls.get(*labelvalues))
+
+    @classmethod
+    def get_labeled(cls) -> Dict[tuple, int]:
+        """
+        Returns the merged counts of all label values.
+        """
+        merged: Dict[tuple, int] = {}
+        for shard in cls.shards:
+            for labelvalues, value in list(shard.items()):
+                merged[labelvalues] = merged.get(labelvalues, 0) + value
+        return merged
+
+    @classmethod
+    def get(cls, *labelvalues):
+        """
+        Returns the count of the given label values or the total count of all label values, if none are given.
+        """
+        if labelvalues:
+            return cls.get_labeled().get(labelvalues, 0)
+        return sum(cls.get_labeled().values())
+
+    @classmethod
+    def local_state(cls):
+        return [
+            [list(labelvalues), value]
+            for labelvalues, value in cls.get_labeled().items()
+        ]
+
+    @classmethod
+    def combine(cls, states):
+        combined: Dict[tuple, int] = {}
+        for state in states:
+            for labelvalues, value in state:
+                labelvalues = tuple(labelvalues)
+                combined[labelvalues] = combined.get(labelvalues, 0) + value
+        return combined
+
+    @classmethod
+    def collect_families(cls, collector):
+        from prometheus_client.core import CounterMetricFamily
+
+        family = CounterMetricFamily(
+            collector.name, collector.documentation, labels=collector.labelnames
+        )
+        for labelvalues, value in sorted(cls.merged_state().items()):
+            family.add_metric(list(labelvalues), value, created=collector.created)
+        yield family
+
+
+class ShardedAverageMetric(ShardedMetric, AverageMetric):
+    """
+    Running average for the request hot path: every shard keeps count and sum of its values.
+    """
+
+    @classmethod
+    def new_shard(cls):
+        return AverageShard()
+
+    @classmethod
+    def add_value(cls, value):
+        shard = cls.shards.get()
+        shard.count += 1
+        shard.total += value
+
+    @classmethod
+    def get(cls):
+        count, total = cls.local_state()
+        return total / count if count else 0
+
+    @classmethod
+    def local_state(cls):
+        count = 0
+        total = 0.0
+        for shard in cls.shards:
+            count += shard.count
+            total += shard.total
+        return [count, total]
+
+    @classmethod
+    def combine(cls, states):
+        count = sum(state[0] for state in states)
+        total = sum(state[1] for state in states)
+        return total / count if count else 0
+
+    @classmethod
+    def collect_families(cls, collector):
+        from prometheus_client.core import GaugeMetricFamily
+
+        yield GaugeMetricFamily(
+            collector.name, collector.documentation, value=cls.merged_state()
+        )
+
+
+class ShardedHistogramMetric(ShardedMetric, ObservedMetric):
+    """
+    Histogram for the request hot path: observations only update the bucket counts of the current thread's shard.
+    ``get`` returns the last observed value.
+    """
+
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+    # the last observed value is kept in a list, setting a class attribute on every observation would be slow
+    last: List[Any] = [0]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.last = [0]
+
+    @classmethod
+    def new_shard(cls):
+        return HistogramShard(len(cls.buckets))
+
+    @classmethod
+    def observe(cls, value):
+        shard = cls.shards.get()
+        shard.buckets[bisect_left(cls.buckets, value)] += 1
+        shard.count += 1
+        shard.sum += value
+        cls.last[0] = value
+
+    @classmethod
+    def set(cls, value):
+        cls.last[0] = value
+
+    @classmethod
+    def get(cls):
+        return cls.last[0]
+
+    @classmethod
+    def merge(cls) -> HistogramShard:
+        """
+        Returns the merged shards.
+        """
+        merged = HistogramShard(len(cls.buckets))
+        for shard in cls.shards:
+            merged.add(shard.buckets, shard.count, shard.sum)
+        return merged
+
+    @classmethod
+    def local_state(cls):
+        merged = cls.merge()
+        return [merged.buckets, merged.count, merged.sum]
+
+    @classmethod
+    def combine(cls, states):
+        combined = HistogramShard(len(cls.buckets))
+        for buckets, count, total in states:
+            combined.add(buckets, count, total)
+        return combined
+
+    @classmethod
+    def collect_families(cls, collector):
+        from prometheus_client.core import HistogramMetricFamily
+        from prometheus_client.utils import floatToGoString
+
+        merged = cls.merged_state()
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(cls.buckets, merged.buckets):
+            cumulative += count
+            buckets.append((floatToGoString(bound), cumulative))
+        family = HistogramMetricFamily(collector.name, collector.documentation)
+        family.add_metric([], buckets, merged.sum)
+        family.add_sample(f"{collector.name}_created", {}, collector.created)
+        yield family
+
+
+class ShardedLabeledHistogramMetric(LabelSetLimit, ShardedHistogramMetric):
+    """
+    Histogram with labels for the request hot path. Every shard maps the label values to their histogram. The label
+    names are given by ``labelnames``.
+    """
+
+    labelnames: Sequence[str] = ()
+
+    @classmethod
+    def new_shard(cls):
+        return {}
+
+    @classmethod
+    def observe(cls, value, *labelvalues):
+        if labelvalues not in cls.label_sets:
+            labelvalues = cls.admit(labelvalues)
+        shard = cls.shards.get()
+        histogram = shard.get(labelvalues)
+        if histogram is None:
+            histogram = shard[labelvalues] = HistogramShard(len(cls.buckets))
+        histogram.buckets[bisect_left(cls.buckets, value)] += 1
+        histogram.count += 1
+        histogram.sum += value
+        cls.last[0] = value
+
+    @classmethod
+    def merge_labeled(cls) -> Dict[tuple, HistogramShard]:
+        """
+        Returns the merged histograms of all label values.
+        """
+        merged: Dict[tuple, HistogramShard] = {}
+        for shard in cls.shards:
+            for labelvalues, histogram in list(shard.items()):
+                target = merged.get(labelvalues)
+                if target is None:
+                    target = merged[labelvalues] = HistogramShard(len(cls.buckets))
+                target.add(histogram.buckets, histogram.count, histogram.sum)
+        return merged
+
+    @classmethod
+    def merge(cls) -> HistogramShard:
+        merged = HistogramShard(len(cls.buckets))
+        for histogram in cls.merge_labeled().values():
+            merged.add(histogram.buckets, histogram.count, histogram.sum)
+        return merged
+
+    @classmethod
+    def local_state(cls):
+        return [
+            [list(labelvalues), histogram.buckets, histogram.count, histogram.sum]
+            for labelvalues, histogram in cls.merge_labeled().items()
+        ]
+
+    @classmethod
+    def combine(cls, states):
+        combined: Dict[tuple, HistogramShard] = {}
+        for state in states:
+            for labelvalues, buckets, count, total in state:
+                labelvalues = tuple(labelvalues)
+                target = combined.get(labelvalues)
+                if target is None:
+                    target = combined[labelvalues] = HistogramShard(len(cls.buckets))
+                target.add(buckets, count, total)
+        return combined
+
+    @classmethod
+    def collect_families(cls, collector):
+        from prometheus_client.core import HistogramMetricFamily
+        from prometheus_client.utils import floatToGoString
+
+        labelnames = list(cls.labelnames)
+        bounds = [floatToGoString(bound) for bound in cls.buckets]
+        family = HistogramMetricFamily(
+            collector.name, collector.documentation, labels=labelnames
+        )
+        for labelvalues, histogram in sorted(cls.merged_state().items()):
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(bounds, histogram.buckets):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            family.add_metric(list(labelvalues), buckets, histogram.sum)
+            family.add_sample(
+                f"{collector.name}_created",
+                dict(zip(labelnames, labelvalues)),
+                collector.created,
+            )
+        yield family
+
+
+def buckets_from_settings(name: str, default: Sequence[float]) -> Tuple[float, ...]:
+    """
+    Returns the histogram buckets configured with the Django setting ``name`` (a list of upper bounds) or the
+    environment variable ``HURRICANE_<name>`` (comma separated upper bounds), otherwise the default buckets. The
+    buckets are sorted and always end with +Inf.
+    """
+    from django.conf import settings
+
+    value = getattr(settings, name, None)
+    if value is None:
+        value = os.environ.get(f"HURRICANE_{name}")
+    if value is None:
+        value = default
+    elif isinstance(value, str):
+        value = [bound for bound in value.split(",") if bound.strip()]
+    buckets = sorted(float(bound) for bound in value)
+    if not buckets or buckets[-1] != float("inf"):
+        buckets.append(float("inf"))
+    return tuple(buckets)
@@ -0,0 +1,212 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+FILE_PREFIX = "hurricane_"
+FILE_SUFFIX = ".json"
+DEFAULT_WRITE_INTERVAL = 1.0
+# processes, which did not write their state for this number of write intervals, are considered dead
+DEFAULT_EXPIRE_INTERVALS = 30
+
+
+def instance_id() -> str:
+    """
+    Returns a new identifier of a process. The pid alone is not unique, as containers of a pod usually have pid
+    namespaces of their own and every server may run as pid 1.
+    """
+    return f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+
+
+def local_state(instance: str) -> Dict[str, Any]:
+    """
+    Returns the state of all metrics of this process, which are shared with other processes: the merged shards of all
+    sharded metrics and the values of stored metrics with a ``multiprocess_mode``.
+    """
+    from hurricane.metrics import registry
+    from hurricane.metrics.base import ShardedMetric
+
+    metrics = {}
+    stored = {}
+    for code, metric in list(registry.metrics.items()):
+        if isinstance(metric, ShardedMetric):
+            metrics[code] = metric.local_state()
+        elif getattr(metric, "multiprocess_mode", None):
+            stored[code] = metric.get()
+    return {
+        "id": instance,
+        "pid": os.getpid(),
+        "timestamp": time.time(),
+        "metrics": metrics,
+        "stored": stored,
+    }
+
+
+class MultiProcessStore:
+    """
+    Shares the metrics of several Hurricane processes, e.g. several server processes in one pod. Every process writes
+    the state of its metrics periodically to a file of its own in a shared directory; the files are replaced
+    atomically, so readers never see partial states. Scrapes and probes combine the state of the current process with
+    the states of all other live processes. Every process is identified by a random instance id, as processes in
+    different containers do not see each other. Therefore, a process is considered dead, once it did not update its
+    state for ``expire_after`` seconds; its file is removed. With it the counters of a dead process are dropped, which
+    Prometheus treats as a counter reset.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        interval: float = DEFAULT_WRITE_INTERVAL,
+        instance: Optional[str] = None,
+        expire_after: Optional[float] = None,
+    ) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.instance = instance if instance is not None else instance_id()
+        self.expire_after = (
+            expire_after
+            if expire_after is not None
+            else interval * DEFAULT_EXPIRE_INTERVALS
+        )
+        self._cache: Optional[List[Dict[str, Any]]] = None
+        self._cache_time = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(
+            self.directory, f"{FILE_PREFIX}{self.instance}{FILE_SUFFIX}"
+        )
+
+    def write(self) -> None:
+        """
+        Writes the state of the current process.
+        """
+        data = json.dumps(local_state(self.instance))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def remove(self) -> None:
+        """
+        Removes the state of the current process, e.g. on shutdown.
+        """
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def read(self) -> List[Dict[str, Any]]:
+        """
+        Returns the states of all other live processes. The states are read at most once per half write interval, so
+        collecting many metrics during one scrape reads the directory once.
+        """
+        now = time.monotonic()
+        if self._cache is not None and now - self._cache_time < self.interval / 2:
+            return self._cache
+        states = []
+        expired = time.time() - self.expire_after
+        for name in os.listdir(self.directory):
+            if not (name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX)):
+                continue
+            instance = name.removeprefix(FILE_PREFIX).removesuffix(FILE_SUFFIX)
+            if instance == self.instance:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if state.get("timestamp", 0) < expired:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            state.setdefault("id", instance)
+            states.append(state)
+        self._cache = states
+        self._cache_time = now
+        return states
+
+    def states(self, code: str) -> List[Any]:
+        """
+        Returns the states of the metric with the given code of all other live processes.
+        """
+        return [
+            state["metrics"][code]
+            for state in self.read()
+            if code in state.get("metrics", {})
+        ]
+
+    def unhealthy(self, code: str, stale_after: float) -> Dict[str, str]:
+        """
+        Returns the instance ids of the other processes, which report the stored metric ``code`` (e.g. health) as
+        False or which did not update their state within ``stale_after`` seconds, with the reason.
+        """
+        unhealthy: Dict[str, str] = {}
+        now = time.time()
+        for state in self.read():
+            if now - state.get("timestamp", 0) > stale_after:
+                unhealthy[state["id"]] = "stale"
+            elif state.get("stored", {}).get(code) is False:
+                unhealthy[state["id"]] = f"{code} failed"
+        return unhealthy
+
+
+class MultiProcessWriter(threading.Thread):
+    """
+    Writes the state of the current process to the store every write interval from a background thread, so the
+    serialization and the file I/O do not block the event loop.
+    """
+
+    def __init__(self, store: MultiProcessStore) -> None:
+        super().__init__(name="hurricane-metrics-writer", daemon=True)
+        self.store = store
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        from hurricane.server.loggers import metrics_log
+
+        while not self._stopped.wait(self.store.interval):
+            try:
+                self.store.write()
+            except Exception as e:
+                metrics_log.error(f"Writing the metrics of this process failed: {e}")
+
+    def stop(self) -> None:
+        """
+        Stops the writer and removes the state of the current process.
+        """
+        self._stopped.set()
+        if self.is_alive():
+            self.join(self.store.interval * 2)
+        self.store.remove()
+
+
+MULTIPROCESS_STORE: Optional[MultiProcessStore] = None
+
+
+def get_multiprocess_store() -> Optional[MultiProcessStore]:
+    return MULTIPROCESS_STORE
+
+
+def enable_multiprocess(
+    directory: str, interval: float = DEFAULT_WRITE_INTERVAL
+) -> MultiProcessStore:
+    """
+    Enables the multi-process mode with the given shared directory.
+    """
+    global MULTIPROCESS_STORE
+    MULTIPROCESS_STORE = MultiProcessStore(directory, interval)
+    return MULTIPROCESS_STORE
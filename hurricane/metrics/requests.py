@@ -1,36 +1,82 @@
 import asyncio
-from typing import Any
-
-from prometheus_client import Counter, Gauge, Histogram, Info
+from typing import Any, Dict, List, Optional, Sequence
 
 from hurricane.metrics.base import (
     CONTINUOUS_LOOP_TASKS,
-    AverageMetric,
     CalculatedMetric,
-    CounterMetric,
-    ObservedMetric,
+    HistogramShard,
+    ShardedAverageMetric,
+    ShardedCounterMetric,
+    ShardedHistogramMetric,
+    ShardedLabeledCounterMetric,
+    ShardedLabeledHistogramMetric,
     StoredMetric,
+    buckets_from_settings,
+    lazy_prometheus_collector,
+    lazy_prometheus_metric,
+)
+from hurricane.metrics.windowed import WindowedHistogramMetric
+
+# finer than the default buckets of prometheus_client in the range of 1 - 50 ms, and up to 30 s
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.0075,
+    0.01,
+    0.015,
+    0.02,
+    0.03,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+# collections of the youngest generation take microseconds, full collections of large heaps up to seconds
+GC_PAUSE_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    float("inf"),
 )
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
 
+DEFAULT_PATH_LIMIT = 500
 
-class RequestCounterMetric(CounterMetric):
+
+class RequestCounterMetric(ShardedCounterMetric):
 
     """
     Defines request counter metric with corresponding metric code.
     """
 
     code = "request_counter"
-    prometheus = Counter(code, __doc__.strip())
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
 
 
-class ResponseTimeAverageMetric(AverageMetric):
+class ResponseTimeAverageMetric(ShardedAverageMetric):
 
     """
     Defines response time average metric with corresponding metric code.
     """
 
     code = "response_time_average"
-    prometheus = Gauge(code, __doc__.strip())
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
 
 
 class RequestQueueLengthMetric(CalculatedMetric):
@@ -40,63 +86,579 @@ class RequestQueueLengthMetric(CalculatedMetric):
     """
 
     code = "request_queue_length"
-    prometheus = Gauge(code, __doc__.strip())
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip())
+
+    snapshot: Optional[int] = None
 
     def get_value(self):
         """
-        Getting length of the asyncio queue of all tasks.
+        Getting length of the asyncio queue of all tasks. If the main loop publishes snapshots of its queue length
+        (i.e. probes run on a separate thread), the latest snapshot is returned.
         """
-        _len = max(0, len(asyncio.all_tasks()) - CONTINUOUS_LOOP_TASKS)
+        if self.snapshot is not None:
+            _len = self.snapshot
+        else:
+            _len = max(0, len(asyncio.all_tasks()) - CONTINUOUS_LOOP_TASKS)
         self.prometheus.set(_len)
         return _len
 
+    @classmethod
+    def publish(cls, value: int):
+        """
+        Publishing a snapshot of the queue length computed on the main loop.
+        """
+        cls.snapshot = value
+
 
 class StartupTimeMetric(StoredMetric):
     code = "startup_time"
 
 
+class StartupPhaseMetric(StoredMetric):
+    """
+    The duration of the single startup phases in seconds.
+    """
+
+    code = "startup_phase_seconds"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["phase"])
+
+    @classmethod
+    def set(cls, value: Dict[str, float]):
+        for phase, seconds in value.items():
+            cls.prometheus.labels(phase).set(seconds)
+        super().set(value)
+
+
 class HealthMetric(StoredMetric):
     code = "health"
+    multiprocess_mode = "all"
 
 
 class ReadinessMetric(StoredMetric):
     code = "readiness"
+    multiprocess_mode = "all"
 
 
-class ResponseTimeMetric(ObservedMetric):
+class ResponseTimeMetric(ShardedHistogramMetric):
     """
     The time to generate a response in seconds.
     """
 
     code = "response_time_seconds"
-    prometheus = Histogram(code, __doc__.strip())
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
 
 
-class ResponseSizeMetric(ObservedMetric):
+class ResponseSizeMetric(ShardedHistogramMetric):
     """
     The response size in bytes.
     """
 
     code = "response_size_bytes"
-    prometheus = Histogram(code, __doc__.strip())
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
 
 
-class PathCounterMetric(CounterMetric):
+class PathCounterMetric(ShardedLabeledCounterMetric):
     """
     The number of requests to a specific path.
     """
 
     code = "path_requests_total"
-    prometheus = Counter(code, __doc__.strip(), ["method", "path"])
+    prometheus = lazy_prometheus_collector(
+        "path_requests", __doc__.strip(), ["method", "path"]
+    )
+
+    @classmethod
+    def max_label_sets(cls) -> Optional[int]:
+        """
+        The maximum number of distinct method and path combinations (setting ``METRICS_PATH_LIMIT``, default 500).
+        """
+        from django.conf import settings
+
+        return getattr(settings, "METRICS_PATH_LIMIT", DEFAULT_PATH_LIMIT)
+
+
+class RouteMemoryMetric(ShardedLabeledCounterMetric):
+    """
+    Memory accounting of sampled requests per route: the number of sampled requests and the sums of the bytes
+    allocated by Python (peak), retained by Python and the growth of the resident set size (RSS) during the requests.
+    Retained bytes and RSS growth can be negative.
+    """
+
+    code = "route_memory"
+    measures = ("samples", "allocated", "retained", "rss")
+    prometheus = lazy_prometheus_collector(code, __doc__.strip(), ["route", "measure"])
+
+    @classmethod
+    def max_label_sets(cls) -> Optional[int]:
+        limit = PathCounterMetric.max_label_sets()
+        return limit * len(cls.measures) if limit is not None else None
+
+    @classmethod
+    def observe_request(
+        cls,
+        route: str,
+        allocated: Optional[int],
+        retained: Optional[int],
+        rss: Optional[int],
+    ) -> None:
+        cls.increment(route, "samples")
+        for measure, value in (
+            ("allocated", allocated),
+            ("retained", retained),
+            ("rss", rss),
+        ):
+            if value is not None:
+                cls.increment(route, measure, amount=value)
+
+    @classmethod
+    def report(cls) -> List[dict]:
+        """
+        Returns the number of samples and the average bytes per request of every route, the routes retaining the most
+        memory first.
+        """
+        routes: Dict[str, Dict[str, int]] = {}
+        for (route, measure), value in cls.merged_state().items():
+            routes.setdefault(route, {})[measure] = value
+        report = []
+        for route, values in routes.items():
+            samples = values.get("samples", 0)
+            entry: Dict[str, Any] = {"route": route, "samples": samples}
+            for measure in cls.measures[1:]:
+                if measure in values and samples:
+                    entry[f"{measure}_bytes"] = values[measure] / samples
+            report.append(entry)
+        return sorted(
+            report,
+            key=lambda entry: (
+                entry.get("retained_bytes", 0),
+                entry.get("rss_bytes", 0),
+            ),
+            reverse=True,
+        )
+
+    @classmethod
+    def collect_families(cls, collector):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        samples = CounterMetricFamily(
+            f"{collector.name}_samples",
+            "The number of requests to a route, which memory was sampled for.",
+            labels=["route"],
+        )
+        memory = GaugeMetricFamily(
+            f"{collector.name}_bytes",
+            collector.documentation,
+            labels=["route", "measure"],
+        )
+        for (route, measure), value in sorted(cls.merged_state().items()):
+            if measure == "samples":
+                samples.add_metric([route], value, created=collector.created)
+            else:
+                memory.add_metric([route, measure], value)
+        yield samples
+        yield memory
+
+
+class RouteHistogramMetric(ShardedLabeledHistogramMetric):
+    """
+    Histogram per route (see ``PathCounterMetric``) and status class (e.g. "2xx"). With the setting
+    ``METRICS_ROUTE_METHODS`` the request method is added as label. Buckets are taken from the setting
+    ``bucket_setting``.
+    """
+
+    bucket_setting = ""
+    default_buckets: Sequence[float] = ()
+    by_method = False
+    configured = False
+
+    @classmethod
+    def configure(cls):
+        """
+        Reads buckets and labels from the Django settings once.
+        """
+        if cls.configured:
+            return
+        from django.conf import settings
+
+        cls.buckets = buckets_from_settings(cls.bucket_setting, cls.default_buckets)
+        cls.by_method = bool(getattr(settings, "METRICS_ROUTE_METHODS", False))
+        cls.labelnames = (
+            ("route", "status", "method") if cls.by_method else ("route", "status")
+        )
+        cls.configured = True
+
+    @classmethod
+    def max_label_sets(cls) -> Optional[int]:
+        return PathCounterMetric.max_label_sets()
 
     @classmethod
-    def increment(cls, method, path):
+    def observe_request(cls, value, route, status_code, method):
         """
-        Increment value to the metric.
+        Observes a value of a request to the given route.
         """
-        if cls.prometheus:
-            cls.prometheus.labels(method, path).inc()
-        cls.set(cls.get() + 1)
+        if not cls.configured:
+            cls.configure()
+        status = f"{status_code // 100}xx"
+        if cls.by_method:
+            cls.observe(value, route, status, method)
+        else:
+            cls.observe(value, route, status)
+
+    @classmethod
+    def collect_families(cls, collector):
+        cls.configure()
+        return super().collect_families(collector)
+
+
+class RouteResponseTimeMetric(RouteHistogramMetric):
+    """
+    The time to generate a response in seconds per route and status class.
+    """
+
+    code = "route_response_time_seconds"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+    bucket_setting = "METRICS_BUCKETS"
+    default_buckets = DEFAULT_LATENCY_BUCKETS
+
+
+class RouteResponseSizeMetric(RouteHistogramMetric):
+    """
+    The response size in bytes per route and status class.
+    """
+
+    code = "route_response_size_bytes"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+    bucket_setting = "METRICS_SIZE_BUCKETS"
+    default_buckets = DEFAULT_SIZE_BUCKETS
+
+
+class RequestPhaseMetric(ShardedLabeledHistogramMetric):
+    """
+    The time spent in the phases of a request in seconds: queue (from the X-Request-Start or X-Queue-Start header of
+    the ingress until Tornado parsed the request), dispatch (until the request was handed to the executor), executor
+    (waiting for an executor thread), app (the WSGI application) and write (writing the response).
+    """
+
+    code = "request_phase_seconds"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip(), ["phase"])
+    buckets = (*DEFAULT_LATENCY_BUCKETS, float("inf"))
+    labelnames = ("phase",)
+
+
+class ResponseTimeWindowMetric(WindowedHistogramMetric):
+    """
+    Quantiles of the time to generate a response in seconds over the last 10 seconds, minute and 5 minutes.
+    """
+
+    code = "response_time_window_seconds"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+    rate_name = "request_rate"
+
+
+class ResponseErrorWindowMetric(WindowedHistogramMetric):
+    """
+    Quantiles of the time to generate a server error response (5xx) in seconds over the last 10 seconds, minute and
+    5 minutes.
+    """
+
+    code = "response_error_window_seconds"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+    rate_name = "request_error_rate"
+
+
+class ExecutorQueueWaitMetric(WindowedHistogramMetric):
+    """
+    Quantiles of the time requests waited for a free executor thread in seconds over the last 10 seconds, minute and
+    5 minutes.
+    """
+
+    code = "executor_queue_wait_seconds"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+
+
+class EventLoopLagMetric(WindowedHistogramMetric):
+    """
+    Quantiles of the delay of timer callbacks on the main event loop in seconds over the last 10 seconds, minute and
+    5 minutes.
+    """
+
+    code = "event_loop_lag_seconds"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+
+
+class AccessLogDroppedMetric(ShardedCounterMetric):
+    """
+    The number of access log records, which were dropped, because the access log queue was full or the log stream
+    failed.
+    """
+
+    code = "access_log_dropped"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+
+
+class SlowRequestMetric(ShardedCounterMetric):
+    """
+    The number of requests, which took longer than the slow request threshold of the watchdog.
+    """
+
+    code = "slow_requests"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+
+
+class AccessLogQueueLengthMetric(CalculatedMetric):
+    """
+    The number of access log records waiting to be written.
+    """
+
+    code = "access_log_queue_length"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip())
+
+    def get_value(self):
+        from hurricane.server.accesslog import get_access_log_writer
+
+        writer = get_access_log_writer()
+        length = len(writer.queue) if writer is not None else 0
+        self.prometheus.set(length)
+        return length
+
+
+class GCCollectionsMetric(ShardedLabeledCounterMetric):
+    """
+    The number of collections of the garbage collector per generation.
+    """
+
+    code = "gc_collections"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip(), ["generation"])
+
+    @classmethod
+    def get_labeled(cls) -> Dict[tuple, int]:
+        from hurricane.server.garbage import GC_MONITOR
+
+        return {
+            labelvalues: histogram.count
+            for labelvalues, histogram in GC_MONITOR.histograms().items()
+        }
+
+
+class GCPauseMetric(ShardedLabeledHistogramMetric):
+    """
+    The pause of the garbage collector in seconds per generation. All threads are stopped during a collection.
+    """
+
+    code = "gc_pause_seconds"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip(), ["generation"])
+    buckets = GC_PAUSE_BUCKETS
+    labelnames = ("generation",)
+
+    @classmethod
+    def merge_labeled(cls) -> Dict[tuple, HistogramShard]:
+        from hurricane.server.garbage import GC_MONITOR
+
+        return GC_MONITOR.histograms()
+
+
+class MallocMemoryMetric(CalculatedMetric):
+    """
+    The memory of the glibc allocator in bytes: allocated from the system in arenas (arena) and with mmap (mmap), in
+    use by the application (in_use), free in the arenas (free, fastbin_free) and releasable at the top of the main
+    arena (releasable). Free memory, which is not released to the system, is fragmentation of the heap.
+    """
+
+    code = "malloc_bytes"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["kind"])
+
+    def get_value(self):
+        from hurricane.server.allocator import malloc_info
+
+        info = malloc_info()
+        if info is None:
+            return None
+        value = {
+            "arena": info["arena"],
+            "mmap": info["hblkhd"],
+            "in_use": info["uordblks"],
+            "free": info["fordblks"],
+            "fastbin_free": info["fsmblks"],
+            "releasable": info["keepcost"],
+        }
+        for kind, size in value.items():
+            self.prometheus.labels(kind).set(size)
+        return value
+
+
+class MallocFreeChunksMetric(CalculatedMetric):
+    """
+    The number of free chunks of the glibc allocator in the regular bins (regular) and the fastbins (fast). Many free
+    chunks indicate a fragmented heap.
+    """
+
+    code = "malloc_free_chunks"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["bin"])
+
+    def get_value(self):
+        from hurricane.server.allocator import malloc_info
+
+        info = malloc_info()
+        if info is None:
+            return None
+        value = {"regular": info["ordblks"], "fast": info["smblks"]}
+        for bin_name, chunks in value.items():
+            self.prometheus.labels(bin_name).set(chunks)
+        return value
+
+
+class MallocTrimMetric(ShardedCounterMetric):
+    """
+    The number of times the heap was trimmed with malloc_trim.
+    """
+
+    code = "malloc_trims"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip())
+
+
+class MallocTrimRSSMetric(StoredMetric):
+    """
+    The resident set size in bytes before and after the last malloc_trim.
+    """
+
+    code = "malloc_trim_rss_bytes"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["phase"])
+
+    @classmethod
+    def set(cls, value: Dict[str, int]):
+        for phase, rss in value.items():
+            cls.prometheus.labels(phase).set(rss)
+        super().set(value)
+
+
+class CgroupMemoryMetric(CalculatedMetric):
+    """
+    The memory of the cgroup in bytes: the limit (memory.max), the usage (memory.current) and the working set (usage
+    without inactive file pages).
+    """
+
+    code = "cgroup_memory_bytes"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["kind"])
+
+    def get_value(self):
+        from hurricane.server.cgroup import get_cgroup_monitor
+
+        monitor = get_cgroup_monitor()
+        if monitor is None:
+            return None
+        for kind, size in monitor.memory.items():
+            if size is not None:
+                self.prometheus.labels(kind).set(size)
+        return monitor.memory
+
+
+class CgroupMemoryEventsMetric(CalculatedMetric):
+    """
+    The number of memory events of the cgroup (memory.events) since it was created, e.g. how often the usage reached
+    the limit (max) or the OOM killer was invoked (oom_kill).
+    """
+
+    code = "cgroup_memory_events"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["event"])
+
+    def get_value(self):
+        from hurricane.server.cgroup import get_cgroup_monitor
+
+        monitor = get_cgroup_monitor()
+        if monitor is None:
+            return None
+        for event, count in monitor.memory_events.items():
+            self.prometheus.labels(event).set(count)
+        return monitor.memory_events
+
+
+class CgroupPressureMetric(CalculatedMetric):
+    """
+    The pressure stall information of the cgroup: the share of time in percent over the last 10 seconds, minute and
+    5 minutes, in which some or all (full) tasks stalled on the resource (memory, cpu or io).
+    """
+
+    code = "cgroup_pressure"
+    prometheus = lazy_prometheus_metric(
+        "Gauge", code, __doc__.strip(), ["resource", "kind", "window"]
+    )
+    windows = (("10s", "avg10"), ("1m", "avg60"), ("5m", "avg300"))
+
+    def get_value(self):
+        from hurricane.server.cgroup import get_cgroup_monitor
+
+        monitor = get_cgroup_monitor()
+        if monitor is None:
+            return None
+        for resource, pressure in monitor.pressures.items():
+            for kind, averages in pressure.items():
+                for window, average in self.windows:
+                    if average in averages:
+                        self.prometheus.labels(resource, kind, window).set(
+                            averages[average]
+                        )
+        return monitor.pressures
+
+
+class CgroupCPUThrottlingMetric(CalculatedMetric):
+    """
+    The CPU throttling of the cgroup (cpu.stat) since it was created: the CFS periods with runnable tasks (periods),
+    the periods, in which the cgroup used up its CPU quota and was throttled (throttled_periods), and the time it was
+    throttled in seconds (throttled_seconds).
+    """
+
+    code = "cgroup_cpu_throttling"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["stat"])
+
+    def get_value(self):
+        from hurricane.server.cgroup import get_cgroup_monitor
+
+        monitor = get_cgroup_monitor()
+        if monitor is None:
+            return None
+        for stat, value in monitor.cpu_throttling.items():
+            self.prometheus.labels(stat).set(value)
+        return monitor.cpu_throttling
+
+
+class ShedRequestMetric(ShardedLabeledCounterMetric):
+    """
+    The number of requests, which were rejected with status 503 because of the pressure of a resource.
+    """
+
+    code = "shed_requests"
+    prometheus = lazy_prometheus_collector(code, __doc__.strip(), ["reason"])
+
+
+class CPUCountMetric(StoredMetric):
+    """
+    The number of CPUs of the host, the CPUs the process may run on (affinity), the CPU quota of the cgroup and the
+    resulting effective CPUs, which the default number of executor workers is derived from.
+    """
+
+    code = "cpu_count"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip(), ["source"])
+
+    @classmethod
+    def set(cls, value: Dict[str, Optional[float]]):
+        for source, cpus in value.items():
+            if cpus is not None:
+                cls.prometheus.labels(source).set(cpus)
+        super().set(value)
+
+
+class ExecutorWorkersMetric(StoredMetric):
+    """
+    The number of worker threads of the executor, which runs the Django application.
+    """
+
+    code = "executor_workers"
+    prometheus = lazy_prometheus_metric("Gauge", code, __doc__.strip())
+
+    @classmethod
+    def set(cls, value: int):
+        cls.prometheus.set(value)
+        super().set(value)
 
 
 class InfoMetrics(StoredMetric):
@@ -105,7 +667,7 @@ class InfoMetrics(StoredMetric):
     """
 
     code = "hurricane"
-    prometheus = Info(code, __doc__.strip())
+    prometheus = lazy_prometheus_metric("Info", code, __doc__.strip())
 
     @classmethod
     def set(cls, value: Any):
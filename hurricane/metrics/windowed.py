@@ -0,0 +1,167 @@
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from hurricane.metrics.base import ShardedMetric, StoredMetric
+
+# relative error of the quantiles is about half of the growth factor
+BIN_GROWTH = 1.05
+BIN_MIN = 0.0001
+BIN_COUNT = 300
+WINDOWS: Sequence[Tuple[str, int]] = (("10s", 10), ("1m", 60), ("5m", 300))
+QUANTILES: Sequence[float] = (0.5, 0.95, 0.99)
+
+_LOG_GROWTH = math.log(BIN_GROWTH)
+
+
+def value_bin(value: float) -> int:
+    """
+    Returns the logarithmic bin of a value: bin 0 holds all values up to ``BIN_MIN``, every further bin is by
+    ``BIN_GROWTH`` wider than the previous one.
+    """
+    if value <= BIN_MIN:
+        return 0
+    return min(BIN_COUNT - 1, 1 + int(math.log(value / BIN_MIN) / _LOG_GROWTH))
+
+
+def bin_value(index: int) -> float:
+    """
+    Returns the representative value (the geometric mean of the bounds) of a bin.
+    """
+    if index == 0:
+        return BIN_MIN
+    return BIN_MIN * BIN_GROWTH ** (index - 0.5)
+
+
+class WindowSlot:
+    __slots__ = ("second", "bins")
+
+    def __init__(self) -> None:
+        self.second = -1
+        self.bins: Dict[int, int] = {}
+
+
+class WindowRing:
+    """
+    Ring of one second slots covering the largest window. Memory is bounded by the number of slots and bins, no matter
+    how many values are observed.
+    """
+
+    __slots__ = ("slots",)
+
+    def __init__(self, size: int) -> None:
+        self.slots = [WindowSlot() for _ in range(size)]
+
+
+class WindowedHistogramMetric(ShardedMetric, StoredMetric):
+    """
+    Sliding window histogram with logarithmic bins. An observation increments one bin of the current second of the
+    current thread's ring, which is O(1). Quantiles and rates of the windows are computed, when the metric is read.
+    ``get`` returns the statistics of all windows.
+    """
+
+    # name of the exported gauge with the number of observations per second, None to export the quantiles only
+    rate_name: Optional[str] = None
+
+    windows: Sequence[Tuple[str, int]] = WINDOWS
+    quantiles: Sequence[float] = QUANTILES
+    clock = time.monotonic
+
+    @classmethod
+    def new_shard(cls):
+        return WindowRing(max(seconds for _, seconds in cls.windows))
+
+    @classmethod
+    def observe(cls, value):
+        second = int(cls.clock())
+        slots = cls.shards.get().slots
+        slot = slots[second % len(slots)]
+        if slot.second != second:
+            slot.second = second
+            slot.bins = {}
+        index = value_bin(value)
+        bins = slot.bins
+        bins[index] = bins.get(index, 0) + 1
+
+    @classmethod
+    def local_state(cls):
+        """
+        Returns the bins of every window as list of [bin, count] pairs.
+        """
+        now = int(cls.clock())
+        state = {}
+        for name, seconds in cls.windows:
+            bins: Dict[int, int] = {}
+            for ring in cls.shards:
+                for slot in list(ring.slots):
+                    if 0 <= now - slot.second < seconds:
+                        for index, count in list(slot.bins.items()):
+                            bins[index] = bins.get(index, 0) + count
+            state[name] = [[index, count] for index, count in bins.items()]
+        return state
+
+    @classmethod
+    def combine(cls, states):
+        """
+        Returns count, rate per second and quantiles of every window.
+        """
+        stats = {}
+        for name, seconds in cls.windows:
+            bins: Dict[int, int] = {}
+            for state in states:
+                for index, count in state.get(name, []):
+                    bins[int(index)] = bins.get(int(index), 0) + count
+            stats[name] = cls.statistics(bins, seconds)
+        return stats
+
+    @classmethod
+    def statistics(cls, bins: Dict[int, int], seconds: int) -> dict:
+        total = sum(bins.values())
+        quantiles: Dict[float, float] = {}
+        if total:
+            targets: List[Tuple[float, float]] = sorted(
+                (quantile, quantile * total) for quantile in cls.quantiles
+            )
+            cumulative = 0
+            position = 0
+            for index in sorted(bins):
+                cumulative += bins[index]
+                while position < len(targets) and cumulative >= targets[position][1]:
+                    quantiles[targets[position][0]] = bin_value(index)
+                    position += 1
+        return {"count": total, "rate": total / seconds, "quantiles": quantiles}
+
+    @classmethod
+    def get(cls):
+        return cls.combine([cls.local_state()])
+
+    @classmethod
+    def set(cls, value):
+        """
+        Records the value as an observation of the current second, a windowed metric has no single value.
+        """
+        cls.observe(value)
+
+    @classmethod
+    def collect_families(cls, collector):
+        from prometheus_client.core import GaugeMetricFamily
+
+        stats = cls.merged_state()
+        quantiles = GaugeMetricFamily(
+            collector.name,
+            collector.documentation,
+            labels=["window", "quantile"],
+        )
+        for name, _ in cls.windows:
+            for quantile, value in sorted(stats[name]["quantiles"].items()):
+                quantiles.add_metric([name, str(quantile)], value)
+        yield quantiles
+        if cls.rate_name:
+            rates = GaugeMetricFamily(
+                cls.rate_name,
+                "Observations per second in the window.",
+                labels=["window"],
+            )
+            for name, _ in cls.windows:
+                rates.add_metric([name], stats[name]["rate"])
+            yield rates
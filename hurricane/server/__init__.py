@@ -1,28 +1,55 @@
 import asyncio
+import atexit
 import concurrent.futures
-import importlib.metadata
-import os
+import functools
+import math
+import multiprocessing
 import signal
 import sys
 import time
 import traceback
-from typing import Callable, Optional
+from typing import Callable, List, Optional
 
-import psutil  # type: ignore
 import tornado
+import tornado.ioloop
 from django.conf import settings
 from django.core.management import call_command
-from django.db import connections
-from django.db.migrations.executor import MigrationExecutor
 from tornado.autoreload import _reload
 
-from hurricane.management.commands import HURRICANE_DIST_VERSION
+from hurricane.management.commands import get_hurricane_dist_version
 from hurricane.metrics import (
     RequestCounterMetric,
+    ResponseErrorWindowMetric,
     ResponseTimeAverageMetric,
+    ResponseTimeWindowMetric,
     StartupTimeMetric,
     registry,
 )
+from hurricane.metrics.multiprocess import (
+    MultiProcessWriter,
+    enable_multiprocess,
+    get_multiprocess_store,
+)
+from hurricane.server.accesslog import (
+    AccessLogRecord,
+    get_access_log_writer,
+    make_access_log,
+)
+from hurricane.server.allocator import MallocTrimmer, get_malloc_trimmer
+from hurricane.server.cgroup import (
+    DEFAULT_CGROUP_ROOT,
+    cpu_allocation,
+    default_workers,
+    get_cgroup_monitor,
+    make_cgroup_monitor,
+)
+from hurricane.server.databases import close_database_checker, get_database_checker
+from hurricane.server.debug import (
+    ProfileHandler,
+    RouteMemoryHandler,
+    TracemallocHandler,
+    TracemallocSnapshotHandler,
+)
 from hurricane.server.django import (
     DjangoHandler,
     DjangoLivenessHandler,
@@ -31,13 +58,33 @@ from hurricane.server.django import (
     DjangoStaticFilesHandler,
     PrometheusHandler,
 )
+from hurricane.server.exposition import make_metrics_exposition
+from hurricane.server.garbage import freeze_gc
 from hurricane.server.loggers import STRUCTLOG_ENABLED, access_log, logger
+from hurricane.server.memory import (
+    SNAPSHOT_STORE,
+    make_route_memory_sampler,
+    process_rss,
+)
+from hurricane.server.probes import (
+    EventLoopLagMonitor,
+    MainLoopSnapshot,
+    ProbeCheckCache,
+    ProbeServerThread,
+)
+from hurricane.server.readiness import make_readiness_policies
+from hurricane.server.startup import run_management_command, startup_profile
+from hurricane.server.timing import make_server_timing
+from hurricane.server.watchdog import make_request_watchdog
 
 if STRUCTLOG_ENABLED:
     from structlog.contextvars import bind_contextvars
 
 EXECUTOR = None
 HTTP_CONFIGURED_EVENT = "HTTP configured"
+# bounds of the backoff (in seconds) while waiting for pending migrations to be applied
+MIGRATIONS_POLL_MIN_DELAY = 0.1
+MIGRATIONS_POLL_MAX_DELAY = 5.0
 
 
 class HurricaneApplication(tornado.web.Application):
@@ -54,16 +101,48 @@ class HurricaneApplication(tornado.web.Application):
 
     def log_request(self, handler: tornado.web.RequestHandler) -> None:
         """Writes a completed HTTP request to the logs."""
+        status = handler.get_status()
+        request_time = 1000.0 * handler.request.request_time()
+        sampler = self.settings.get("access_log_sampler")
+        if sampler is None or sampler.sample(status, request_time):
+            writer = self.settings.get("access_log_writer")
+            if writer is not None:
+                request = handler.request
+                writer.push(
+                    AccessLogRecord(
+                        time.time(),
+                        status,
+                        request.method or "",
+                        request.path,
+                        request_time,
+                        request.remote_ip,
+                        request.headers.get("X-Request-ID", "n/a"),
+                        request.headers.get("traceparent", "n/a"),
+                        request.protocol,
+                    )
+                )
+            else:
+                self._write_access_log(handler, request_time)
+        if self.collect_metrics:
+            RequestCounterMetric.increment()
+            ResponseTimeAverageMetric.add_value(request_time)
+            ResponseTimeWindowMetric.observe(request_time / 1000.0)
+            if status >= 500:
+                ResponseErrorWindowMetric.observe(request_time / 1000.0)
+
+    def _write_access_log(
+        self, handler: tornado.web.RequestHandler, request_time: float
+    ) -> None:
+        """Writes the access log entry of a request synchronously."""
         if handler.get_status() < 400:
             log_method = access_log.info
         elif handler.get_status() < 500:
             log_method = access_log.warning
         else:
             log_method = access_log.error
-        request_time = 1000.0 * handler.request.request_time()
         if STRUCTLOG_ENABLED:
             bind_contextvars(
-                hurricane=HURRICANE_DIST_VERSION,
+                hurricane=get_hurricane_dist_version(),
                 protocol=handler.request.protocol,
                 method=handler.request.method,
                 path=handler.request.path,
@@ -83,9 +162,6 @@ class HurricaneApplication(tornado.web.Application):
                 handler._request_summary(),
                 request_time,
             )
-        if self.collect_metrics:
-            RequestCounterMetric.increment()
-            ResponseTimeAverageMetric.add_value(request_time)
 
 
 class HurricaneProbeApplication(HurricaneApplication):
@@ -96,8 +172,24 @@ class HurricaneProbeApplication(HurricaneApplication):
         return
 
 
+def make_probe_check_cache(options, check_func):
+    """create the cache of background probe checks, if a check interval is set"""
+    interval = options.get("probe_check_interval")
+    if not interval:
+        return None
+    check_cache = ProbeCheckCache(
+        check_func,
+        tags=["liveness", "readiness"],
+        interval=float(interval),
+        timeout=float(options.get("probe_check_timeout") or 0) or None,
+    )
+    tornado.ioloop.IOLoop.current().spawn_callback(check_cache.run)
+    return check_cache
+
+
 def make_probe_server(options, check_func):
     """create probe route application"""
+    check_cache = make_probe_check_cache(options, check_func)
     handlers = [
         (
             options["liveness_probe"],
@@ -106,6 +198,8 @@ def make_probe_server(options, check_func):
                 "check_handler": check_func,
                 "webhook_url": options["webhook_url"],
                 "max_lifetime": options["max_lifetime"],
+                "check_cache": check_cache,
+                "fail_on_stuck_executor": options.get("stuck_executor_liveness", False),
             },
         ),
         (
@@ -115,13 +209,84 @@ def make_probe_server(options, check_func):
                 "check_handler": check_func,
                 "req_queue_len": options["req_queue_len"],
                 "webhook_url": options["webhook_url"],
+                "check_cache": check_cache,
+                "policies": make_readiness_policies(options),
             },
         ),
         (options["startup_probe"], DjangoStartupHandler),
     ]
     if with_metrics(options):
-        handlers.append((options["metrics_path"], PrometheusHandler))
-    return HurricaneProbeApplication(handlers, debug=options["debug"], metrics=False)
+        handlers.append(
+            (
+                options["metrics_path"],
+                PrometheusHandler,
+                {"exposition": make_metrics_exposition(options)},
+            )
+        )
+    handlers = add_debug_handlers(options, handlers)
+    # the probe application may be created first and thereby creates the executor of the process
+    return HurricaneProbeApplication(
+        handlers,
+        debug=options["debug"],
+        metrics=False,
+        workers=options.get("workers"),
+    )
+
+
+def add_debug_handlers(options, handlers):
+    """add the debugging endpoints to the probe routes, if a debug token is configured"""
+    token = options.get("debug_token")
+    if token:
+        debug_handlers = [
+            (r"/profile", ProfileHandler),
+            (r"/tracemalloc", TracemallocHandler),
+            (r"/tracemalloc/snapshots(?:/([0-9]+))?", TracemallocSnapshotHandler),
+            (r"/memory/routes", RouteMemoryHandler),
+        ]
+        endpoints = [
+            "/profile",
+            "/tracemalloc",
+            "/tracemalloc/snapshots",
+            "/memory/routes",
+        ]
+        if STRUCTLOG_ENABLED:
+            logger.info("Debug endpoints enabled", endpoints=endpoints)
+        else:
+            logger.info(
+                f"Debug endpoints enabled on the probe port: {', '.join(endpoints)}"
+            )
+        for route, handler in debug_handlers:
+            handlers.append((route, handler, {"token": token}))
+    return handlers
+
+
+def start_probe_thread(options, check_func, probe_port):
+    """run the probe application on a separate thread with its own IOLoop"""
+    probe_thread = ProbeServerThread(
+        functools.partial(make_probe_server, options, check_func), probe_port
+    )
+    probe_thread.start_and_listen()
+    # the request queue length can only be determined on the main loop
+    MainLoopSnapshot().start()
+    if STRUCTLOG_ENABLED:
+        logger.info("Probe thread started", port=probe_port)
+    else:
+        logger.info("Probe application is running on a separate thread")
+    return probe_thread
+
+
+def start_multiprocess_metrics(directory):
+    """share the metrics of this process with other processes using the given directory"""
+    store = enable_multiprocess(directory)
+    store.write()
+    writer = MultiProcessWriter(store)
+    writer.start()
+    atexit.register(writer.stop)
+    if STRUCTLOG_ENABLED:
+        logger.info("Multi-process metrics", directory=directory, id=store.instance)
+    else:
+        logger.info(f"Sharing metrics with other processes in {directory}")
+    return store
 
 
 def with_metrics(options):
@@ -141,11 +306,18 @@ def make_http_server(options, check_func, include_probe=False):
 
     # append the django routing system
     handlers.append((".*", DjangoHandler))
+    access_log_sampler, access_log_writer = make_access_log(options)
     return HurricaneApplication(
         handlers,
         debug=options["debug"],
         metrics=not options.get("no_metrics", False),
         workers=options.get("workers"),
+        server_timing=make_server_timing(options),
+        access_log_sampler=access_log_sampler,
+        access_log_writer=access_log_writer,
+        request_watchdog=make_request_watchdog(options),
+        route_memory_sampler=make_route_memory_sampler(options),
+        cgroup_monitor=make_cgroup_monitor(options),
     )
 
 
@@ -203,6 +375,7 @@ def add_static_handler(options, handlers):
 
 
 def get_integrated_probe_handler(options, check_func):
+    check_cache = make_probe_check_cache(options, check_func)
     handlers = [
         (
             options["liveness_probe"],
@@ -211,6 +384,8 @@ def get_integrated_probe_handler(options, check_func):
                 "check_handler": check_func,
                 "webhook_url": options["webhook_url"],
                 "max_lifetime": options["max_lifetime"],
+                "check_cache": check_cache,
+                "fail_on_stuck_executor": options.get("stuck_executor_liveness", False),
             },
         ),
         (
@@ -220,12 +395,20 @@ def get_integrated_probe_handler(options, check_func):
                 "check_handler": check_func,
                 "req_queue_len": options["req_queue_len"],
                 "webhook_url": options["webhook_url"],
+                "check_cache": check_cache,
+                "policies": make_readiness_policies(options),
             },
         ),
         (options["startup_probe"], DjangoStartupHandler),
     ]
     if with_metrics(options):
-        handlers.append((options["metrics_path"], PrometheusHandler))
+        handlers.append(
+            (
+                options["metrics_path"],
+                PrometheusHandler,
+                {"exposition": make_metrics_exposition(options)},
+            )
+        )
     return handlers
 
 
@@ -237,12 +420,18 @@ def make_http_server_and_listen(
 
     if not STRUCTLOG_ENABLED:
         logger.info(f"Starting HTTP Server on port {options['port']}")
-    django_application = make_http_server(options, check, include_probe)
-    django_application.listen(
-        options["port"],
-        max_body_size=options.get("max_body_size", 1024 * 1024 * 100),
-        max_buffer_size=options.get("max_buffer_size", 1024 * 1024 * 100),
-    )
+    with startup_profile.phase("listen"):
+        django_application = make_http_server(options, check, include_probe)
+        if options.get("gc_freeze"):
+            # management commands (e.g. warming caches) are finished and no request was served yet
+            freeze_gc()
+        django_application.listen(
+            options["port"],
+            max_body_size=options.get("max_body_size", 1024 * 1024 * 100),
+            max_buffer_size=options.get("max_buffer_size", 1024 * 1024 * 100),
+        )
+    if with_metrics(options):
+        EventLoopLagMonitor().start()
     StartupWebhook().run(
         url=options["webhook_url"] or None, status=WebhookStatus.SUCCEEDED
     )
@@ -251,27 +440,29 @@ def make_http_server_and_listen(
     # if startup time metric value is set - startup process is finished
     StartupTimeMetric.set(time_elapsed)
     if with_metrics(options):
-        try:
-            hurricane_dist_version = importlib.metadata.version("django-hurricane")
-        except importlib.metadata.PackageNotFoundError:
-            hurricane_dist_version = "unknown"
         registry.metrics["hurricane"].set(
             {
-                "version": hurricane_dist_version,
+                "version": get_hurricane_dist_version(),
                 "startup_time_seconds": str(round(time_elapsed, 5)),
                 "server_port": str(options["port"]),
                 "serve_static": "true" if options["static"] else "false",
                 "serve_media": "true" if options["media"] else "false",
                 "probe_port": str(options["probe_port"]),
                 "commands": ",".join(
-                    [item for row in options.get("command", []) for item in row]
+                    [
+                        command
+                        for group in command_groups(options["command"])
+                        for command in group
+                    ]
                     if options.get("command")
                     else ""
                 ),
             }
         )
     if STRUCTLOG_ENABLED:
-        workers = options.get("workers") or min(32, (os.cpu_count() or 1) + 4)
+        workers = options.get("workers") or default_workers(
+            cpu_allocation(options.get("cgroup_root") or DEFAULT_CGROUP_ROOT).effective
+        )
         logger.info(
             HTTP_CONFIGURED_EVENT,
             time=time_elapsed,
@@ -280,95 +471,139 @@ def make_http_server_and_listen(
         )
     else:
         logger.info(f"Startup time is {time_elapsed} seconds")
+    startup_profile.report(start_time, export=with_metrics(options))
 
 
 def command_task(
     commands: list,
     webhook_url: Optional[str] = None,
     loop: Optional[asyncio.unix_events.SelectorEventLoop] = None,
+    cgroup_root: str = DEFAULT_CGROUP_ROOT,
 ) -> None:
-    from hurricane.webhooks import StartupWebhook
-    from hurricane.webhooks.base import WebhookStatus
-
+    """
+    Executes the given management commands before the HTTP server is started. Every entry of ``commands`` is a group
+    of commands (e.g. ``--command collectstatic compilemessages``): groups are executed one after another, the
+    commands of a group do not depend on each other and are executed concurrently in a process pool, which is sized
+    by the CPUs allocated to the cgroup at ``cgroup_root``.
+    """
     if not STRUCTLOG_ENABLED:
         logger.info("Starting execution of management commands")
-    for command in commands:
-        # split a command string to get command options
-        command_split = command[0].split()
-        if not STRUCTLOG_ENABLED:
-            logger.info(
-                f"Starting execution of command {command_split[0]} with arguments {command_split[1:]}"
-            )
-        start_time_command = time.time()
-        # call management command
-        try:
-            call_command(*command_split)
-        except Exception as e:
-            logger.error(e)
-            error_trace = traceback.format_exc()
-            if STRUCTLOG_ENABLED:
-                logger.info(
-                    "Webhook",
-                    url=webhook_url or None,
-                    error_trace=error_trace,
-                    status=WebhookStatus.FAILED,
-                )
+    with startup_profile.phase("commands"):
+        for group in command_groups(commands):
+            if len(group) == 1:
+                try:
+                    execute_command(group[0])
+                except Exception as e:
+                    _command_failed(e, webhook_url, loop)
+                    raise e
             else:
-                logger.info("Webhook with a status failed has been initiated")
-            # webhook is registered and run in a new thread, not blocking the process
-            StartupWebhook().run(
-                url=webhook_url or None,
-                error_trace=error_trace,
-                close_loop=True,
-                status=WebhookStatus.FAILED,
-                loop=loop,
-            )
-            raise e
+                execute_command_group(group, webhook_url, loop, cgroup_root)
+
+
+def command_groups(commands: list) -> List[List[str]]:
+    # a single command string (e.g. from settings) forms a group on its own
+    if isinstance(commands, str):
+        commands = [commands]
+    return [[group] if isinstance(group, str) else list(group) for group in commands]
 
-        end_time_command = time.time()
-        if STRUCTLOG_ENABLED:
-            logger.info(
-                "Command executed",
-                command=command_split,
-                time=end_time_command - start_time_command,
-            )
-        else:
-            logger.info(
-                f"Command {command_split[0]} was executed in {end_time_command - start_time_command} seconds"
-            )
+
+def execute_command(command: str) -> float:
+    # split a command string to get command options
+    command_split = command.split()
+    if not STRUCTLOG_ENABLED:
+        logger.info(
+            f"Starting execution of command {command_split[0]} with arguments {command_split[1:]}"
+        )
+    time_elapsed = run_management_command(command)
+    _command_executed(command_split, time_elapsed)
+    return time_elapsed
+
+
+def execute_command_group(
+    group: List[str],
+    webhook_url: Optional[str] = None,
+    loop: Optional[asyncio.unix_events.SelectorEventLoop] = None,
+    cgroup_root: str = DEFAULT_CGROUP_ROOT,
+) -> None:
+    if STRUCTLOG_ENABLED:
+        logger.info("Executing commands in parallel", commands=group)
+    else:
+        logger.info(f"Starting execution of commands {group} in parallel")
+    max_workers = min(len(group), math.ceil(cpu_allocation(cgroup_root).effective))
+    # management commands are run in separate processes, spawned processes set up Django on their own
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = {
+            executor.submit(run_management_command, command): command
+            for command in group
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                time_elapsed = future.result()
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                _command_failed(e, webhook_url, loop)
+                raise e
+            _command_executed(futures[future].split(), time_elapsed)
+
+
+def _command_executed(command_split: List[str], time_elapsed: float) -> None:
+    startup_profile.record(f"command:{command_split[0]}", time_elapsed)
+    if STRUCTLOG_ENABLED:
+        logger.info(
+            "Command executed",
+            command=command_split,
+            time=time_elapsed,
+        )
+    else:
+        logger.info(
+            f"Command {command_split[0]} was executed in {time_elapsed} seconds"
+        )
+
+
+def _command_failed(
+    e: Exception,
+    webhook_url: Optional[str] = None,
+    loop: Optional[asyncio.unix_events.SelectorEventLoop] = None,
+) -> None:
+    from hurricane.webhooks import StartupWebhook
+    from hurricane.webhooks.base import WebhookStatus
+
+    logger.error(e)
+    error_trace = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+    if STRUCTLOG_ENABLED:
+        logger.info(
+            "Webhook",
+            url=webhook_url or None,
+            error_trace=error_trace,
+            status=WebhookStatus.FAILED,
+        )
+    else:
+        logger.info("Webhook with a status failed has been initiated")
+    # webhook is registered and run in a new thread, not blocking the process
+    StartupWebhook().run(
+        url=webhook_url or None,
+        error_trace=error_trace,
+        close_loop=True,
+        status=WebhookStatus.FAILED,
+        loop=loop,
+    )
 
 
 def check_databases():
-    for db_name in connections:
-        connection = connections[db_name]
-        cursor = connection.cursor()
-        try:
-            cursor.execute("SELECT (1)")
-            if STRUCTLOG_ENABLED:
-                logger.info("Database check successful", database=db_name)
-            else:
-                logger.info("Database was checked successfully")
-            cursor.close()
-            return True
-        except Exception as e:
-            if STRUCTLOG_ENABLED:
-                logger.info("Database check unsuccessful", database=db_name)
-            else:
-                logger.warning(f"Database command execution has failed with {e}")
-            cursor.close()
-            return False
+    """
+    Checks all configured databases concurrently. Returns True if all of them are available.
+    """
+    return get_database_checker().check_databases()
 
 
 def count_migrations():
-    number_of_migrations = 0
-    for db_name in connections:
-        connection = connections[db_name]
-        if hasattr(connection, "prepare_database"):
-            connection.prepare_database()
-        executor = MigrationExecutor(connection)
-        targets = executor.loader.graph.leaf_nodes()
-        number_of_migrations += len(executor.migration_plan(targets))
-    return number_of_migrations
+    """
+    Counts the pending migrations of all configured databases concurrently.
+    """
+    return get_database_checker().count_migrations()
 
 
 def signal_handler(signal, frame):
@@ -387,17 +622,26 @@ def check_db_and_migrations(
     from hurricane.webhooks import StartupWebhook
     from hurricane.webhooks.base import WebhookStatus
 
+    start_time_check = time.time()
+    delay = MIGRATIONS_POLL_MIN_DELAY
+    previous_number_of_migrations = None
     try:
         while check_databases():
             number_of_migrations = count_migrations()
 
-            logger.info(f"There are {number_of_migrations} pending migrations")
+            if number_of_migrations != previous_number_of_migrations:
+                logger.info(f"There are {number_of_migrations} pending migrations")
             if number_of_migrations == 0:
                 logger.info("No pending migrations")
                 break
             elif not apply_migration:
-                logger.info("Migrations are pending")
-                time.sleep(1)
+                if number_of_migrations != previous_number_of_migrations:
+                    logger.info("Migrations are pending")
+                    # migrations are being applied elsewhere, poll frequently again
+                    delay = MIGRATIONS_POLL_MIN_DELAY
+                time.sleep(delay)
+                delay = min(delay * 2, MIGRATIONS_POLL_MAX_DELAY)
+            previous_number_of_migrations = number_of_migrations
 
             if apply_migration:
                 logger.info("Applying migrations")
@@ -423,6 +667,9 @@ def check_db_and_migrations(
             loop=loop,
         )
         raise e
+    finally:
+        close_database_checker()
+        startup_profile.record("check_migrations", time.time() - start_time_check)
 
 
 def sanitize_probes(options):
@@ -458,6 +705,21 @@ def add_trailing_slash(options, probe_name):
         return probe + "/{0,1}"
 
 
+def dump_memory_snapshot(directory: str) -> None:
+    """write a tracemalloc snapshot to the given directory, so it can be analysed after the restart"""
+    try:
+        path = SNAPSHOT_STORE.dump(directory)
+    except OSError as e:
+        logger.error(f"Could not write memory snapshot to {directory}: {e}")
+        return
+    if path is None:
+        logger.warning("No memory snapshot written, as tracemalloc is not tracing")
+    elif STRUCTLOG_ENABLED:
+        logger.info("Memory snapshot written", path=path)
+    else:
+        logger.info(f"Memory snapshot written to {path}")
+
+
 def static_watch():
     try:
         logger.info("Collecting static as static file changed")
@@ -466,13 +728,25 @@ def static_watch():
         logger.error(e)
 
 
-async def check_mem_allocations(maximum_memory: int):
+async def check_mem_allocations(
+    maximum_memory: Optional[int],
+    snapshot_dir: Optional[str] = None,
+    trimmer: Optional[MallocTrimmer] = None,
+):
+    loop = asyncio.get_running_loop()
     restarts = 0
     while True:
-        current = psutil.Process().memory_info().rss / (1024 * 1024)
+        current = process_rss() / (1024 * 1024)
         logger.debug(f"Current virtual memory usage is {current}MB")
         current_mb = current
-        if current_mb > maximum_memory:
+        if trimmer is not None and (
+            trimmer.due(current_mb) or (maximum_memory and current_mb > maximum_memory)
+        ):
+            # a fragmented heap is no leak: only restart if the memory is still too high after trimming
+            trimmed = await loop.run_in_executor(None, trimmer.trim)
+            if trimmed is not None:
+                current_mb = trimmed[1] / (1024 * 1024)
+        if maximum_memory and current_mb > maximum_memory:
             restarts += 1
             if STRUCTLOG_ENABLED:
                 logger.warning(
@@ -486,5 +760,61 @@ async def check_mem_allocations(maximum_memory: int):
                     f"Memory (rss) usage is too high. Restarting. Current memory usage is {current_mb}MB; "
                     f"Maximum memory allowed is {maximum_memory}MB (restart #{restarts})"
                 )
-            _reload()
+            restart_process(snapshot_dir)
         await asyncio.sleep(10)
+
+
+def restart_process(snapshot_dir: Optional[str] = None) -> None:
+    """
+    Restarts the process in place, because it uses too much memory. Before, a memory snapshot is written to the
+    snapshot directory, the queued access logs are written and the shared metrics of the process are removed, as the
+    restart skips the exit handlers.
+    """
+    if snapshot_dir:
+        dump_memory_snapshot(snapshot_dir)
+    writer = get_access_log_writer()
+    if writer is not None:
+        writer.flush()
+    store = get_multiprocess_store()
+    if store is not None:
+        store.remove()
+    _reload()
+
+
+async def recycle_cgroup(reason: str, snapshot_dir: Optional[str] = None) -> None:
+    """
+    Recycles the process, because the cgroup is running out of memory. Like a memory-triggered reload, the heap is
+    trimmed first and the process is only restarted, if the reason still holds afterwards.
+    """
+    monitor = get_cgroup_monitor()
+    trimmer = get_malloc_trimmer()
+    if monitor is not None and trimmer is not None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, trimmer.trim)
+        remaining = monitor.recycle_reason(
+            await loop.run_in_executor(None, monitor.cgroup.memory)
+        )
+        if remaining is None:
+            logger.info("Recycling the process is not needed after trimming the heap")
+            monitor.recycled = False
+            return
+        reason = remaining
+    if STRUCTLOG_ENABLED:
+        logger.warning("Recycling the process", reason=reason)
+    else:
+        logger.warning(f"Recycling the process: {reason}")
+    restart_process(snapshot_dir)
+
+
+def start_cgroup_monitor(options: dict):
+    """
+    Starts the cgroup monitor, if it is configured. It runs on a thread of its own, the process is recycled on the
+    event loop of the calling thread.
+    """
+    loop = tornado.ioloop.IOLoop.current()
+    snapshot_dir = options.get("memory_snapshot_dir")
+
+    def recycle(reason: str) -> None:
+        loop.add_callback(recycle_cgroup, reason, snapshot_dir)
+
+    return make_cgroup_monitor(options, recycle)
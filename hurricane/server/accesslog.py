@@ -0,0 +1,286 @@
+import atexit
+import collections
+import datetime
+import json
+import logging
+import random
+import threading
+from typing import IO, Any, List, NamedTuple, Optional, Tuple
+
+from hurricane.management.commands import get_hurricane_dist_version
+from hurricane.metrics import AccessLogDroppedMetric
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+
+try:
+    import orjson
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+except ImportError:  # pragma: no cover
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+
+DEFAULT_ACCESS_LOG_QUEUE_SIZE = 10000
+DEFAULT_ACCESS_LOG_BATCH_SIZE = 500
+DEFAULT_ACCESS_LOG_INTERVAL = 0.1
+ACCESS_LOGGER = "hurricane.server.access"
+
+
+class AccessLogRecord(NamedTuple):
+    """
+    Compact access log entry, which is pushed by the request hot path. Formatting happens on the writer thread.
+    """
+
+    timestamp: float
+    status: int
+    method: str
+    path: str
+    request_time: float
+    remote_ip: Optional[str]
+    request_id: str
+    traceparent: str
+    protocol: str
+
+    @property
+    def levelno(self) -> int:
+        if self.status < 400:
+            return logging.INFO
+        elif self.status < 500:
+            return logging.WARNING
+        return logging.ERROR
+
+
+class AccessLogSampler:
+    """
+    Decides, which requests are logged: responses with status 400 or above and requests, which took at least
+    ``slow`` milliseconds, are always logged; all other responses are logged with the probability ``rate``.
+    """
+
+    def __init__(self, rate: float = 1.0, slow: Optional[float] = None) -> None:
+        self.rate = rate
+        self.slow = slow
+
+    def sample(self, status: int, request_time: float) -> bool:
+        if status >= 400 or self.rate >= 1:
+            return True
+        if self.slow is not None and request_time >= self.slow:
+            return True
+        return random.random() < self.rate
+
+
+class AccessLogWriter(threading.Thread):
+    """
+    Writes access log records on a background thread, so a slow or blocked log stream (e.g. a full pipe to the
+    container runtime) never stalls the event loop. The hot path only appends a record to a deque, which is
+    thread-safe without a lock. The writer drains the deque in a fixed interval and writes the records in batches.
+    If the deque is full, records are dropped and counted.
+
+    Records are written like records of the access logger: its level, the levels and filters of its handlers
+    (including the ones it propagates to) apply. Stream handlers get one write per batch, other handlers get the
+    records one by one. With structlog, records are written as JSON lines, otherwise they are formatted by the
+    formatter of the handler like the synchronous access log. If ``stream`` is given, JSON lines are written to it
+    instead of the handlers.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[IO[str]] = None,
+        max_queue: int = DEFAULT_ACCESS_LOG_QUEUE_SIZE,
+        batch_size: int = DEFAULT_ACCESS_LOG_BATCH_SIZE,
+        interval: float = DEFAULT_ACCESS_LOG_INTERVAL,
+    ) -> None:
+        super().__init__(name="hurricane-access-log", daemon=True)
+        self.stream = stream
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.logger = logging.getLogger(ACCESS_LOGGER)
+        self.queue: collections.deque = collections.deque()
+        self.version = get_hurricane_dist_version()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+
+    def push(self, record: AccessLogRecord) -> None:
+        if not self.logger.isEnabledFor(record.levelno):
+            return
+        if len(self.queue) >= self.max_queue:
+            AccessLogDroppedMetric.increment()
+            return
+        self.queue.append(record)
+
+    def format(self, record: AccessLogRecord) -> str:
+        """
+        Returns the record as JSON line with the fields of the structured access log.
+        """
+        return dumps(
+            {
+                "timestamp": datetime.datetime.fromtimestamp(
+                    record.timestamp, datetime.timezone.utc
+                ).isoformat(),
+                "level": logging.getLevelName(record.levelno).lower(),
+                "logger": ACCESS_LOGGER,
+                "event": f"TX {record.method} {record.path} {round(record.request_time, 2)}ms",
+                "hurricane": self.version,
+                "protocol": record.protocol,
+                "method": record.method,
+                "path": record.path,
+                "status": record.status,
+                "request_time": record.request_time,
+                "remote_ip": record.remote_ip,
+                "id": record.request_id,
+                "traceparent": record.traceparent,
+            }
+        )
+
+    def log_record(self, record: AccessLogRecord) -> logging.LogRecord:
+        """
+        Returns the record as record of the access logger with the message of the synchronous access log.
+        """
+        log_record = self.logger.makeRecord(
+            self.logger.name,
+            record.levelno,
+            __file__,
+            0,
+            "%d %s %.2fms",
+            (
+                record.status,
+                f"{record.method} {record.path} ({record.remote_ip})",
+                record.request_time,
+            ),
+            None,
+        )
+        log_record.created = record.timestamp
+        log_record.msecs = (record.timestamp - int(record.timestamp)) * 1000
+        return log_record
+
+    def handlers(self) -> List[logging.Handler]:
+        """
+        Returns the handlers of the access logger and of the loggers it propagates to.
+        """
+        handlers: List[logging.Handler] = []
+        logger: Optional[logging.Logger] = self.logger
+        while logger is not None:
+            handlers.extend(logger.handlers)
+            logger = logger.parent if logger.propagate else None
+        if not handlers and logging.lastResort is not None:
+            handlers.append(logging.lastResort)
+        return handlers
+
+    def write(self, records: List[AccessLogRecord]) -> None:
+        if self.stream is not None:
+            self.write_stream(self.stream, [self.format(record) for record in records])
+            return
+        log_records = [
+            log_record
+            for log_record in map(self.log_record, records)
+            if self.logger.filter(log_record)
+        ]
+        for handler in self.handlers():
+            selected = [
+                (record, log_record)
+                for record, log_record in zip(records, log_records)
+                if log_record.levelno >= handler.level and handler.filter(log_record)
+            ]
+            if not selected:
+                continue
+            # a file handler, which delays opening the file, has no stream yet
+            if (
+                isinstance(handler, logging.StreamHandler)
+                and handler.stream is not None
+            ):
+                lines = [
+                    self.format(record)
+                    if STRUCTLOG_ENABLED
+                    else handler.format(log_record)
+                    for record, log_record in selected
+                ]
+                handler.acquire()
+                try:
+                    self.write_stream(handler.stream, lines, handler.terminator)
+                finally:
+                    handler.release()
+            else:
+                for _, log_record in selected:
+                    handler.handle(log_record)
+
+    def write_stream(
+        self, stream: IO[str], lines: List[str], terminator: str = "\n"
+    ) -> None:
+        try:
+            stream.write(terminator.join(lines) + terminator)
+            stream.flush()
+        except (OSError, ValueError):
+            AccessLogDroppedMetric.increment(len(lines))
+
+    def flush(self) -> None:
+        """
+        Writes all queued records in batches.
+        """
+        with self._flush_lock:
+            while self.queue:
+                records: List[AccessLogRecord] = []
+                while self.queue and len(records) < self.batch_size:
+                    records.append(self.queue.popleft())
+                self.write(records)
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def stop(self) -> None:
+        """
+        Stops the writer and writes the remaining records.
+        """
+        self._stopped.set()
+        if self.is_alive():
+            self.join(self.interval * 10)
+        self.flush()
+
+
+ACCESS_LOG_WRITER: Optional[AccessLogWriter] = None
+
+
+def get_access_log_writer() -> Optional[AccessLogWriter]:
+    return ACCESS_LOG_WRITER
+
+
+def start_access_log_writer(
+    max_queue: int = DEFAULT_ACCESS_LOG_QUEUE_SIZE,
+) -> AccessLogWriter:
+    """
+    Starts the access log writer of this process, unless it is already running.
+    """
+    global ACCESS_LOG_WRITER
+    if ACCESS_LOG_WRITER is None:
+        ACCESS_LOG_WRITER = AccessLogWriter(max_queue=max_queue)
+        ACCESS_LOG_WRITER.start()
+        atexit.register(ACCESS_LOG_WRITER.stop)
+        if STRUCTLOG_ENABLED:
+            logger.info("Asynchronous access log", queue_size=max_queue)
+        else:
+            logger.info(f"Writing access logs asynchronously (queue size {max_queue})")
+    return ACCESS_LOG_WRITER
+
+
+def make_access_log(
+    options: dict,
+) -> Tuple[Optional[AccessLogSampler], Optional[AccessLogWriter]]:
+    """
+    Returns the access log sampler and writer of the options. Both are None, if all requests are logged
+    synchronously.
+    """
+    rate = options.get("access_log_sample")
+    rate = float(rate) if rate is not None else 1.0
+    slow = options.get("access_log_slow")
+    sampler = None
+    if rate < 1:
+        sampler = AccessLogSampler(rate, float(slow) if slow is not None else None)
+    writer = None
+    if options.get("access_log_async"):
+        writer = start_access_log_writer(
+            int(options.get("access_log_queue_size") or DEFAULT_ACCESS_LOG_QUEUE_SIZE)
+        )
+    return sampler, writer
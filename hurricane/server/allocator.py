@@ -0,0 +1,168 @@
+import ctypes
+import ctypes.util
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from hurricane.metrics import MallocTrimMetric, MallocTrimRSSMetric
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+from hurricane.server.memory import process_rss
+
+MALLINFO_FIELDS = (
+    "arena",
+    "ordblks",
+    "smblks",
+    "hblks",
+    "hblkhd",
+    "usmblks",
+    "fsmblks",
+    "uordblks",
+    "fordblks",
+    "keepcost",
+)
+
+
+class MallInfo2(ctypes.Structure):
+    """
+    ``struct mallinfo2`` of glibc 2.33 and later.
+    """
+
+    _fields_ = [(field, ctypes.c_size_t) for field in MALLINFO_FIELDS]
+
+
+_libc: Optional[ctypes.CDLL] = None
+_libc_loaded = False
+
+
+def libc() -> Optional[ctypes.CDLL]:
+    """
+    Returns the C library, if it is glibc, or None otherwise (e.g. musl in Alpine images or on macOS).
+    """
+    global _libc, _libc_loaded
+    if not _libc_loaded:
+        _libc_loaded = True
+        try:
+            library = ctypes.CDLL(ctypes.util.find_library("c"))
+        except OSError:
+            return None
+        if hasattr(library, "malloc_trim"):
+            library.malloc_trim.argtypes = [ctypes.c_size_t]
+            library.malloc_trim.restype = ctypes.c_int
+            if hasattr(library, "mallinfo2"):
+                library.mallinfo2.argtypes = []
+                library.mallinfo2.restype = MallInfo2
+            _libc = library
+    return _libc
+
+
+def malloc_info() -> Optional[Dict[str, int]]:
+    """
+    Returns the statistics of the allocator (``mallinfo2``) or None, if they are not available.
+    """
+    library = libc()
+    if library is None or not hasattr(library, "mallinfo2"):
+        return None
+    info = library.mallinfo2()
+    return {field: getattr(info, field) for field in MALLINFO_FIELDS}
+
+
+class MallocTrimmer:
+    """
+    Returns free memory of the glibc heap to the system with ``malloc_trim(0)``. Long running processes fragment the
+    heap: memory freed by Python stays mapped, if a single chunk in the same page is still in use, and the resident set
+    size only grows. Trimming releases all free pages of all arenas, not only at the top of the heap.
+
+    The heap is trimmed every ``interval`` seconds and after the resident set size grew by ``spike`` MB since the last
+    trim. The resident set size before and after every trim is logged and exported.
+    """
+
+    def __init__(
+        self, interval: Optional[float] = None, spike: Optional[float] = None
+    ) -> None:
+        self.interval = interval
+        self.spike = spike
+        self.last_trim = time.monotonic()
+        self.last_rss_mb: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return libc() is not None
+
+    def due(self, rss_mb: float) -> bool:
+        """
+        Returns True if the heap is due to be trimmed according to interval and spike.
+        """
+        if self.last_rss_mb is None:
+            self.last_rss_mb = rss_mb
+        if self.interval and time.monotonic() - self.last_trim >= self.interval:
+            return True
+        return bool(self.spike is not None and rss_mb - self.last_rss_mb >= self.spike)
+
+    def trim(self) -> Optional[Tuple[int, int]]:
+        """
+        Trims the heap and returns the resident set size in bytes before and after or None, if ``malloc_trim`` is
+        not available. All threads, which allocate memory, wait while the arenas are trimmed, so this should not be
+        called on the event loop.
+        """
+        library = libc()
+        if library is None:
+            return None
+        with self._lock:
+            before = process_rss()
+            start = time.perf_counter()
+            library.malloc_trim(0)
+            duration = time.perf_counter() - start
+            after = process_rss()
+            self.last_trim = time.monotonic()
+            self.last_rss_mb = after / (1024 * 1024)
+        MallocTrimMetric.increment()
+        MallocTrimRSSMetric.set({"before": before, "after": after})
+        if STRUCTLOG_ENABLED:
+            logger.info(
+                "Heap trimmed",
+                rss_before=before,
+                rss_after=after,
+                seconds=duration,
+            )
+        else:
+            logger.info(
+                f"Heap trimmed in {duration * 1000:.1f}ms, memory (rss) reduced from {before / (1024 * 1024):.1f}MB "
+                f"to {after / (1024 * 1024):.1f}MB"
+            )
+        return before, after
+
+
+MALLOC_TRIMMER: Optional[MallocTrimmer] = None
+
+
+def get_malloc_trimmer() -> Optional[MallocTrimmer]:
+    return MALLOC_TRIMMER
+
+
+def make_malloc_trimmer(options: dict) -> Optional[MallocTrimmer]:
+    """
+    Returns the heap trimmer of the options or None, if the heap is not trimmed.
+    """
+    global MALLOC_TRIMMER
+    interval = options.get("malloc_trim_interval")
+    spike = options.get("malloc_trim_spike")
+    if not options.get("malloc_trim") and not interval and not spike:
+        return None
+    trimmer = MallocTrimmer(
+        float(interval) if interval else None, float(spike) if spike else None
+    )
+    if not trimmer.available:
+        logger.warning(
+            "malloc_trim is not available (glibc is required), the heap is not trimmed"
+        )
+        return None
+    if STRUCTLOG_ENABLED:
+        logger.info("Heap trimming", interval=trimmer.interval, spike_mb=trimmer.spike)
+    else:
+        logger.info(
+            f"Trimming the heap before memory-triggered reloads (interval: {trimmer.interval}s, "
+            f"spike: {trimmer.spike}Mb)"
+        )
+    MALLOC_TRIMMER = trimmer
+    return trimmer
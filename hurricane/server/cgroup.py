@@ -0,0 +1,439 @@
+import atexit
+import math
+import os
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from hurricane.metrics import CPUCountMetric, ExecutorWorkersMetric
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+from hurricane.server.readiness import (
+    DEFAULT_READINESS_RECOVERY,
+    DEFAULT_READINESS_WINDOW,
+    PressurePolicy,
+    ReadinessPolicy,
+)
+
+DEFAULT_CGROUP_ROOT = "/sys/fs/cgroup"
+DEFAULT_CGROUP_INTERVAL = 1.0
+# the executor of the standard library defaults to the number of CPUs + 4 workers, but at most 32
+MAX_DEFAULT_WORKERS = 32
+# memory events, which mean that the cgroup is at its limit; they are logged, whenever they occur
+MEMORY_LIMIT_EVENTS = ("max", "oom", "oom_kill")
+# resources with pressure stall information and the options of their shedding thresholds
+PRESSURE_RESOURCES = (
+    ("memory", "memory_pressure_shed"),
+    ("cpu", "cpu_pressure_shed"),
+    ("io", "io_pressure_shed"),
+)
+
+
+def parse_pressure(text: str) -> Dict[str, Dict[str, float]]:
+    """
+    Parses pressure stall information (e.g. ``memory.pressure``) into the averages (in percent) and the total stall
+    time (in microseconds) per line, e.g. ``{"some": {"avg10": 1.5, ...}, "full": {...}}``.
+    """
+    pressure: Dict[str, Dict[str, float]] = {}
+    for line in text.splitlines():
+        kind, *fields = line.split()
+        if not fields:
+            continue
+        pressure[kind] = {
+            key: float(value)
+            for key, value in (field.split("=", 1) for field in fields)
+        }
+    return pressure
+
+
+def parse_flat_keyed(text: str) -> Dict[str, int]:
+    """
+    Parses a flat keyed cgroup file (e.g. ``memory.events`` or ``memory.stat``) with one key and value per line.
+    """
+    values: Dict[str, int] = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            values[parts[0]] = int(parts[1])
+    return values
+
+
+def cgroup_path(root: str) -> str:
+    """
+    Returns the cgroup (v2) of this process below the given root. Within a container, the root is usually the cgroup
+    of the container already.
+    """
+    try:
+        with open("/proc/self/cgroup") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return root
+    for line in lines:
+        if line.startswith("0::"):
+            candidate = os.path.join(root, line[3:].strip("/"))
+            if os.path.exists(os.path.join(candidate, "cgroup.controllers")):
+                return candidate
+    return root
+
+
+class Cgroup:
+    """
+    Reads the interface files of a cgroup v2. Missing or unreadable files are reported as None, as controllers can be
+    disabled and pressure stall information needs a kernel with PSI enabled.
+    """
+
+    def __init__(self, root: str = DEFAULT_CGROUP_ROOT) -> None:
+        self.root = root
+        self.path = cgroup_path(root)
+
+    @property
+    def available(self) -> bool:
+        """
+        True if the memory or the CPU controller is enabled for the cgroup.
+        """
+        return any(
+            os.path.exists(os.path.join(self.path, name))
+            for name in ("memory.current", "cpu.stat")
+        )
+
+    def read(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def read_int(self, name: str) -> Optional[int]:
+        """
+        Returns the value of a single value file or None, if the value is ``max`` (no limit).
+        """
+        value = self.read(name)
+        if value is None or value.strip() == "max":
+            return None
+        return int(value)
+
+    def read_flat_keyed(self, name: str) -> Dict[str, int]:
+        value = self.read(name)
+        return parse_flat_keyed(value) if value is not None else {}
+
+    def pressure(self, resource: str) -> Optional[Dict[str, Dict[str, float]]]:
+        value = self.read(f"{resource}.pressure")
+        return parse_pressure(value) if value else None
+
+    def memory(self) -> Dict[str, Optional[int]]:
+        """
+        Returns the memory limit, the current usage and the working set in bytes. The working set is the usage without
+        inactive file pages, which are reclaimed before the OOM killer acts; it is the value the kubelet evicts on.
+        """
+        current = self.read_int("memory.current")
+        working_set = None
+        if current is not None:
+            inactive_file = self.read_flat_keyed("memory.stat").get("inactive_file", 0)
+            working_set = max(0, current - inactive_file)
+        return {
+            "limit": self.read_int("memory.max"),
+            "current": current,
+            "working_set": working_set,
+        }
+
+    def cpu_throttling(self) -> Dict[str, float]:
+        """
+        Returns the CFS periods with runnable tasks and the periods and seconds, in which the cgroup was throttled,
+        because it used up its CPU quota (``cpu.stat``). All values are counted since the cgroup was created.
+        """
+        stat = self.read_flat_keyed("cpu.stat")
+        if "nr_periods" not in stat:
+            return {}
+        return {
+            "periods": stat["nr_periods"],
+            "throttled_periods": stat.get("nr_throttled", 0),
+            "throttled_seconds": stat.get("throttled_usec", 0) / 1000000,
+        }
+
+    def cpu_quota(self) -> Optional[float]:
+        """
+        Returns the CPU quota of the cgroup in CPUs (``cpu.max``, e.g. 1.5 for a limit of 1500m) or None, if the
+        CPU usage is not limited. Falls back to the CFS quota of a cgroup v1 CPU controller below the root.
+        """
+        value = self.read("cpu.max")
+        if value is not None:
+            limit, _, interval = value.strip().partition(" ")
+            if limit == "max":
+                return None
+            return int(limit) / int(interval or 100000)
+        for controller in ("cpu", "cpu,cpuacct"):
+            directory = os.path.join(self.root, controller)
+            try:
+                with open(os.path.join(directory, "cpu.cfs_quota_us")) as f:
+                    quota = int(f.read())
+                with open(os.path.join(directory, "cpu.cfs_period_us")) as f:
+                    period = int(f.read())
+            except (OSError, ValueError):
+                continue
+            return quota / period if quota > 0 and period > 0 else None
+        return None
+
+
+class CPUAllocation(NamedTuple):
+    """
+    The CPUs of the host, the CPUs this process may run on (affinity, e.g. restricted by a cpuset), the CPU quota of
+    the cgroup and the resulting effective number of CPUs.
+    """
+
+    host: int
+    affinity: int
+    quota: Optional[float]
+    effective: float
+
+
+def cpu_allocation(root: str = DEFAULT_CGROUP_ROOT) -> CPUAllocation:
+    """
+    Returns the CPUs, which the process can actually use. ``os.cpu_count()`` reports the CPUs of the host, while a
+    container is usually limited by a CFS quota (e.g. 2 CPUs on a host with 64 cores) and may be pinned to some CPUs.
+    """
+    host = os.cpu_count() or 1
+    try:
+        affinity = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        affinity = host
+    quota = Cgroup(root).cpu_quota()
+    effective = float(affinity)
+    if quota is not None:
+        effective = min(effective, quota)
+    return CPUAllocation(host, affinity, quota, effective)
+
+
+def default_workers(cpus: float) -> int:
+    """
+    Returns the default number of executor workers for the given number of CPUs, the formula of
+    ``ThreadPoolExecutor``: one worker per CPU plus 4 for blocking I/O, at most 32.
+    """
+    return min(MAX_DEFAULT_WORKERS, math.ceil(cpus) + 4)
+
+
+def configure_workers(options: dict) -> CPUAllocation:
+    """
+    Sets the number of executor workers in the options to the default for the effective CPUs, unless it is given,
+    and logs and exports the decision.
+    """
+    allocation = cpu_allocation(options.get("cgroup_root") or DEFAULT_CGROUP_ROOT)
+    configured = bool(options.get("workers"))
+    if not configured:
+        options["workers"] = default_workers(allocation.effective)
+    CPUCountMetric.set(allocation._asdict())
+    ExecutorWorkersMetric.set(int(options["workers"]))
+    if STRUCTLOG_ENABLED:
+        logger.info(
+            "Executor workers",
+            workers=options["workers"],
+            configured=configured,
+            effective_cpus=allocation.effective,
+            cpu_quota=allocation.quota,
+            cpu_affinity=allocation.affinity,
+            host_cpus=allocation.host,
+        )
+    else:
+        logger.info(
+            f"Using {options['workers']} executor workers{' (configured)' if configured else ''}; "
+            f"{allocation.effective:g} effective CPUs (quota: {allocation.quota}, affinity: {allocation.affinity}, "
+            f"host: {allocation.host})"
+        )
+    return allocation
+
+
+class CgroupMonitor(threading.Thread):
+    """
+    Reads the memory usage, memory events, CPU throttling and pressure stall information (PSI) of memory, CPU and I/O
+    of the cgroup from a background thread every ``interval`` seconds, so it reacts within seconds, even if the event
+    loop is blocked.
+
+    The pressure policies shed load: while one of them fails, new requests are rejected with status 503 and the
+    readiness probe fails, so the pod gets no new traffic until the pressure dropped. If the working set exceeds
+    ``max_memory_fraction`` of the memory limit or the memory pressure of all tasks (``full avg10``) reaches
+    ``memory_pressure_recycle`` percent, ``recycle`` is called with the reason, so the process is recycled before the
+    OOM killer acts. It is called on the monitor thread and has to hand the recycling over to the event loop.
+    """
+
+    resources = tuple(resource for resource, _ in PRESSURE_RESOURCES)
+
+    def __init__(
+        self,
+        cgroup: Cgroup,
+        interval: float = DEFAULT_CGROUP_INTERVAL,
+        max_memory_fraction: Optional[float] = None,
+        memory_pressure_recycle: Optional[float] = None,
+        recycle: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        super().__init__(name="hurricane-cgroup", daemon=True)
+        self.cgroup = cgroup
+        self.interval = interval
+        self.max_memory_fraction = max_memory_fraction
+        self.memory_pressure_recycle = memory_pressure_recycle
+        self.recycle = recycle
+        self.policies: List[ReadinessPolicy] = []
+        self.memory: Dict[str, Optional[int]] = {}
+        self.memory_events: Dict[str, int] = {}
+        self.cpu_throttling: Dict[str, float] = {}
+        self.pressures: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.recycled = False
+        self._stopped = threading.Event()
+
+    def pressure(
+        self, resource: str, kind: str = "some", average: str = "avg10"
+    ) -> Optional[float]:
+        """
+        Returns the share of time in percent, in which some (or all) tasks stalled on the resource over the last 10
+        seconds (or the given average: avg60 or avg300).
+        """
+        return self.pressures.get(resource, {}).get(kind, {}).get(average)
+
+    def shedding(self) -> Optional[str]:
+        """
+        Returns the name of the first failed pressure policy or None, if requests are admitted.
+        """
+        for policy in self.policies:
+            if not policy.ready:
+                return policy.name
+        return None
+
+    def read(self) -> None:
+        """
+        Reads the current state of the cgroup.
+        """
+        self.memory = self.cgroup.memory()
+        events = self.cgroup.read_flat_keyed("memory.events")
+        for event in MEMORY_LIMIT_EVENTS:
+            if (
+                events.get(event, 0) > self.memory_events.get(event, 0)
+                and self.memory_events
+            ):
+                logger.warning(
+                    f"Memory limit of the cgroup reached ({event}: {events[event]})"
+                )
+        self.memory_events = events
+        self.cpu_throttling = self.cgroup.cpu_throttling()
+        for resource in self.resources:
+            pressure = self.cgroup.pressure(resource)
+            if pressure is not None:
+                self.pressures[resource] = pressure
+
+    def check(self) -> None:
+        """
+        Reads the state of the cgroup, updates the pressure policies and recycles the process if needed.
+        """
+        self.read()
+        for policy in self.policies:
+            policy.check()
+        if self.recycle is not None and not self.recycled:
+            reason = self.recycle_reason()
+            if reason:
+                self.recycled = True
+                self.recycle(reason)
+
+    def recycle_reason(
+        self, memory: Optional[Dict[str, Optional[int]]] = None
+    ) -> Optional[str]:
+        """
+        Returns why the process has to be recycled or None. The memory defaults to the one of the last check.
+        """
+        memory = memory if memory is not None else self.memory
+        limit = memory.get("limit")
+        working_set = memory.get("working_set")
+        if (
+            self.max_memory_fraction
+            and limit
+            and working_set is not None
+            and working_set >= limit * self.max_memory_fraction
+        ):
+            return (
+                f"working set {working_set / (1024 * 1024):.0f}MB exceeds {self.max_memory_fraction:g} of the memory "
+                f"limit {limit / (1024 * 1024):.0f}MB"
+            )
+        full = self.pressure("memory", "full")
+        if (
+            self.memory_pressure_recycle
+            and full is not None
+            and full >= self.memory_pressure_recycle
+        ):
+            return f"memory pressure {full:g}% >= {self.memory_pressure_recycle:g}%"
+        return None
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Cgroup check failed: {e}")
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+CGROUP_MONITOR: Optional[CgroupMonitor] = None
+
+
+def get_cgroup_monitor() -> Optional[CgroupMonitor]:
+    return CGROUP_MONITOR
+
+
+def make_cgroup_monitor(
+    options: dict, recycle: Optional[Callable[[str], None]] = None
+) -> Optional[CgroupMonitor]:
+    """
+    Returns the cgroup monitor of this process and starts it upon the first call. Returns None, if neither a cgroup
+    threshold nor the cgroup root is configured or no cgroup v2 is found below the cgroup root.
+    """
+    global CGROUP_MONITOR
+    if CGROUP_MONITOR is not None:
+        return CGROUP_MONITOR
+    shed = {
+        resource: float(options[option])
+        for resource, option in PRESSURE_RESOURCES
+        if options.get(option)
+    }
+    fraction = options.get("max_memory_fraction")
+    pressure_recycle = options.get("memory_pressure_recycle")
+    thresholds = bool(shed or fraction or pressure_recycle)
+    if not thresholds and not options.get("cgroup_root"):
+        return None
+    cgroup = Cgroup(options.get("cgroup_root") or DEFAULT_CGROUP_ROOT)
+    if not cgroup.available:
+        if thresholds:
+            logger.warning(
+                f"No cgroup v2 found in {cgroup.root}, thresholds of the cgroup are disabled"
+            )
+        return None
+    monitor = CgroupMonitor(
+        cgroup,
+        max_memory_fraction=float(fraction) if fraction else None,
+        memory_pressure_recycle=float(pressure_recycle) if pressure_recycle else None,
+        recycle=recycle,
+    )
+    recovery = float(options.get("readiness_recovery") or DEFAULT_READINESS_RECOVERY)
+    for resource, threshold in shed.items():
+        # memory pressure precedes the OOM killer and is acted on quickly, CPU and I/O pressure only if sustained
+        window = (
+            "10s"
+            if resource == "memory"
+            else options.get("readiness_window") or DEFAULT_READINESS_WINDOW
+        )
+        monitor.policies.append(
+            PressurePolicy(monitor, resource, threshold, recovery, window)
+        )
+    monitor.read()
+    monitor.start()
+    atexit.register(monitor.stop)
+    CGROUP_MONITOR = monitor
+    if STRUCTLOG_ENABLED:
+        logger.info(
+            "Cgroup monitor",
+            path=cgroup.path,
+            memory_limit=monitor.memory.get("limit"),
+            pressure_shed=shed,
+            max_memory_fraction=fraction,
+            memory_pressure_recycle=pressure_recycle,
+        )
+    else:
+        logger.info(
+            f"Monitoring cgroup {cgroup.path} (memory limit: {monitor.memory.get('limit')} bytes, pressure shedding: "
+            f"{shed or None})"
+        )
+    return monitor
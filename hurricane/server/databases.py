@@ -0,0 +1,156 @@
+import hashlib
+import importlib.util
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+from django.db import connections
+
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+
+
+def migration_fingerprint() -> str:
+    """
+    Computes a fingerprint of all migration files of the installed apps from their paths, modification times and
+    sizes. It changes as soon as a migration file is added, removed or modified.
+    """
+    from django.apps import apps
+    from django.db.migrations.loader import MigrationLoader
+
+    digest = hashlib.sha1()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except (ImportError, ValueError):
+            continue
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for location in spec.submodule_search_locations:
+            try:
+                entries = sorted(os.scandir(location), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.endswith(".py"):
+                    stat = entry.stat()
+                    digest.update(
+                        f"{entry.path}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+                    )
+    return digest.hexdigest()
+
+
+class MigrationPlan(NamedTuple):
+    fingerprint: str
+    applied: Set[Any]
+    executor: Any
+    pending: int
+
+
+class DatabaseChecker:
+    """
+    Runs the startup checks for all database aliases concurrently. Every alias gets its own worker thread, as Django
+    connections are bound to the thread they were created in. This way connections and loaded migration graphs can be
+    reused across polls: the migration graph is only loaded from disk again, once the migration files changed.
+    """
+
+    def __init__(self, aliases: Optional[List[str]] = None) -> None:
+        self.aliases = list(aliases) if aliases is not None else list(connections)
+        self._executors = {
+            alias: ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"hurricane-db-{alias}"
+            )
+            for alias in self.aliases
+        }
+        self._plans: Dict[str, MigrationPlan] = {}
+
+    def _map(self, func: Callable, *args) -> Dict[str, Any]:
+        futures = {
+            alias: self._executors[alias].submit(func, alias, *args)
+            for alias in self.aliases
+        }
+        return {alias: future.result() for alias, future in futures.items()}
+
+    def check_databases(self) -> bool:
+        """
+        Checks, that all databases can be queried. Returns True if all of them are available.
+        """
+        return all(self._map(self._check_database).values())
+
+    def count_migrations(self) -> int:
+        """
+        Returns the number of pending migrations over all databases.
+        """
+        return sum(self._map(self._count_migrations, migration_fingerprint()).values())
+
+    def close(self) -> None:
+        self._map(self._close_connection)
+        for executor in self._executors.values():
+            executor.shutdown()
+        self._plans.clear()
+
+    def _close_connection(self, alias: str) -> None:
+        connections[alias].close()
+
+    def _check_database(self, alias: str) -> bool:
+        connection = connections[alias]
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT (1)")
+            if STRUCTLOG_ENABLED:
+                logger.info("Database check successful", database=alias)
+            else:
+                logger.info("Database was checked successfully")
+            return True
+        except Exception as e:
+            if STRUCTLOG_ENABLED:
+                logger.info("Database check unsuccessful", database=alias)
+            else:
+                logger.warning(f"Database command execution has failed with {e}")
+            return False
+        finally:
+            cursor.close()
+
+    def _count_migrations(self, alias: str, fingerprint: str) -> int:
+        from django.db.migrations.executor import MigrationExecutor
+        from django.db.migrations.recorder import MigrationRecorder
+
+        connection = connections[alias]
+        if hasattr(connection, "prepare_database"):
+            connection.prepare_database()
+        applied_migrations = MigrationRecorder(connection).applied_migrations()
+        applied = set(applied_migrations)
+        plan = self._plans.get(alias)
+        if plan is not None and plan.fingerprint == fingerprint:
+            if plan.applied == applied:
+                return plan.pending
+            executor = plan.executor
+            if executor.loader.replacements:
+                # squashed migrations are resolved depending on the applied migrations while building the graph
+                executor.loader.build_graph()
+            else:
+                executor.loader.applied_migrations = applied_migrations
+        else:
+            executor = MigrationExecutor(connection)
+        pending = len(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+        self._plans[alias] = MigrationPlan(fingerprint, applied, executor, pending)
+        return pending
+
+
+DATABASE_CHECKER: Optional[DatabaseChecker] = None
+
+
+def get_database_checker() -> DatabaseChecker:
+    global DATABASE_CHECKER
+    if DATABASE_CHECKER is None:
+        DATABASE_CHECKER = DatabaseChecker()
+    return DATABASE_CHECKER
+
+
+def close_database_checker() -> None:
+    global DATABASE_CHECKER
+    if DATABASE_CHECKER is not None:
+        DATABASE_CHECKER.close()
+        DATABASE_CHECKER = None
@@ -0,0 +1,184 @@
+import hmac
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.web
+from tornado.ioloop import IOLoop
+
+from hurricane.metrics import RouteMemoryMetric
+from hurricane.server.memory import (
+    DEFAULT_STATISTICS_LIMIT,
+    DEFAULT_TRACEMALLOC_FRAMES,
+    MAX_STATISTICS_LIMIT,
+    MAX_TRACEMALLOC_FRAMES,
+    SNAPSHOT_STORE,
+    STATISTICS_KEYS,
+    TracemallocNotTracing,
+)
+from hurricane.server.profiling import (
+    DEFAULT_PROFILE_HZ,
+    DEFAULT_PROFILE_SECONDS,
+    MAX_PROFILE_HZ,
+    MAX_PROFILE_SECONDS,
+    STACK_SAMPLER,
+    ProfileAlreadyRunning,
+)
+
+# profiles run on a thread of their own, so neither the IOLoop nor the request executor is blocked
+PROFILE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="hurricane-profiler"
+)
+# taking snapshots and computing their statistics may take seconds for many traces
+TRACEMALLOC_EXECUTOR = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="hurricane-tracemalloc"
+)
+
+
+class DebugHandler(tornado.web.RequestHandler):
+    """
+    Parent class for debugging endpoints on the probe port. The endpoints are only registered if a debug token is
+    configured and every request needs to send it in the ``Authorization`` header (``Bearer <token>``).
+    """
+
+    def initialize(self, token):
+        self.token = token
+
+    def compute_etag(self):
+        return None
+
+    def prepare(self):
+        authorization = self.request.headers.get("Authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(
+            token.strip().encode(), self.token.encode()
+        ):
+            raise tornado.web.HTTPError(403)
+
+    def get_number_argument(self, name, default, maximum, cast=float):
+        """
+        Returns the query argument ``name`` as number between 0 (exclusive) and ``maximum``.
+        """
+        value = self.get_query_argument(name, None)
+        if value is None:
+            return default
+        try:
+            number = cast(value)
+        except ValueError:
+            raise tornado.web.HTTPError(400, f"{name} must be a number")
+        if not 0 < number <= maximum:
+            raise tornado.web.HTTPError(400, f"{name} must be between 0 and {maximum}")
+        return number
+
+
+class ProfileHandler(DebugHandler):
+    """
+    Samples the stacks of all threads for ``seconds`` (default 10, at most 60) with ``hz`` samples per second (default
+    100, at most 1000) and returns them in the collapsed stack format for flame graphs or, with ``format=speedscope``,
+    as speedscope JSON.
+    """
+
+    async def get(self):
+        seconds = self.get_number_argument(
+            "seconds", DEFAULT_PROFILE_SECONDS, MAX_PROFILE_SECONDS
+        )
+        hz = self.get_number_argument(
+            "hz", DEFAULT_PROFILE_HZ, MAX_PROFILE_HZ, cast=int
+        )
+        output_format = self.get_query_argument("format", "collapsed")
+        if output_format not in ("collapsed", "speedscope"):
+            raise tornado.web.HTTPError(400, "format must be collapsed or speedscope")
+        if STACK_SAMPLER.running:
+            raise tornado.web.HTTPError(409, "a profile is already running")
+        try:
+            profile = await IOLoop.current().run_in_executor(
+                PROFILE_EXECUTOR, STACK_SAMPLER.profile, seconds, hz
+            )
+        except ProfileAlreadyRunning:
+            raise tornado.web.HTTPError(409, "a profile is already running")
+        if output_format == "speedscope":
+            self.set_header("Content-Type", "application/json")
+            self.write(json.dumps(profile.speedscope()))
+        else:
+            self.set_header("Content-Type", "text/plain; charset=utf-8")
+            self.write(profile.collapsed())
+
+
+class TracemallocHandler(DebugHandler):
+    """
+    ``GET`` returns the state of tracemalloc and the kept snapshots, ``POST`` starts tracing with ``frames`` frames
+    per allocation traceback (default 10, at most 100) and ``DELETE`` stops tracing.
+    """
+
+    def get(self):
+        self.write(SNAPSHOT_STORE.status())
+
+    def post(self):
+        frames = self.get_number_argument(
+            "frames", DEFAULT_TRACEMALLOC_FRAMES, MAX_TRACEMALLOC_FRAMES, cast=int
+        )
+        SNAPSHOT_STORE.start(frames)
+        self.write(SNAPSHOT_STORE.status())
+
+    def delete(self):
+        SNAPSHOT_STORE.stop()
+        self.write(SNAPSHOT_STORE.status())
+
+
+class TracemallocSnapshotHandler(DebugHandler):
+    """
+    ``POST`` takes a snapshot and returns its id, ``GET`` lists the kept snapshots. ``GET`` with the id of a snapshot
+    returns its ``limit`` (default 20, at most 1000) largest allocation sites grouped by ``key`` (lineno, filename or
+    traceback). With ``compare`` set to the id of an older snapshot, the allocation sites, which changed the most
+    between both snapshots, are returned.
+    """
+
+    async def post(self, snapshot_id=None):
+        if snapshot_id is not None:
+            raise tornado.web.HTTPError(405)
+        try:
+            snapshot_id = await IOLoop.current().run_in_executor(
+                TRACEMALLOC_EXECUTOR, SNAPSHOT_STORE.take
+            )
+        except TracemallocNotTracing:
+            raise tornado.web.HTTPError(409, "tracemalloc is not tracing")
+        self.write({"id": snapshot_id})
+
+    async def get(self, snapshot_id=None):
+        if snapshot_id is None:
+            self.write({"snapshots": SNAPSHOT_STORE.status()["snapshots"]})
+            return
+        key = self.get_query_argument("key", "lineno")
+        if key not in STATISTICS_KEYS:
+            raise tornado.web.HTTPError(
+                400, f"key must be one of {', '.join(STATISTICS_KEYS)}"
+            )
+        limit = self.get_number_argument(
+            "limit", DEFAULT_STATISTICS_LIMIT, MAX_STATISTICS_LIMIT, cast=int
+        )
+        compare = self.get_query_argument("compare", None)
+        try:
+            statistics = await IOLoop.current().run_in_executor(
+                TRACEMALLOC_EXECUTOR,
+                SNAPSHOT_STORE.statistics,
+                int(snapshot_id),
+                key,
+                limit,
+                int(compare) if compare else None,
+            )
+        except ValueError:
+            raise tornado.web.HTTPError(400, "compare must be a snapshot id")
+        except KeyError:
+            raise tornado.web.HTTPError(404, "unknown snapshot")
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(statistics))
+
+
+class RouteMemoryHandler(DebugHandler):
+    """
+    Returns the number of sampled requests and the average bytes allocated and retained by Python and the average RSS
+    growth per request of every route, the routes retaining the most memory first.
+    """
+
+    def get(self):
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(RouteMemoryMetric.report()))
@@ -1,14 +1,8 @@
-import traceback
 from typing import Any
 
 import tornado.web
-from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.staticfiles.handlers import StaticFilesHandler
-from django.core.management.base import SystemCheckError
-from django.core.wsgi import get_wsgi_application
-from django.db import OperationalError, connection
-from prometheus_client import make_wsgi_app
 from tornado import httputil
 from tornado.web import Application
 
@@ -18,11 +12,35 @@ from hurricane.metrics import (
     RequestCounterMetric,
     RequestQueueLengthMetric,
     ResponseTimeAverageMetric,
+    ResponseTimeWindowMetric,
+    ShedRequestMetric,
     StartupTimeMetric,
-    registry,
 )
+from hurricane.metrics.multiprocess import get_multiprocess_store
+from hurricane.server.exposition import MetricsExposition
 from hurricane.server.loggers import logger
-from hurricane.server.wsgi import HurricaneWSGIContainer
+from hurricane.server.probes import run_probe_check
+from hurricane.server.watchdog import get_request_watchdog
+from hurricane.server.wsgi import HurricaneWSGIContainer, get_hurricane_wsgi_application
+
+# used by Prometheus handlers, which are not configured with an exposition of their own
+default_exposition = MetricsExposition()
+
+
+def window_summary(stats: dict) -> str:
+    """
+    Formats the latency quantiles and request rates of the windows with observations for the liveness output, e.g.
+    " 1m: p50 1.20ms p95 8.40ms p99 12.10ms 3.25/s".
+    """
+    summary = ""
+    for window, window_stats in stats.items():
+        if not window_stats["count"]:
+            continue
+        summary += f" {window}:"
+        for quantile, value in sorted(window_stats["quantiles"].items()):
+            summary += f" p{quantile * 100:g} {value * 1000:.2f}ms"
+        summary += f" {window_stats['rate']:.2f}/s"
+    return summary
 
 
 class DjangoHandler(tornado.web.RequestHandler):
@@ -49,15 +67,26 @@ class DjangoHandler(tornado.web.RequestHandler):
         """
         self.django = HurricaneWSGIContainer(
             self,
-            get_wsgi_application(),
+            get_hurricane_wsgi_application(),
             executor=self._executor,
             observe=self.application.collect_metrics,
+            server_timing=self.application.settings.get("server_timing"),
+            watchdog=self.application.settings.get("request_watchdog"),
+            memory_sampler=self.application.settings.get("route_memory_sampler"),
         )
 
     async def prepare(self) -> None:
         """
         Transmitting incoming request to django application via WSGI Container.
         """
+        monitor = self.application.settings.get("cgroup_monitor")
+        if monitor is not None and (reason := monitor.shedding()):
+            # shed load while a resource of the cgroup is under pressure, the client can retry on another pod
+            ShedRequestMetric.increment(reason)
+            self.set_status(503)
+            self.set_header("Retry-After", "1")
+            self.finish(f"overloaded: {reason}")
+            return
         self.django(self.request)
         self._finished = True
         self.on_finish()
@@ -74,16 +103,22 @@ class DjangoStaticFilesHandler(DjangoHandler):
         Initialization of Hurricane WSGI Container.
         """
         self.django = HurricaneWSGIContainer(
-            self, StaticFilesHandler(get_wsgi_application())
+            self, StaticFilesHandler(get_hurricane_wsgi_application())
         )
 
 
+# processes, which did not write their metrics for this number of write intervals, are considered stale
+STALE_PROCESS_INTERVALS = 10
+
+
 class DjangoProbeHandler(tornado.web.RequestHandler):
 
     """
     Parent class for all specific probe handlers.
     """
 
+    check_cache = None
+
     def compute_etag(self):
         return None
 
@@ -132,32 +167,40 @@ class DjangoProbeHandler(tornado.web.RequestHandler):
         """
         await self._check_startup_wrapper()
 
-    @sync_to_async
-    def _ensure_connection(self):
-        connection.ensure_connection()
+    def _force_sync_check(self):
+        """
+        Probes can request a synchronous check instead of the cached result with the query argument 'sync'.
+        """
+        sync = self.get_query_argument("sync", None)
+        return sync is not None and sync.lower() not in ("0", "false")
+
+    async def _run_check(self, tag):
+        """
+        Returns the result of the checks for the given tag. If a check cache is configured, the latest result of the
+        background checks is returned, unless a synchronous check was requested.
+        """
+        if self.check_cache is not None:
+            result = None
+            if not self._force_sync_check():
+                result = self.check_cache.get(tag)
+            if result is None:
+                result = await self.check_cache.refresh(tag)
+        else:
+            from asgiref.sync import sync_to_async
+
+            result = await sync_to_async(run_probe_check)(self.check, tag)
+        self.set_header("X-Probe-Check-Age", f"{result.age:.3f}")
+        return result
 
     async def _custom_check_wrapper(self, tag, metric, webhook, webhook_url):
-        got_exception = None
-        try:
-            async_check = sync_to_async(self.check)
-            await async_check(tags=[tag], include_deployment_checks=True)
-            if settings.DATABASES:
-                # once a connection has been established, this will be successful
-                # (even if the connection is gone later on)
-                await self._ensure_connection()
-        except SystemCheckError as e:
-            got_exception = traceback.format_exc()
-            self._write_error(msg="check error", e=e)
-        except OperationalError as e:
-            got_exception = traceback.format_exc()
-            self._write_error(msg="database error", e=e)
+        result = await self._run_check(tag)
+        if result.error:
+            self._write_error(msg=result.error, e=result.exception)
+            self.set_status(500)
+            self._update_health_metric_exception(metric, webhook, webhook_url)
         else:
             self._probe_check()
             self._update_health_metric_no_exception(metric, webhook, webhook_url)
-        finally:
-            if got_exception:
-                self.set_status(500)
-                self._update_health_metric_exception(metric, webhook, webhook_url)
 
     def _update_health_metric_no_exception(self, metric, webhook, webhook_url):
         from hurricane.webhooks.base import WebhookStatus
@@ -179,6 +222,26 @@ class DjangoProbeHandler(tornado.web.RequestHandler):
                 metric, webhook, webhook_url, WebhookStatus.FAILED, metric_change
             )
 
+    def _unhealthy_processes(self, metric):
+        """
+        In multi-process mode, returns the other processes, which report the given metric as failed or which are
+        stale, otherwise an empty dict.
+        """
+        store = get_multiprocess_store()
+        if store is None:
+            return {}
+        return store.unhealthy(
+            metric.code, stale_after=store.interval * STALE_PROCESS_INTERVALS
+        )
+
+    def _write_unhealthy_processes(self, unhealthy):
+        self.write(
+            "unhealthy processes: "
+            + ", ".join(
+                f"{instance} ({reason})" for instance, reason in unhealthy.items()
+            )
+        )
+
     def _write_error(self, msg, e=None):
         if settings.DEBUG:
             self.write(f"django {msg}: " + str(e))
@@ -199,15 +262,24 @@ class DjangoLivenessHandler(DjangoProbeHandler):
     This handler runs with every call to the probe endpoint which is supposed to be used
     """
 
-    def initialize(self, check_handler, webhook_url, max_lifetime):
+    def initialize(
+        self,
+        check_handler,
+        webhook_url,
+        max_lifetime,
+        check_cache=None,
+        fail_on_stuck_executor=False,
+    ):
         from hurricane.webhooks import LivenessWebhook
 
         self.check = check_handler
+        self.check_cache = check_cache
         self.liveness_webhook_url = webhook_url
         self.liveness_webhook = LivenessWebhook
         self.metric = HealthMetric
         self.tag = "liveness"
         self.max_lifetime = max_lifetime
+        self.fail_on_stuck_executor = fail_on_stuck_executor
 
     async def _check(self):
         await self._custom_check_wrapper(
@@ -218,10 +290,21 @@ class DjangoLivenessHandler(DjangoProbeHandler):
         if self.max_lifetime and RequestCounterMetric.get() > self.max_lifetime:
             self.set_status(400)
             return None
+        watchdog = get_request_watchdog()
+        if self.fail_on_stuck_executor and watchdog is not None and watchdog.stuck:
+            self.set_status(500)
+            self.set_header("Content-Type", "text/plain; charset=utf-8")
+            self.write(f"executor stuck\n\n{watchdog.stuck_dump}")
+            return None
+        if unhealthy := self._unhealthy_processes(self.metric):
+            self.set_status(500)
+            self._write_unhealthy_processes(unhealthy)
+            return None
         if response_average_time := ResponseTimeAverageMetric.get():
             self.write(
                 f"Average response time: {response_average_time:.2f}ms Request "
                 f"queue size: {RequestQueueLengthMetric.get()} Rx"
+                f"{window_summary(ResponseTimeWindowMetric.merged_state())}"
             )
         else:
             self.write("alive")
@@ -234,11 +317,20 @@ class DjangoReadinessHandler(DjangoProbeHandler):
     can be used to determine the application's health state during its operation.
     """
 
-    def initialize(self, check_handler, req_queue_len, webhook_url):
+    def initialize(
+        self,
+        check_handler,
+        req_queue_len,
+        webhook_url,
+        check_cache=None,
+        policies=None,
+    ):
         from hurricane.webhooks import ReadinessWebhook
 
         self.check = check_handler
+        self.check_cache = check_cache
         self.request_queue_length = req_queue_len
+        self.policies = policies or []
         self.readiness_webhook_url = webhook_url
         self.readiness_webhook = ReadinessWebhook
         self.metric = ReadinessMetric
@@ -250,11 +342,25 @@ class DjangoReadinessHandler(DjangoProbeHandler):
         )
 
     def _probe_check(self):
+        # every policy is probed on every probe to keep their states up to date
+        failed = [policy for policy in self.policies if not policy.probe()]
         if RequestQueueLengthMetric.get() >= self.request_queue_length:
             self.set_status(400)
             self._update_health_metric_exception(
                 self.metric, self.readiness_webhook, self.readiness_webhook_url
             )
+        elif failed:
+            self.set_status(400)
+            self.write(
+                "not ready: " + ", ".join(policy.describe() for policy in failed)
+            )
+            self._update_health_metric_exception(
+                self.metric, self.readiness_webhook, self.readiness_webhook_url
+            )
+        elif unhealthy := self._unhealthy_processes(self.metric):
+            # only this process' readiness is reported to other processes, failures of others are not propagated
+            self.set_status(400)
+            self._write_unhealthy_processes(unhealthy)
         elif RequestQueueLengthMetric.get() < self.request_queue_length:
             self.set_status(200)
             self._update_health_metric_no_exception(
@@ -280,24 +386,27 @@ class DjangoStartupHandler(DjangoProbeHandler):
 
 
 class PrometheusHandler(tornado.web.RequestHandler):
-    def initialize(self):
-        """
-        Initialization of Hurricane WSGI Container.
-        """
-        self.prometheus = HurricaneWSGIContainer(
-            self, make_wsgi_app(disable_compression=True), observe=False
-        )
+    """
+    This handler exports all metrics to Prometheus. Depending on the ``Accept`` header the text format or OpenMetrics
+    is returned, gzip compressed if the client accepts it. Single metrics can be requested with the query argument
+    ``name[]``.
+    """
 
-    async def prepare(self) -> None:
-        """
-        Transmitting incoming request to the Prometheus application via WSGI Container.
-        """
-        for _, metric in registry.metrics.items():
-            if metric.is_async:
-                await metric.get()
-            else:
-                metric.get()
+    def initialize(self, exposition=None):
+        self.exposition = exposition or default_exposition
 
-        self.prometheus(self.request)
-        self._finished = True
-        self.on_finish()
+    def compute_etag(self):
+        return None
+
+    async def get(self):
+        compress = "gzip" in self.request.headers.get("Accept-Encoding", "")
+        content_type, body, compressed = await self.exposition.render(
+            self.request.headers.get("Accept"),
+            compress=compress,
+            names=self.get_query_arguments("name[]"),
+        )
+        self.set_header("Content-Type", content_type)
+        self.set_header("Vary", "Accept, Accept-Encoding")
+        if compressed:
+            self.set_header("Content-Encoding", "gzip")
+        self.write(body)
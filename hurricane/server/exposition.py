@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+import time
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+from hurricane.server.loggers import metrics_log
+
+DEFAULT_METRICS_CACHE_TTL = 0.0
+DEFAULT_METRIC_TIMEOUT = 5.0
+
+
+class MetricsOutput(NamedTuple):
+    content_type: str
+    body: bytes
+    compressed: Optional[bytes]
+    timestamp: float
+
+
+class MetricsExposition:
+    """
+    Generates the Prometheus exposition of all collected metrics. Calculated metrics are collected concurrently, each
+    of them bounded by a timeout. The output is generated outside of the event loop and cached for ``ttl`` seconds
+    per format, so concurrent scrapes (e.g. of several Prometheus replicas) share one generated output. Output, which
+    is still generated, is shared as well, even if no ttl is set.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_METRICS_CACHE_TTL,
+        timeout: Optional[float] = DEFAULT_METRIC_TIMEOUT,
+    ) -> None:
+        self.ttl = ttl
+        self.timeout = timeout
+        self._outputs: Dict[str, MetricsOutput] = {}
+        self._running: Dict[str, "asyncio.Future[MetricsOutput]"] = {}
+
+    async def collect(self) -> None:
+        """
+        Updates the values of all metrics in the Hurricane registry. Asynchronous metrics are awaited concurrently,
+        a metric, which exceeds the timeout, keeps its last exported value.
+        """
+        from hurricane.metrics import registry
+
+        pending = {}
+        for code, metric in list(registry.metrics.items()):
+            # Prometheus metrics are created lazily, make sure all of them are exported from the first scrape on
+            getattr(metric, "prometheus", None)
+            try:
+                if metric.is_async:
+                    pending[code] = asyncio.wait_for(metric.get(), self.timeout)
+                else:
+                    metric.get()
+            except Exception as e:
+                metrics_log.warning(f"Collecting metric {code} failed: {e}")
+        results = await asyncio.gather(*pending.values(), return_exceptions=True)
+        for code, result in zip(pending, results):
+            if isinstance(result, asyncio.TimeoutError):
+                metrics_log.warning(f"Collecting metric {code} timed out")
+            elif isinstance(result, Exception):
+                metrics_log.warning(f"Collecting metric {code} failed: {result}")
+
+    async def render(
+        self,
+        accept: Optional[str] = None,
+        compress: bool = False,
+        names: Optional[Sequence[str]] = None,
+    ) -> Tuple[str, bytes, bool]:
+        """
+        Returns content type, body and whether the body is gzip compressed for the format negotiated from the
+        ``Accept`` header (text format or OpenMetrics). If ``names`` are given, only these metrics are exported and
+        the output is not cached.
+        """
+        from prometheus_client import REGISTRY
+        from prometheus_client.exposition import choose_encoder
+
+        encoder, content_type = choose_encoder(accept or "")
+        loop = asyncio.get_running_loop()
+        if names:
+            await self.collect()
+            body = await loop.run_in_executor(
+                None, encoder, REGISTRY.restricted_registry(names)
+            )
+            if compress:
+                body = await loop.run_in_executor(None, gzip.compress, body)
+            return content_type, body, compress
+        output = self._outputs.get(content_type)
+        if output is None or time.monotonic() - output.timestamp > self.ttl:
+            if content_type not in self._running:
+                self._running[content_type] = asyncio.ensure_future(
+                    self._generate(encoder, content_type)
+                )
+            output = await asyncio.shield(self._running[content_type])
+        if not compress:
+            return content_type, output.body, False
+        compressed = output.compressed
+        if compressed is None:
+            compressed = await loop.run_in_executor(None, gzip.compress, output.body)
+            cached = self._outputs.get(content_type)
+            if cached is not None and cached.timestamp == output.timestamp:
+                self._outputs[content_type] = output._replace(compressed=compressed)
+        return content_type, compressed, True
+
+    async def _generate(self, encoder, content_type: str) -> MetricsOutput:
+        from prometheus_client import REGISTRY
+
+        try:
+            await self.collect()
+            body = await asyncio.get_running_loop().run_in_executor(
+                None, encoder, REGISTRY
+            )
+            output = MetricsOutput(content_type, body, None, time.monotonic())
+            self._outputs[content_type] = output
+            return output
+        finally:
+            self._running.pop(content_type, None)
+
+
+def make_metrics_exposition(options: dict) -> MetricsExposition:
+    """
+    Creates the metrics exposition from the command options.
+    """
+    ttl = options.get("metrics_cache_ttl")
+    timeout = options.get("metrics_timeout")
+    return MetricsExposition(
+        ttl=float(ttl) if ttl is not None else DEFAULT_METRICS_CACHE_TTL,
+        timeout=float(timeout) if timeout else None,
+    )
@@ -0,0 +1,116 @@
+import gc
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from hurricane.metrics.base import HistogramShard
+from hurricane.metrics.requests import GC_PAUSE_BUCKETS
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+
+
+class GCMonitor:
+    """
+    Observes every collection of the garbage collector with ``gc.callbacks``: the number of collections and the pause
+    per generation. Collections run while holding the GIL, so a long full collection shows up as latency spike of all
+    requests in flight.
+
+    The callback runs within the collection, at any allocation of any thread. It therefore only updates histograms,
+    which were allocated upfront, and takes no locks; collections never run concurrently.
+    """
+
+    def __init__(self, buckets: Sequence[float] = GC_PAUSE_BUCKETS) -> None:
+        self.buckets = buckets
+        self._histograms = [
+            HistogramShard(len(buckets)) for _ in range(len(gc.get_count()))
+        ]
+        self._start: Optional[float] = None
+
+    def callback(self, phase: str, info: dict) -> None:
+        if phase == "start":
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            pause = time.perf_counter() - self._start
+            self._start = None
+            histogram = self._histograms[info["generation"]]
+            histogram.buckets[bisect_left(self.buckets, pause)] += 1
+            histogram.count += 1
+            histogram.sum += pause
+
+    def histograms(self) -> Dict[tuple, HistogramShard]:
+        """
+        Returns a copy of the pause histograms of the generations, which were collected at least once.
+        """
+        histograms: Dict[tuple, HistogramShard] = {}
+        for generation, histogram in enumerate(self._histograms):
+            if histogram.count:
+                copy = HistogramShard(len(self.buckets))
+                copy.add(list(histogram.buckets), histogram.count, histogram.sum)
+                histograms[(str(generation),)] = copy
+        return histograms
+
+    @property
+    def installed(self) -> bool:
+        return self.callback in gc.callbacks
+
+    def install(self) -> None:
+        if not self.installed:
+            gc.callbacks.append(self.callback)
+
+    def uninstall(self) -> None:
+        if self.installed:
+            gc.callbacks.remove(self.callback)
+
+
+GC_MONITOR = GCMonitor()
+
+
+def parse_gc_thresholds(value: Union[str, int, Sequence[int]]) -> Tuple[int, ...]:
+    """
+    Parses the thresholds of the garbage collector given as comma separated string (e.g. "50000,20,100") or as
+    sequence of one to three non-negative integers.
+    """
+    parts: List[Any]
+    if isinstance(value, int):
+        parts = [value]
+    elif isinstance(value, str):
+        parts = value.split(",")
+    else:
+        parts = list(value)
+    thresholds = tuple(int(part) for part in parts)
+    if not 1 <= len(thresholds) <= 3 or min(thresholds) < 0:
+        raise ValueError(
+            f"GC thresholds must be one to three non-negative integers, got {value}"
+        )
+    return thresholds
+
+
+def configure_gc(options: dict) -> None:
+    """
+    Sets the thresholds of the garbage collector given in the options and starts observing the collections, unless
+    metrics are disabled.
+    """
+    if options.get("gc_thresholds"):
+        thresholds = parse_gc_thresholds(options["gc_thresholds"])
+        gc.set_threshold(*thresholds)
+        if STRUCTLOG_ENABLED:
+            logger.info("GC thresholds", thresholds=list(gc.get_threshold()))
+        else:
+            logger.info(f"GC thresholds set to {gc.get_threshold()}")
+    if not options.get("no_metrics"):
+        GC_MONITOR.install()
+
+
+def freeze_gc() -> None:
+    """
+    Collects the garbage of the startup and moves all remaining objects into the permanent generation, which is
+    ignored by future collections. The long-lived objects of the startup (modules, settings, URL patterns, caches
+    warmed by management commands) are thereby no longer traversed by every full collection.
+    """
+    gc.collect()
+    gc.freeze()
+    if STRUCTLOG_ENABLED:
+        logger.info("GC frozen", objects=gc.get_freeze_count())
+    else:
+        logger.info(
+            f"Moved {gc.get_freeze_count()} objects of the startup to the permanent GC generation"
+        )
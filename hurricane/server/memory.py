@@ -0,0 +1,229 @@
+import collections
+import itertools
+import os
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+from hurricane.metrics import RouteMemoryMetric
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+
+DEFAULT_TRACEMALLOC_FRAMES = 10
+MAX_TRACEMALLOC_FRAMES = 100
+DEFAULT_STATISTICS_LIMIT = 20
+MAX_STATISTICS_LIMIT = 1000
+# older snapshots are discarded, as every snapshot holds a copy of all traces
+MAX_SNAPSHOTS = 10
+STATISTICS_KEYS = ("lineno", "filename", "traceback")
+
+# allocations of the import machinery and of tracemalloc itself are no leaks of the application
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+)
+
+
+class TracemallocNotTracing(Exception):
+    pass
+
+
+def statistic_entry(statistic) -> dict:
+    """
+    Returns a tracemalloc statistic (or statistic diff) as dictionary.
+    """
+    entry = {
+        "size": statistic.size,
+        "count": statistic.count,
+        "traceback": [
+            f"{frame.filename}:{frame.lineno}" for frame in statistic.traceback
+        ],
+    }
+    if isinstance(statistic, tracemalloc.StatisticDiff):
+        entry["size_diff"] = statistic.size_diff
+        entry["count_diff"] = statistic.count_diff
+    return entry
+
+
+class SnapshotStore:
+    """
+    Starts and stops tracemalloc and keeps the latest ``max_snapshots`` snapshots by id, so allocation sites can be
+    listed and compared between two snapshots later on. Snapshots are kept after tracing was stopped.
+    """
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS) -> None:
+        self.max_snapshots = max_snapshots
+        self.snapshots: Dict[
+            int, Tuple[float, tracemalloc.Snapshot]
+        ] = collections.OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = DEFAULT_TRACEMALLOC_FRAMES) -> None:
+        """
+        Starts tracing with the given number of frames per allocation traceback. If tracemalloc is already tracing
+        with another number of frames, it is restarted and the traces collected so far are lost.
+        """
+        if self.tracing:
+            if tracemalloc.get_traceback_limit() == frames:
+                return
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+        if STRUCTLOG_ENABLED:
+            logger.info("Tracemalloc started", frames=frames)
+        else:
+            logger.info(f"Tracemalloc started with {frames} frames per traceback")
+
+    def stop(self) -> None:
+        if self.tracing:
+            tracemalloc.stop()
+            logger.info("Tracemalloc stopped")
+
+    def take(self) -> int:
+        """
+        Takes a snapshot of the traced allocations and returns its id. Needs to be called outside of the event loop,
+        as it may take a while for many traces.
+        """
+        if not self.tracing:
+            raise TracemallocNotTracing()
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        with self._lock:
+            snapshot_id = next(self._ids)
+            self.snapshots[snapshot_id] = (time.time(), snapshot)
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.pop(next(iter(self.snapshots)))
+        return snapshot_id
+
+    def get(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        """
+        Returns the snapshot with the given id, raises KeyError for unknown or discarded snapshots.
+        """
+        return self.snapshots[snapshot_id][1]
+
+    def statistics(
+        self,
+        snapshot_id: int,
+        key: str = "lineno",
+        limit: int = DEFAULT_STATISTICS_LIMIT,
+        compare: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Returns the ``limit`` largest allocation sites of a snapshot grouped by ``key``. If ``compare`` is the id of
+        an older snapshot, the sites with the largest differences between both snapshots are returned instead.
+        """
+        snapshot = self.get(snapshot_id)
+        if compare is not None:
+            diffs = snapshot.compare_to(self.get(compare), key)
+            return [statistic_entry(statistic) for statistic in diffs[:limit]]
+        statistics = snapshot.statistics(key)
+        return [statistic_entry(statistic) for statistic in statistics[:limit]]
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else None,
+            "traced_memory": current,
+            "traced_memory_peak": peak,
+            "tracemalloc_memory": tracemalloc.get_tracemalloc_memory(),
+            "snapshots": [
+                {
+                    "id": snapshot_id,
+                    "timestamp": timestamp,
+                    "traces": len(snapshot.traces),
+                }
+                for snapshot_id, (timestamp, snapshot) in list(self.snapshots.items())
+            ],
+        }
+
+    def dump(self, directory: str) -> Optional[str]:
+        """
+        Takes a snapshot and writes it to the given directory, where it can be loaded with
+        ``tracemalloc.Snapshot.load``. Returns the path of the file or None, if tracemalloc is not tracing.
+        """
+        if not self.tracing:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"hurricane-{os.getpid()}-{int(time.time())}.tracemalloc"
+        )
+        tracemalloc.take_snapshot().dump(path)
+        return path
+
+
+SNAPSHOT_STORE = SnapshotStore()
+
+
+def process_rss() -> int:
+    import psutil  # type: ignore
+
+    return psutil.Process().memory_info().rss
+
+
+class RequestMemory:
+    """
+    Memory of the process at the start of a sampled request. If tracemalloc is tracing, the bytes allocated (the
+    peak of the traced memory) and retained by Python during the request are measured, the growth of the resident
+    set size in any case. All values are measured for the whole process, so allocations of concurrent requests are
+    attributed as well; averaged over many samples, routes, which leak or bloat memory, stand out nevertheless.
+    """
+
+    __slots__ = ("traced", "rss")
+
+    def __init__(self) -> None:
+        self.traced: Optional[int] = None
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self.traced = tracemalloc.get_traced_memory()[0]
+        self.rss = process_rss()
+
+    def finish(self, route: str) -> None:
+        """
+        Measures the memory at the end of the request and adds the differences to the metrics of the route.
+        """
+        allocated = retained = None
+        if self.traced is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            allocated = max(0, peak - self.traced)
+            retained = current - self.traced
+        RouteMemoryMetric.observe_request(
+            route, allocated, retained, process_rss() - self.rss
+        )
+
+
+class RouteMemorySampler:
+    """
+    Samples the memory of every ``every``-th request of the process. The route is only known after the request was
+    handled, so requests are counted across all routes: rarely requested routes get samples accordingly seldom.
+    """
+
+    def __init__(self, every: int) -> None:
+        self.every = every
+        self._requests = itertools.count()
+
+    def sample(self) -> Optional[RequestMemory]:
+        """
+        Returns the memory at the start of the request, if it is sampled.
+        """
+        if next(self._requests) % self.every:
+            return None
+        return RequestMemory()
+
+
+def make_route_memory_sampler(options: dict) -> Optional[RouteMemorySampler]:
+    """
+    Returns the memory sampler of the options or None, if the memory of requests is not sampled.
+    """
+    every = options.get("route_memory_sample")
+    if not every or options.get("no_metrics"):
+        return None
+    if STRUCTLOG_ENABLED:
+        logger.info("Route memory sampling", every=int(every))
+    else:
+        logger.info(f"Sampling the memory of every {int(every)}. request")
+    return RouteMemorySampler(int(every))
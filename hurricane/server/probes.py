@@ -0,0 +1,220 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, NamedTuple, Optional, Sequence
+
+from django.conf import settings
+from django.core.management.base import SystemCheckError
+from django.db import OperationalError, connection
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from hurricane.metrics import (
+    EventLoopLagMetric,
+    RequestQueueLengthMetric,
+    StartupTimeMetric,
+)
+from hurricane.metrics.base import CONTINUOUS_LOOP_TASKS
+from hurricane.server.loggers import logger
+
+DEFAULT_PROBE_CHECK_TIMEOUT = 10.0
+
+
+class ProbeCheckResult(NamedTuple):
+    """
+    Result of running the Django check framework for a probe. ``error`` is the message of a failed check (e.g.
+    "check error" or "database error") and None for a successful check.
+    """
+
+    error: Optional[str]
+    exception: Optional[BaseException]
+    timestamp: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+
+def run_probe_check(check: Callable, tag: str) -> ProbeCheckResult:
+    """
+    Runs the Django check framework for the given tag including deployment checks and checks the database
+    connection. Needs to be called outside of the event loop, as it may block.
+    """
+    try:
+        check(tags=[tag], include_deployment_checks=True)
+        if settings.DATABASES:
+            # once a connection has been established, this will be successful
+            # (even if the connection is gone later on)
+            connection.ensure_connection()
+    except SystemCheckError as e:
+        return ProbeCheckResult("check error", e, time.time())
+    except OperationalError as e:
+        return ProbeCheckResult("database error", e, time.time())
+    return ProbeCheckResult(None, None, time.time())
+
+
+class ProbeCheckCache:
+    """
+    Runs the probe checks in a background task with a fixed interval and keeps their latest results, so probe
+    handlers can answer without running the check framework on every request. Checks run on a dedicated thread and
+    are bounded by a timeout; a check, which is still running, is never started a second time.
+    """
+
+    def __init__(
+        self,
+        check: Callable,
+        tags: Sequence[str],
+        interval: float,
+        timeout: Optional[float] = DEFAULT_PROBE_CHECK_TIMEOUT,
+    ) -> None:
+        self.check = check
+        self.tags = list(tags)
+        self.interval = interval
+        self.timeout = timeout
+        self.results: Dict[str, ProbeCheckResult] = {}
+        self._running: Dict[str, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="hurricane-probe-check"
+        )
+
+    def get(self, tag: str) -> Optional[ProbeCheckResult]:
+        return self.results.get(tag)
+
+    async def refresh(self, tag: str) -> ProbeCheckResult:
+        """
+        Runs the check for the given tag and stores its result. Concurrent refreshes of a tag share one check run.
+        """
+        if tag not in self._running:
+            loop = asyncio.get_running_loop()
+            self._running[tag] = loop.run_in_executor(
+                self._executor, run_probe_check, self.check, tag
+            )
+        future = self._running[tag]
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError as e:
+            result = ProbeCheckResult("check timeout", e, time.time())
+            future.add_done_callback(lambda _: self._running.pop(tag, None))
+        else:
+            self._running.pop(tag, None)
+        self.results[tag] = result
+        return result
+
+    async def run(self) -> None:
+        """
+        Background task, which refreshes the results of all tags once the startup is finished.
+        """
+        while True:
+            if StartupTimeMetric.get():
+                for tag in self.tags:
+                    try:
+                        await self.refresh(tag)
+                    except Exception as e:
+                        logger.error(f"Probe check {tag} failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class ProbeServerThread(threading.Thread):
+    """
+    Runs the probe application (including the Prometheus exporter) in a separate thread on its own IOLoop. This way
+    probes are answered, even if the main loop is saturated or blocked. The application is created within the thread,
+    so all of its callbacks are bound to the probe loop.
+    """
+
+    def __init__(self, make_application: Callable, port: int) -> None:
+        super().__init__(name="hurricane-probe-server", daemon=True)
+        self.make_application = make_application
+        self.port = port
+        self.io_loop: Optional[IOLoop] = None
+        self.exception: Optional[BaseException] = None
+        self._listening = threading.Event()
+
+    def run(self) -> None:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.io_loop = IOLoop.current()
+        try:
+            application = self.make_application()
+            application.listen(self.port)
+        except BaseException as e:
+            self.exception = e
+            return
+        finally:
+            self._listening.set()
+        self.io_loop.start()
+
+    def start_and_listen(self) -> None:
+        """
+        Starts the thread and waits until the probe application listens on its port.
+        """
+        self.start()
+        self._listening.wait()
+        if self.exception:
+            raise self.exception
+
+    def stop(self) -> None:
+        if self.io_loop is not None:
+            self.io_loop.add_callback(self.io_loop.stop)
+
+
+class MainLoopSnapshot:
+    """
+    Publishes the state of the main loop, which can only be computed on the main loop itself (e.g. the request queue
+    length), in a fixed interval. Probe handlers running on another thread read the published snapshot.
+    """
+
+    def __init__(self, interval: float = 0.25) -> None:
+        self.interval = interval
+        self._callback: Optional[PeriodicCallback] = None
+
+    def publish(self) -> None:
+        RequestQueueLengthMetric.publish(
+            max(0, len(asyncio.all_tasks()) - CONTINUOUS_LOOP_TASKS)
+        )
+
+    def start(self) -> None:
+        """
+        Starts publishing on the current (main) IOLoop.
+        """
+        IOLoop.current().add_callback(self.publish)
+        self._callback = PeriodicCallback(self.publish, self.interval * 1000)
+        self._callback.start()
+
+    def stop(self) -> None:
+        if self._callback is not None:
+            self._callback.stop()
+
+
+class EventLoopLagMonitor:
+    """
+    Measures the lag of the event loop: a timer callback is scheduled in a fixed interval and the delay between its
+    scheduled and its actual run time is observed. A loop, which is blocked or saturated by callbacks, runs the timer
+    late. Timers are no tasks, so the request queue length is not affected.
+    """
+
+    def __init__(self, interval: float = 0.25) -> None:
+        self.interval = interval
+        self._io_loop: Optional[IOLoop] = None
+        self._timeout: Optional[object] = None
+        self._expected = 0.0
+
+    def _schedule(self) -> None:
+        assert self._io_loop is not None
+        self._expected = self._io_loop.time() + self.interval
+        self._timeout = self._io_loop.call_at(self._expected, self._run)
+
+    def _run(self) -> None:
+        assert self._io_loop is not None
+        EventLoopLagMetric.observe(max(0.0, self._io_loop.time() - self._expected))
+        self._schedule()
+
+    def start(self) -> None:
+        """
+        Starts measuring the current (main) IOLoop.
+        """
+        self._io_loop = IOLoop.current()
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._io_loop is not None and self._timeout is not None:
+            self._io_loop.remove_timeout(self._timeout)
+            self._timeout = None
@@ -0,0 +1,142 @@
+import collections
+import sys
+import threading
+import time
+from typing import Counter, Dict, List, Tuple
+
+DEFAULT_PROFILE_SECONDS = 10.0
+DEFAULT_PROFILE_HZ = 100
+MAX_PROFILE_SECONDS = 60.0
+MAX_PROFILE_HZ = 1000
+# deeper stacks are cut off at the root, so the innermost frames are kept
+MAX_STACK_DEPTH = 128
+
+# a frame of a stack: function name, file name and first line of the function
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+
+class ProfileAlreadyRunning(Exception):
+    pass
+
+
+class StackProfile:
+    """
+    Result of a profiling run: the number of samples per thread name and stack (from the outermost to the innermost
+    frame).
+    """
+
+    def __init__(self, seconds: float, hz: int) -> None:
+        self.seconds = seconds
+        self.hz = hz
+        self.samples: Counter[Tuple[str, Stack]] = collections.Counter()
+        self.sample_count = 0
+
+    def collapsed(self) -> str:
+        """
+        Returns the stacks in the collapsed format of ``flamegraph.pl`` and compatible tools: one line per thread
+        and stack with the frames separated by semicolons, followed by the number of samples.
+        """
+        lines = []
+        for (thread_name, stack), count in sorted(self.samples.items()):
+            frames = ";".join(
+                f"{name} ({filename}:{line})" for name, filename, line in stack
+            )
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """
+        Returns the stacks in the speedscope file format with one sampled profile per thread.
+        """
+        frames: List[dict] = []
+        frame_index: Dict[Frame, int] = {}
+        profiles: Dict[str, dict] = {}
+        interval = 1.0 / self.hz
+        for (thread_name, stack), count in sorted(self.samples.items()):
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append(
+                        {"name": frame[0], "file": frame[1], "line": frame[2]}
+                    )
+                indices.append(frame_index[frame])
+            profile = profiles.setdefault(
+                thread_name,
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": 0,
+                    "samples": [],
+                    "weights": [],
+                },
+            )
+            profile["samples"].append(indices)
+            profile["weights"].append(count * interval)
+            profile["endValue"] += count * interval
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"Hurricane profile ({self.seconds:g}s at {self.hz}Hz)",
+            "exporter": "django-hurricane",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+
+def thread_stack(frame) -> Stack:
+    stack: List[Frame] = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class StackSampler:
+    """
+    Sampling profiler for all threads of the process (including the IOLoop and the executor workers). The stacks are
+    read with ``sys._current_frames`` from the calling thread ``hz`` times per second. Every sample holds the GIL while
+    walking the stacks, which takes some microseconds per thread, so the overhead is bounded by the sampling rate.
+    Only one profile can run at a time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float, hz: int) -> StackProfile:
+        """
+        Samples the stacks of all threads except the current one for the given time.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfileAlreadyRunning()
+        try:
+            result = StackProfile(seconds, hz)
+            own = threading.get_ident()
+            interval = 1.0 / hz
+            deadline = time.monotonic() + seconds
+            next_sample = time.monotonic()
+            while next_sample < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    result.samples[
+                        (names.get(ident, str(ident)), thread_stack(frame))
+                    ] += 1
+                result.sample_count += 1
+                next_sample += interval
+                time.sleep(max(0.0, next_sample - time.monotonic()))
+            return result
+        finally:
+            self._lock.release()
+
+
+STACK_SAMPLER = StackSampler()
@@ -0,0 +1,178 @@
+from typing import List, Optional, Type
+
+from hurricane.metrics import (
+    EventLoopLagMetric,
+    ExecutorQueueWaitMetric,
+    ResponseErrorWindowMetric,
+    ResponseTimeWindowMetric,
+)
+from hurricane.metrics.windowed import WINDOWS, WindowedHistogramMetric
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+
+DEFAULT_READINESS_RECOVERY = 0.8
+DEFAULT_READINESS_WINDOW = "1m"
+# error rates of windows with fewer requests are not considered
+ERROR_RATE_MIN_REQUESTS = 10
+
+
+class ReadinessPolicy:
+    """
+    Marks the process as not ready, once a signal reaches its ``threshold``, and as ready again, once the signal
+    dropped below ``recovery`` (a fraction of the threshold). The gap between both prevents readiness from flapping
+    around the threshold. Signals are read from the given window of the windowed metrics; a window without
+    observations counts as healthy.
+    """
+
+    name = ""
+    # policies, which are checked by a monitor thread of their own, are only read by the readiness probe
+    monitored = False
+
+    def __init__(
+        self,
+        threshold: float,
+        recovery: float = DEFAULT_READINESS_RECOVERY,
+        window: str = DEFAULT_READINESS_WINDOW,
+    ) -> None:
+        if window not in dict(WINDOWS):
+            raise ValueError(
+                f"Unknown readiness window {window}, choose one of {', '.join(dict(WINDOWS))}"
+            )
+        self.threshold = threshold
+        self.recovery = threshold * recovery
+        self.window = window
+        self.ready = True
+        self.last_value: Optional[float] = None
+
+    def value(self) -> Optional[float]:
+        raise NotImplementedError
+
+    def check(self) -> bool:
+        """
+        Reads the signal, updates the state and returns True if the policy considers the process ready.
+        """
+        value = self.value()
+        self.last_value = value
+        if self.ready and value is not None and value >= self.threshold:
+            self.ready = False
+            if STRUCTLOG_ENABLED:
+                logger.warning(
+                    "Readiness policy failed",
+                    policy=self.name,
+                    value=value,
+                    threshold=self.threshold,
+                )
+            else:
+                logger.warning(f"Readiness policy failed: {self.describe()}")
+        elif not self.ready and (value is None or value < self.recovery):
+            self.ready = True
+            if STRUCTLOG_ENABLED:
+                logger.info("Readiness policy recovered", policy=self.name, value=value)
+            else:
+                logger.info(f"Readiness policy {self.name} recovered")
+        return self.ready
+
+    def probe(self) -> bool:
+        """
+        Returns True if the policy considers the process ready, as seen by the readiness probe: the policy is checked,
+        unless its monitor checks it.
+        """
+        return self.ready if self.monitored else self.check()
+
+    def describe(self) -> str:
+        return f"{self.name} {self.last_value or 0:.3f} >= {self.threshold:g}"
+
+
+class QuantilePolicy(ReadinessPolicy):
+    """
+    Policy on a quantile of a windowed metric.
+    """
+
+    metric: Type[WindowedHistogramMetric] = ResponseTimeWindowMetric
+    quantile = 0.99
+
+    def value(self) -> Optional[float]:
+        return self.metric.get()[self.window]["quantiles"].get(self.quantile)
+
+
+class LatencyPolicy(QuantilePolicy):
+    name = "p99 latency"
+    metric = ResponseTimeWindowMetric
+
+
+class ExecutorQueueWaitPolicy(QuantilePolicy):
+    name = "p99 executor queue wait"
+    metric = ExecutorQueueWaitMetric
+
+
+class EventLoopLagPolicy(QuantilePolicy):
+    name = "p99 event loop lag"
+    metric = EventLoopLagMetric
+
+
+class ErrorRatePolicy(ReadinessPolicy):
+    """
+    Policy on the share of server errors (5xx) in all requests of the window.
+    """
+
+    name = "error rate"
+
+    def value(self) -> Optional[float]:
+        requests = ResponseTimeWindowMetric.get()[self.window]["count"]
+        if requests < ERROR_RATE_MIN_REQUESTS:
+            return None
+        return ResponseErrorWindowMetric.get()[self.window]["count"] / requests
+
+
+class PressurePolicy(ReadinessPolicy):
+    """
+    Policy on the pressure stall information of a resource of the cgroup: the share of time in percent, in which some
+    tasks stalled on the resource, averaged over the window (10 seconds, 1 or 5 minutes). The value is read by the
+    cgroup monitor.
+    """
+
+    # the averages of the pressure stall information per window
+    averages = {"10s": "avg10", "1m": "avg60", "5m": "avg300"}
+    monitored = True
+
+    def __init__(
+        self,
+        monitor,
+        resource: str,
+        threshold: float,
+        recovery: float = DEFAULT_READINESS_RECOVERY,
+        window: str = "10s",
+    ) -> None:
+        super().__init__(threshold, recovery, window)
+        self.monitor = monitor
+        self.resource = resource
+        self.name = f"{resource} pressure"
+
+    def value(self) -> Optional[float]:
+        return self.monitor.pressure(self.resource, average=self.averages[self.window])
+
+
+POLICY_OPTIONS = (
+    ("readiness_max_latency", LatencyPolicy),
+    ("readiness_max_queue_wait", ExecutorQueueWaitPolicy),
+    ("readiness_max_loop_lag", EventLoopLagPolicy),
+    ("readiness_max_error_rate", ErrorRatePolicy),
+)
+
+
+def make_readiness_policies(options: dict) -> List[ReadinessPolicy]:
+    """
+    Creates the readiness policies, which have a threshold set in the options.
+    """
+    recovery = float(options.get("readiness_recovery") or DEFAULT_READINESS_RECOVERY)
+    window = options.get("readiness_window") or DEFAULT_READINESS_WINDOW
+    policies = [
+        policy_cls(float(options[option]), recovery, window)
+        for option, policy_cls in POLICY_OPTIONS
+        if options.get(option)
+    ]
+    from hurricane.server.cgroup import make_cgroup_monitor
+
+    monitor = make_cgroup_monitor(options)
+    if monitor is not None:
+        policies.extend(monitor.policies)
+    return policies
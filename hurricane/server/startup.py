@@ -0,0 +1,98 @@
+import contextlib
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+
+STARTUP_PROFILE_EVENT = "Startup profile"
+
+
+def process_start_time() -> Optional[float]:
+    """
+    Returns the wall clock time at which the current process was created, or None if it cannot be determined.
+    """
+    try:
+        import psutil  # type: ignore
+
+        return psutil.Process().create_time()
+    except Exception:
+        return None
+
+
+def run_management_command(command: str) -> float:
+    """
+    Runs a management command given as string (e.g. "compilemessages --no-color") and returns its duration in seconds.
+    This function is also the entrypoint of processes, which run commands of a command group in parallel: spawned
+    processes need to set up Django first.
+    """
+    import django
+    from django.apps import apps
+    from django.core.management import call_command
+
+    if not apps.ready:
+        django.setup()
+    start = time.perf_counter()
+    call_command(*command.split())
+    return time.perf_counter() - start
+
+
+class StartupProfile:
+    """
+    Collects the durations of the single startup phases (e.g. management commands, migration check, listen). Phases
+    can be recorded from different threads, as management commands and checks run in a separate executor.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Adds the duration of a phase in seconds. Durations of phases, which are recorded several times, are summed up.
+        """
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Context manager, which records the duration of the enclosed block as phase with the given name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.phases)
+
+    def report(self, start_time: float, export: bool = True) -> Dict[str, float]:
+        """
+        Finishes the profile: the time spent before the management command was started (interpreter startup, imports
+        and ``django.setup()``) is added as 'bootstrap' phase, the overall startup time including the bootstrap as
+        'total'. The phases are logged as one structured event and exported to the startup phase metric.
+        """
+        created = process_start_time()
+        if created is not None and "bootstrap" not in self.phases:
+            self.record("bootstrap", max(0.0, start_time - created))
+        bootstrap = self.as_dict().get("bootstrap", 0.0)
+        self.record("total", bootstrap + time.time() - start_time)
+        phases = {name: round(seconds, 5) for name, seconds in self.as_dict().items()}
+        if export:
+            from hurricane.metrics import StartupPhaseMetric
+
+            StartupPhaseMetric.set(phases)
+        if STRUCTLOG_ENABLED:
+            logger.info(STARTUP_PROFILE_EVENT, **phases)
+        else:
+            logger.info(
+                f"{STARTUP_PROFILE_EVENT}: "
+                + ", ".join(f"{name}={seconds}s" for name, seconds in phases.items())
+            )
+        return phases
+
+
+startup_profile = StartupProfile()
@@ -0,0 +1,198 @@
+import contextlib
+import hmac
+import random
+import time
+from typing import List, Optional, Tuple
+
+# headers, in which load balancers and ingress controllers pass the time they received a request
+REQUEST_START_HEADERS = ("X-Request-Start", "X-Queue-Start")
+# larger queue times are considered bogus (e.g. clock skew or a wrong unit) and are ignored
+MAX_QUEUE_TIME = 3600.0
+# requests with this header set to the configured token always get a Server-Timing header
+SERVER_TIMING_DEBUG_HEADER = "X-Server-Timing"
+
+
+def parse_request_start(value: str) -> Optional[float]:
+    """
+    Parses the value of an ``X-Request-Start`` or ``X-Queue-Start`` header and returns the timestamp in seconds
+    since the epoch. Supported are the usual formats with or without ``t=`` prefix: seconds with fraction (e.g. nginx
+    ``t=${msec}``), milliseconds, microseconds (e.g. Heroku, Apache ``%t``) and nanoseconds. The unit is guessed from
+    the magnitude of the value.
+    """
+    value = value.strip()
+    if value.startswith("t="):
+        value = value[2:]
+    try:
+        timestamp = float(value)
+    except ValueError:
+        return None
+    if timestamp > 1e17:
+        timestamp /= 1e9
+    elif timestamp > 1e14:
+        timestamp /= 1e6
+    elif timestamp > 1e11:
+        timestamp /= 1e3
+    return timestamp if timestamp > 0 else None
+
+
+def ingress_start(headers) -> Optional[float]:
+    """
+    Returns the time the request was received by the ingress according to the request headers, if given.
+    """
+    for header in REQUEST_START_HEADERS:
+        value = headers.get(header)
+        if value:
+            return parse_request_start(value)
+    return None
+
+
+class RequestTimeline:
+    """
+    Timestamps (seconds since the epoch) of the stages of a request: received by the ingress (``ingress``), parsed
+    by Tornado (``accept``), dispatched to the executor (``dispatch``), started and returned by the WSGI application
+    (``app_start`` and ``app_return``) and the response written (``write_complete``). Stages, which were not reached,
+    are None. ``db`` is the time spent in database queries, if it was measured.
+    """
+
+    __slots__ = (
+        "db",
+        "ingress",
+        "accept",
+        "dispatch",
+        "app_start",
+        "app_return",
+        "write_complete",
+    )
+
+    # every phase is the time between two stages
+    PHASES = (
+        ("queue", "ingress", "accept"),
+        ("dispatch", "accept", "dispatch"),
+        ("executor", "dispatch", "app_start"),
+        ("app", "app_start", "app_return"),
+        ("write", "app_return", "write_complete"),
+    )
+
+    def __init__(self, accept: float, ingress: Optional[float] = None) -> None:
+        self.ingress = ingress
+        self.accept = accept
+        self.dispatch: Optional[float] = None
+        self.app_start: Optional[float] = None
+        self.app_return: Optional[float] = None
+        self.write_complete: Optional[float] = None
+        self.db: Optional[float] = None
+
+    @classmethod
+    def from_request(cls, request) -> "RequestTimeline":
+        return cls(request._start_time, ingress_start(request.headers))
+
+    def mark(self, stage: str) -> float:
+        """
+        Sets the given stage to the current time and returns it.
+        """
+        now = time.time()
+        setattr(self, stage, now)
+        return now
+
+    def phases(self) -> List[Tuple[str, float]]:
+        """
+        Returns the durations of all phases, which both stages were reached for. The ingress queue time is clamped
+        to zero, as the clocks of ingress and Hurricane may differ slightly.
+        """
+        phases = []
+        for phase, start_stage, end_stage in self.PHASES:
+            start = getattr(self, start_stage)
+            end = getattr(self, end_stage)
+            if start is None or end is None:
+                continue
+            duration = max(0.0, end - start)
+            if phase == "queue" and end - start > MAX_QUEUE_TIME:
+                continue
+            phases.append((phase, duration))
+        return phases
+
+
+class ServerTiming:
+    """
+    Adds a ``Server-Timing`` header with the ingress queue time, the executor wait, the application time, the database
+    time and the total server time to sampled responses. Requests are sampled with the given ``rate`` (0 to 1) or if
+    they send the ``token`` in the ``X-Server-Timing`` header. Entries set by the application are kept.
+    """
+
+    def __init__(self, rate: float = 0.0, token: Optional[str] = None) -> None:
+        self.rate = rate
+        self.token = token
+
+    def sample(self, request) -> bool:
+        """
+        Returns True if the response to the given request gets a Server-Timing header.
+        """
+        if self.token:
+            value = request.headers.get(SERVER_TIMING_DEBUG_HEADER)
+            if value and hmac.compare_digest(value.encode(), self.token.encode()):
+                return True
+        return self.rate > 0 and random.random() < self.rate
+
+    @staticmethod
+    def measure_queries(timeline: RequestTimeline) -> contextlib.ExitStack:
+        """
+        Returns a context, which adds the time of all database queries of the current thread to the timeline.
+        """
+        from django.db import connections
+
+        timeline.db = 0.0
+
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timeline.db = (timeline.db or 0.0) + time.perf_counter() - start
+
+        stack = contextlib.ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        return stack
+
+    @staticmethod
+    def header(timeline: RequestTimeline) -> str:
+        """
+        Returns the Server-Timing entries (durations in milliseconds) of the timeline up to now.
+        """
+        entries = []
+        if (
+            timeline.ingress is not None
+            and 0 <= timeline.accept - timeline.ingress <= MAX_QUEUE_TIME
+        ):
+            entries.append(("queue", timeline.accept - timeline.ingress))
+        if timeline.dispatch is not None and timeline.app_start is not None:
+            entries.append(("executor", timeline.app_start - timeline.dispatch))
+        if timeline.app_start is not None and timeline.app_return is not None:
+            entries.append(("app", timeline.app_return - timeline.app_start))
+        if timeline.db is not None:
+            entries.append(("db", timeline.db))
+        entries.append(("total", time.time() - timeline.accept))
+        return ", ".join(
+            f"{name};dur={max(0.0, duration) * 1000:.2f}" for name, duration in entries
+        )
+
+    @staticmethod
+    def merge(headers: List[Tuple[str, str]], value: str) -> List[Tuple[str, str]]:
+        """
+        Returns the headers with the given entries appended to the Server-Timing headers of the application.
+        """
+        existing = [v for k, v in headers if k.lower() == "server-timing" and v.strip()]
+        merged = [(k, v) for k, v in headers if k.lower() != "server-timing"]
+        merged.append(("Server-Timing", ", ".join([*existing, value])))
+        return merged
+
+
+def make_server_timing(options: dict) -> Optional[ServerTiming]:
+    """
+    Returns the Server-Timing configuration of the options or None, if Server-Timing headers are disabled.
+    """
+    rate = float(options.get("server_timing_rate") or 0)
+    token = options.get("server_timing_token") or None
+    if rate <= 0 and not token:
+        return None
+    return ServerTiming(min(rate, 1.0), token)
@@ -0,0 +1,247 @@
+import atexit
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from hurricane.metrics import SlowRequestMetric
+from hurricane.server.loggers import STRUCTLOG_ENABLED, logger
+
+# the watchdog checks at least this often, so slow requests are reported at most this late
+DEFAULT_WATCHDOG_INTERVAL = 1.0
+MIN_WATCHDOG_INTERVAL = 0.05
+
+
+def format_stack(frame) -> str:
+    """
+    Returns the formatted stack of a frame (from the outermost to the innermost call).
+    """
+    if frame is None:
+        return "<no stack>\n"
+    return "".join(traceback.format_stack(frame))
+
+
+def thread_dump() -> str:
+    """
+    Returns the stacks of all threads of the process.
+    """
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    dump = ""
+    for ident, frame in sys._current_frames().items():
+        dump += (
+            f'Thread "{names.get(ident, ident)}" ({ident}):\n{format_stack(frame)}\n'
+        )
+    return dump
+
+
+class ActiveRequest:
+    """
+    A request, which is being processed by the WSGI application on an executor thread.
+    """
+
+    __slots__ = ("thread", "method", "path", "request_id", "started", "reported")
+
+    def __init__(self, environ: dict, started: float) -> None:
+        self.thread = threading.get_ident()
+        self.method = environ.get("REQUEST_METHOD", "")
+        self.path = environ.get("PATH_INFO", "")
+        self.request_id = environ.get("HTTP_X_REQUEST_ID", "n/a")
+        self.started = started
+        self.reported = False
+
+
+class RequestWatchdog(threading.Thread):
+    """
+    Watches the executor from a background thread, so it works even if the event loop is blocked.
+
+    Requests, which run longer than ``slow_threshold`` seconds, are reported once: the stack of their executor thread
+    is logged with method, path and request ID and ``slow_requests_total`` is incremented. Slow requests, which finish
+    before the watchdog noticed them, are counted without a stack.
+
+    The executor is considered stuck, if requests wait for an executor thread, but no request finished for
+    ``stuck_timeout`` seconds. A thread dump is logged once the executor gets stuck and kept for the liveness probe.
+    """
+
+    def __init__(
+        self,
+        slow_threshold: Optional[float] = None,
+        stuck_timeout: Optional[float] = None,
+        interval: Optional[float] = None,
+    ) -> None:
+        super().__init__(name="hurricane-watchdog", daemon=True)
+        self.slow_threshold = slow_threshold
+        self.stuck_timeout = stuck_timeout
+        if interval is None:
+            interval = min(
+                [DEFAULT_WATCHDOG_INTERVAL]
+                + [value / 2 for value in (slow_threshold, stuck_timeout) if value]
+            )
+        self.interval = max(MIN_WATCHDOG_INTERVAL, interval)
+        self.active: Dict[int, ActiveRequest] = {}
+        self.waiting = 0
+        self.waiting_since = time.monotonic()
+        self.last_finished = time.monotonic()
+        self.stuck = False
+        self.stuck_dump = ""
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def dispatched(self) -> None:
+        """
+        Called on the event loop, when a request is handed to the executor.
+        """
+        with self._lock:
+            if not self.waiting:
+                self.waiting_since = time.monotonic()
+            self.waiting += 1
+
+    def started(self, environ: dict) -> ActiveRequest:
+        """
+        Called on the executor thread, when the WSGI application is started for a request.
+        """
+        request = ActiveRequest(environ, time.monotonic())
+        with self._lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.active[id(request)] = request
+        return request
+
+    def finished(self, request: ActiveRequest) -> None:
+        """
+        Called on the executor thread, when the WSGI application returned for a request.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.active.pop(id(request), None)
+            self.last_finished = now
+            # the watchdog thread may report the request at the same time, it is counted only once
+            slow = bool(
+                self.slow_threshold
+                and not request.reported
+                and now - request.started >= self.slow_threshold
+            )
+            request.reported = request.reported or slow
+        if slow:
+            SlowRequestMetric.increment()
+
+    def check(self) -> None:
+        """
+        Reports slow requests and updates the stuck state of the executor.
+        """
+        now = time.monotonic()
+        slow: List[ActiveRequest] = []
+        with self._lock:
+            active: List[ActiveRequest] = list(self.active.values())
+            waiting = self.waiting
+            progress = max(self.last_finished, self.waiting_since)
+            if self.slow_threshold:
+                for request in active:
+                    if (
+                        not request.reported
+                        and now - request.started >= self.slow_threshold
+                    ):
+                        request.reported = True
+                        slow.append(request)
+        if slow:
+            frames = sys._current_frames()
+            for request in slow:
+                SlowRequestMetric.increment()
+                self._report_slow_request(
+                    request,
+                    now - request.started,
+                    format_stack(frames.get(request.thread)),
+                )
+        if self.stuck_timeout:
+            stuck = bool(waiting) and now - progress >= self.stuck_timeout
+            if stuck and not self.stuck:
+                self.stuck_dump = thread_dump()
+                if STRUCTLOG_ENABLED:
+                    logger.error(
+                        "Executor stuck",
+                        waiting=waiting,
+                        running=len(active),
+                        seconds=now - progress,
+                        threads=self.stuck_dump,
+                    )
+                else:
+                    logger.error(
+                        f"Executor stuck: {waiting} requests waiting, {len(active)} running and no request finished "
+                        f"for {now - progress:.1f}s\n{self.stuck_dump}"
+                    )
+            elif self.stuck and not stuck:
+                logger.info("Executor recovered")
+            self.stuck = stuck
+
+    @staticmethod
+    def _report_slow_request(
+        request: ActiveRequest, elapsed: float, stack: str
+    ) -> None:
+        if STRUCTLOG_ENABLED:
+            logger.warning(
+                "Slow request",
+                method=request.method,
+                path=request.path,
+                id=request.request_id,
+                seconds=elapsed,
+                stack=stack,
+            )
+        else:
+            logger.warning(
+                f"Slow request {request.method} {request.path} (id {request.request_id}) running for "
+                f"{elapsed:.1f}s:\n{stack}"
+            )
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Watchdog check failed: {e}")
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+REQUEST_WATCHDOG: Optional[RequestWatchdog] = None
+
+
+def get_request_watchdog() -> Optional[RequestWatchdog]:
+    return REQUEST_WATCHDOG
+
+
+def start_request_watchdog(
+    slow_threshold: Optional[float], stuck_timeout: Optional[float]
+) -> RequestWatchdog:
+    """
+    Starts the request watchdog of this process, unless it is already running.
+    """
+    global REQUEST_WATCHDOG
+    if REQUEST_WATCHDOG is None:
+        REQUEST_WATCHDOG = RequestWatchdog(slow_threshold, stuck_timeout)
+        REQUEST_WATCHDOG.start()
+        atexit.register(REQUEST_WATCHDOG.stop)
+        if STRUCTLOG_ENABLED:
+            logger.info(
+                "Request watchdog",
+                slow_threshold=slow_threshold,
+                stuck_timeout=stuck_timeout,
+            )
+        else:
+            logger.info(
+                f"Request watchdog started (slow requests: {slow_threshold}s, stuck executor: {stuck_timeout}s)"
+            )
+    return REQUEST_WATCHDOG
+
+
+def make_request_watchdog(options: dict) -> Optional[RequestWatchdog]:
+    """
+    Returns the request watchdog of the options or None, if neither slow requests nor a stuck executor are detected.
+    """
+    slow_threshold = options.get("slow_request_threshold")
+    stuck_timeout = options.get("stuck_executor_timeout")
+    if not slow_threshold and not stuck_timeout:
+        return None
+    return start_request_watchdog(
+        float(slow_threshold) if slow_threshold else None,
+        float(stuck_timeout) if stuck_timeout else None,
+    )
@@ -1,18 +1,73 @@
 from types import TracebackType
 from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 
+import django
 import tornado.wsgi
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
 from tornado import escape, httputil
 from tornado.ioloop import IOLoop
 
-from hurricane.management.commands import HURRICANE_DIST_VERSION
-from hurricane.metrics import registry
+from hurricane.management.commands import get_hurricane_dist_version
+from hurricane.metrics import (
+    ExecutorQueueWaitMetric,
+    PathCounterMetric,
+    RequestPhaseMetric,
+    ResponseSizeMetric,
+    ResponseTimeMetric,
+    RouteResponseSizeMetric,
+    RouteResponseTimeMetric,
+)
+from hurricane.server.loggers import logger
+from hurricane.server.memory import RouteMemorySampler
+from hurricane.server.timing import RequestTimeline, ServerTiming
+from hurricane.server.watchdog import RequestWatchdog
+
+ROUTE_ENVIRON_KEY = "hurricane.route"
+UNMATCHED_ROUTE = "unmatched"
 
 
 class HurricaneWSGIException(Exception):
     pass
 
 
+def route_label(resolver_match) -> str:
+    """
+    Returns the label of the resolved route of a request: the route pattern (e.g. ``/users/<int:pk>/``) or the URL
+    name, if the setting ``METRICS_PATH_LABEL`` is set to "name". Requests, which did not resolve to a view, are
+    labelled ``unmatched``.
+    """
+    if resolver_match is None:
+        return UNMATCHED_ROUTE
+    if getattr(settings, "METRICS_PATH_LABEL", "route") == "name":
+        if resolver_match.view_name:
+            return resolver_match.view_name
+    return "/" + resolver_match.route
+
+
+class HurricaneWSGIHandler(WSGIHandler):
+    """
+    Django WSGI handler, which stores the label of the resolved route of every request in the WSGI environ. The WSGI
+    container uses it to label path metrics with the route instead of the raw path, which keeps the number of time
+    series bounded.
+    """
+
+    def get_response(self, request):
+        response = super().get_response(request)
+        request.META[ROUTE_ENVIRON_KEY] = route_label(
+            getattr(request, "resolver_match", None)
+        )
+        return response
+
+
+def get_hurricane_wsgi_application() -> HurricaneWSGIHandler:
+    """
+    Equivalent of ``django.core.wsgi.get_wsgi_application`` returning the Hurricane WSGI handler.
+    """
+    django.setup(set_prefix=False)
+    return HurricaneWSGIHandler()
+
+
 class HurricaneWSGIContainer(tornado.wsgi.WSGIContainer):
     """
     Wrapper for the tornado WSGI Container, which creates a WSGI-compatible function runnable on Tornado's
@@ -20,9 +75,24 @@ class HurricaneWSGIContainer(tornado.wsgi.WSGIContainer):
 
     """
 
-    def __init__(self, handler, wsgi_application, observe=True, executor=None) -> None:
+    def __init__(
+        self,
+        handler,
+        wsgi_application,
+        observe=True,
+        executor=None,
+        server_timing: Optional[ServerTiming] = None,
+        watchdog: Optional[RequestWatchdog] = None,
+        memory_sampler: Optional[RouteMemorySampler] = None,
+    ) -> None:
         self.handler = handler
         self._observe = observe
+        self.server_timing = server_timing
+        self.watchdog = watchdog
+        self.memory_sampler = memory_sampler
+        self.route = UNMATCHED_ROUTE
+        self.response_size = 0
+        self.timeline: Optional[RequestTimeline] = None
         super(HurricaneWSGIContainer, self).__init__(
             wsgi_application, executor=executor
         )
@@ -31,14 +101,56 @@ class HurricaneWSGIContainer(tornado.wsgi.WSGIContainer):
         self.handler._status_code = status_code
         self.handler.application.log_request(self.handler)
         if self._observe:
-            registry.get("response_time_seconds").observe(request.request_time())
-            registry.get("path_requests_total").increment(
-                request.method, self.handler.request.path
+            request_time = request.request_time()
+            ResponseTimeMetric.observe(request_time)
+            PathCounterMetric.increment(request.method, self.route)
+            RouteResponseTimeMetric.observe_request(
+                request_time, self.route, status_code, request.method
             )
+            RouteResponseSizeMetric.observe_request(
+                self.response_size, self.route, status_code, request.method
+            )
+            if self.timeline is not None:
+                for phase, duration in self.timeline.phases():
+                    RequestPhaseMetric.observe(duration, phase)
 
     def __call__(self, request: httputil.HTTPServerRequest) -> None:
         IOLoop.current().spawn_callback(self.handle_request, request)
 
+    def _run_application(
+        self, timeline: RequestTimeline, timed: bool, environ, start_response
+    ):
+        """
+        Runs the WSGI application on an executor thread and observes, how long the request waited for the thread. If
+        the request is ``timed`` for a Server-Timing header, the time of its database queries is measured as well.
+        Requests are tracked by the watchdog and the memory of sampled requests is attributed to their route.
+        """
+        started = timeline.mark("app_start")
+        if self._observe:
+            ExecutorQueueWaitMetric.observe(started - (timeline.dispatch or started))
+        watchdog = self.watchdog
+        active = watchdog.started(environ) if watchdog is not None else None
+        memory = None
+        try:
+            # the request is tracked before the memory is sampled, so a failing sample does not leave it waiting
+            memory = self.memory_sampler.sample() if self.memory_sampler else None
+            if timed:
+                with ServerTiming.measure_queries(timeline):
+                    response = self.wsgi_application(environ, start_response)
+            else:
+                response = self.wsgi_application(environ, start_response)
+        finally:
+            if watchdog is not None and active is not None:
+                watchdog.finished(active)
+            # failed requests are attributed as well, they often leak
+            if memory is not None:
+                try:
+                    memory.finish(environ.get(ROUTE_ENVIRON_KEY, UNMATCHED_ROUTE))
+                except Exception as e:
+                    # the response (or exception) of the application takes precedence
+                    logger.error(f"Sampling the memory of the request failed: {e}")
+        return response
+
     async def handle_request(self, request: httputil.HTTPServerRequest) -> None:
         data: Dict[str, Any] = {}
         response: List[bytes] = []
@@ -59,12 +171,21 @@ class HurricaneWSGIContainer(tornado.wsgi.WSGIContainer):
             return response.append
 
         loop = IOLoop.current()
+        environ = self.environ(request)
+        self.timeline = timeline = RequestTimeline.from_request(request)
+        timed = self.server_timing is not None and self.server_timing.sample(request)
+        timeline.mark("dispatch")
+        if self.watchdog is not None:
+            self.watchdog.dispatched()
         app_response = await loop.run_in_executor(
             self.executor,
-            self.wsgi_application,
-            self.environ(request),
+            self._run_application,
+            timeline,
+            timed,
+            environ,
             start_response,
         )
+        self.route = environ.get(ROUTE_ENVIRON_KEY, UNMATCHED_ROUTE)
         try:
             app_response_iter = iter(app_response)
 
@@ -84,6 +205,7 @@ class HurricaneWSGIContainer(tornado.wsgi.WSGIContainer):
         finally:
             if hasattr(app_response, "close"):
                 app_response.close()  # type: ignore
+        timeline.mark("app_return")
         body = b"".join(response)
         if not data:
             raise Exception("WSGI app did not call start_response")
@@ -99,7 +221,9 @@ class HurricaneWSGIContainer(tornado.wsgi.WSGIContainer):
             if "content-type" not in header_set:
                 headers.append(("Content-Type", "text/html; charset=UTF-8"))
         if "server" not in header_set:
-            headers.append(("Server", "Hurricane/%s" % HURRICANE_DIST_VERSION))
+            headers.append(("Server", "Hurricane/%s" % get_hurricane_dist_version()))
+        if timed:
+            headers = ServerTiming.merge(headers, ServerTiming.header(timeline))
 
         start_line = httputil.ResponseStartLine("HTTP/1.1", status_code, reason)
         header_obj = httputil.HTTPHeaders()
@@ -114,8 +238,10 @@ class HurricaneWSGIContainer(tornado.wsgi.WSGIContainer):
         else:
             request.connection.write_headers(start_line, header_obj, chunk=body)
         if self._observe:
-            registry.metrics["response_size_bytes"].observe(len(body))
+            self.response_size = len(body)
+            ResponseSizeMetric.observe(self.response_size)
         request.connection.finish()
+        timeline.mark("write_complete")
         self._log(status_code, request)
 
     @staticmethod
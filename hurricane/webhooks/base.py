@@ -6,9 +6,7 @@ import typing
 from concurrent.futures.thread import ThreadPoolExecutor
 from enum import Enum
 
-import requests
 from django.conf import settings
-from requests import RequestException
 
 from hurricane.server.loggers import logger
 
@@ -90,6 +88,8 @@ class Webhook:
 
     def _send_webhook(self, data: dict, webhook_url: str, close_loop: bool):
         # sending webhook request to the specified url
+        import requests
+
         logger.info(f"Start sending {self.code} webhook to {webhook_url}")
 
         response = requests.post(webhook_url, timeout=5, json=data)
@@ -126,6 +126,8 @@ class Webhook:
         # checks if sending webhook had any failures, it indicates, that command was successfully executed
         # but sending webhook has failed
         if future:
+            from requests import RequestException
+
             try:
                 future.result()
             except RequestException as e:
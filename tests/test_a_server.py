@@ -1,5 +1,10 @@
+import json
 import os
 import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
@@ -10,6 +15,7 @@ from hurricane.testing.drivers import BusyPortException, HurricaneServerDriver
 
 CURRENT_DIR = os.getcwd()
 STATIC_PATH = f"{CURRENT_DIR}/static"
+MULTIPROCESS_DIR = os.path.join(tempfile.gettempdir(), "hurricane_multiprocess_test")
 
 
 class HurricanStartServerTests(HurricanServerTest):
@@ -285,6 +291,43 @@ class HurricanStartServerTests(HurricanServerTest):
         res = self.app_client.get("/")
         self.assertEqual(res.status, 200)
 
+    @HurricanServerTest.cycle_server(
+        args=["--command", "makemigrations", "check", "--probe-port", "8090"]
+    )
+    def test_startup_with_parallel_management_commands(self):
+        for _ in range(30):
+            res = self.probe_client.get(self.startup_route)
+            if res.status == 200:
+                break
+            time.sleep(0.5)
+        self.assertEqual(res.status, 200)
+        out, err = self.driver.get_output(read_all=True)
+        self.assertIn("No changes detected", out)
+        self.assertIn("System check identified no issues", out)
+        if STRUCTLOG_ENABLED:
+            self.assertIn("Executing commands in parallel", out)
+        else:
+            self.assertIn(
+                "Starting execution of commands ['makemigrations', 'check'] in parallel",
+                out,
+            )
+            self.assertIn("Command makemigrations was executed in", out)
+            self.assertIn("Command check was executed in", out)
+
+    @HurricanServerTest.cycle_server(
+        args=["--command", "makemigrations", "failingcommand", "--probe-port", "8090"]
+    )
+    def test_startup_failing_parallel_management_commands(self):
+        for _ in range(30):
+            out, err = self.driver.get_output(read_all=True)
+            if "Loop will be closed" in out:
+                break
+            time.sleep(0.5)
+        self.assertIn("Unknown command: 'failingcommand'", out)
+        self.assertIn("Loop will be closed", out)
+        with self.assertRaises(ConnectionRefusedError):
+            self.app_client.get("/")
+
     @HurricanServerTest.cycle_server(
         args=["--command", "failingcommand", "--probe-port", "8090"]
     )
@@ -561,6 +604,246 @@ class HurricanStartServerTests(HurricanServerTest):
         with self.assertRaises(SystemExit):
             signal_handler("signal", "frame")
 
+    @HurricanServerTest.cycle_server(args=["--probe-check-interval", "60"])
+    def test_probe_check_cached(self):
+        response = requests.get("http://localhost:8001/alive")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Probe-Check-Age", response.headers)
+        time.sleep(0.5)
+        response = requests.get("http://localhost:8001/alive")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(float(response.headers["X-Probe-Check-Age"]), 0.5)
+        response = requests.get("http://localhost:8001/ready")
+        self.assertEqual(response.status_code, 200)
+        response = requests.get("http://localhost:8001/alive?sync=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(float(response.headers["X-Probe-Check-Age"]), 0.5)
+
+    @HurricanServerTest.cycle_server(
+        env={"DJANGO_SETTINGS_MODULE": "tests.testapp.settings_operational_error"},
+        args=["--probe-check-interval", "60"],
+    )
+    def test_probe_check_cached_error(self):
+        res = self.probe_client.get(self.alive_route)
+        self.assertEqual(res.status, 500)
+        self.assertIn("database error", res.text)
+        res = self.probe_client.get(self.alive_route)
+        self.assertEqual(res.status, 500)
+
+    @HurricanServerTest.cycle_server(args=["--probe-thread"])
+    def test_probe_thread(self):
+        res = self.probe_client.get(self.startup_route)
+        self.assertEqual(res.status, 200)
+        res = self.probe_client.get(self.alive_route)
+        self.assertEqual(res.status, 200)
+        res = self.probe_client.get(self.ready_route)
+        self.assertEqual(res.status, 200)
+        res = self.app_client.get("/")
+        self.assertEqual(res.status, 200)
+        out, err = self.driver.get_output(read_all=True)
+        self.assertIn("Probe application is running on a separate thread", out)
+
+    @HurricanServerTest.cycle_server(args=["--readiness-max-latency", "0.000001"])
+    def test_readiness_latency_policy(self):
+        res = self.probe_client.get(self.ready_route)
+        self.assertEqual(res.status, 200)
+        self.app_client.get("/")
+        res = self.probe_client.get(self.ready_route)
+        self.assertEqual(res.status, 400)
+        self.assertIn("not ready: p99 latency", res.text)
+        out, err = self.driver.get_output(read_all=True)
+        self.assertIn("Readiness policy failed", out)
+
+    @HurricanServerTest.cycle_server(args=["--server-timing-token", "secret"])
+    def test_server_timing(self):
+        response = requests.get("http://localhost:8000/medium")
+        self.assertNotIn("Server-Timing", response.headers)
+        response = requests.get(
+            "http://localhost:8000/medium", headers={"X-Server-Timing": "wrong"}
+        )
+        self.assertNotIn("Server-Timing", response.headers)
+        response = requests.get(
+            "http://localhost:8000/medium", headers={"X-Server-Timing": "secret"}
+        )
+        entries = [
+            e.split(";")[0] for e in response.headers["Server-Timing"].split(", ")
+        ]
+        self.assertEqual(entries, ["executor", "app", "db", "total"])
+        response = requests.get(
+            "http://localhost:8000/timing", headers={"X-Server-Timing": "secret"}
+        )
+        self.assertTrue(
+            response.headers["Server-Timing"].startswith(
+                "cache;desc=hit;dur=1, executor;dur="
+            )
+        )
+
+    @HurricanServerTest.cycle_server(
+        args=["--access-log-async", "--access-log-sample", "0"]
+    )
+    def test_access_log_async(self):
+        self.app_client.get("/")
+        self.app_client.get("/doesnotexist")
+        time.sleep(0.5)
+        out, err = self.driver.get_output(read_all=True)
+        if STRUCTLOG_ENABLED:
+            self.assertIn('"event":"TX GET /doesnotexist', out)
+            self.assertIn('"status":404', out)
+            self.assertNotIn('"status":200', out)
+        else:
+            self.assertIn("hurricane.server.access 404 GET /doesnotexist (", out)
+            self.assertNotIn("hurricane.server.access 200 GET", out)
+
+    @HurricanServerTest.cycle_server(args=["--debug-token", "secret"])
+    def test_profile_endpoint(self):
+        response = requests.get("http://localhost:8001/profile?seconds=0.2")
+        self.assertEqual(response.status_code, 403)
+        headers = {"Authorization": "Bearer secret"}
+        response = requests.get(
+            "http://localhost:8001/profile?seconds=100", headers=headers
+        )
+        self.assertEqual(response.status_code, 400)
+        response = requests.get(
+            "http://localhost:8001/profile?seconds=0.2&hz=50", headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("MainThread;", response.text)
+        response = requests.get(
+            "http://localhost:8001/profile?seconds=0.2&format=speedscope",
+            headers=headers,
+        )
+        self.assertEqual(response.json()["exporter"], "django-hurricane")
+
+    @HurricanServerTest.cycle_server(args=["--debug-token", "secret"])
+    def test_tracemalloc_endpoints(self):
+        headers = {"Authorization": "Bearer secret"}
+        url = "http://localhost:8001/tracemalloc"
+        response = requests.post(f"{url}/snapshots", headers=headers)
+        self.assertEqual(response.status_code, 409)
+        response = requests.post(f"{url}?frames=5", headers=headers)
+        self.assertEqual(response.json()["frames"], 5)
+        first = requests.post(f"{url}/snapshots", headers=headers).json()["id"]
+        self.app_client.get("/memory")
+        second = requests.post(f"{url}/snapshots", headers=headers).json()["id"]
+        response = requests.get(
+            f"{url}/snapshots/{second}?limit=3&key=filename", headers=headers
+        )
+        self.assertEqual(len(response.json()), 3)
+        response = requests.get(
+            f"{url}/snapshots/{second}?compare={first}&limit=1", headers=headers
+        )
+        self.assertIn("size_diff", response.json()[0])
+        response = requests.get(f"{url}/snapshots/99", headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = requests.get(f"{url}/snapshots", headers=headers)
+        self.assertEqual(len(response.json()["snapshots"]), 2)
+        response = requests.delete(url, headers=headers)
+        self.assertFalse(response.json()["tracing"])
+
+    @HurricanServerTest.cycle_server(
+        args=["--debug-token", "secret", "--route-memory-sample", "1"]
+    )
+    def test_route_memory(self):
+        self.app_client.get("/memory")
+        self.app_client.get("/")
+        response = requests.get(
+            "http://localhost:8001/memory/routes",
+            headers={"Authorization": "Bearer secret"},
+        )
+        routes = [entry["route"] for entry in response.json()]
+        self.assertEqual(sorted(routes), ["/", "/memory"])
+        self.assertIn("rss_bytes", response.json()[0])
+        response = requests.get("http://localhost:8001/metrics")
+        self.assertIn('route_memory_samples_total{route="/memory"} 1.0', response.text)
+        self.assertIn(
+            'route_memory_bytes{measure="rss",route="/memory"}', response.text
+        )
+
+    @HurricanServerTest.cycle_server(
+        args=["--gc-freeze", "--gc-thresholds", "1000,10,10"]
+    )
+    def test_gc_freeze(self):
+        out, err = self.driver.get_output(read_all=True)
+        self.assertIn("GC thresholds set to (1000, 10, 10)", out)
+        self.assertIn("objects of the startup to the permanent GC generation", out)
+        self.app_client.get("/")
+        response = requests.get("http://localhost:8001/metrics")
+        self.assertIn('gc_pause_seconds_bucket{generation="0"', response.text)
+        self.assertIn('gc_collections_total{generation="0"}', response.text)
+
+    @HurricanServerTest.cycle_server()
+    def test_profile_endpoint_disabled(self):
+        response = requests.get(
+            "http://localhost:8001/profile", headers={"Authorization": "Bearer "}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @HurricanServerTest.cycle_server(
+        args=[
+            "--workers",
+            "1",
+            "--slow-request-threshold",
+            "0.2",
+            "--stuck-executor-timeout",
+            "0.5",
+            "--stuck-executor-liveness",
+        ]
+    )
+    def test_request_watchdog(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        slow = executor.submit(
+            requests.get,
+            "http://localhost:8000/slow?seconds=2",
+            headers={"X-Request-ID": "slow-1"},
+        )
+        time.sleep(0.3)
+        waiting = executor.submit(requests.get, "http://localhost:8000/")
+        time.sleep(1.2)
+        res = self.probe_client.get(self.alive_route)
+        self.assertEqual(res.status, 500)
+        self.assertIn("executor stuck", res.text)
+        self.assertIn("slow_view", res.text)
+        self.assertEqual(slow.result().status_code, 200)
+        self.assertEqual(waiting.result().status_code, 200)
+        time.sleep(0.5)
+        res = self.probe_client.get(self.alive_route)
+        self.assertEqual(res.status, 200)
+        response = requests.get("http://localhost:8001/metrics")
+        self.assertIn("slow_requests_total 1.0", response.text)
+        out, err = self.driver.get_output(read_all=True)
+        self.assertIn("Slow request GET /slow (id slow-1)", out)
+        self.assertIn("time.sleep", out)
+        self.assertIn("Executor stuck", out)
+        executor.shutdown()
+
+    @HurricanServerTest.cycle_server(args=["--metrics-dir", MULTIPROCESS_DIR])
+    def test_multiprocess_metrics(self):
+        state = {
+            "pid": os.getpid(),
+            "timestamp": time.time(),
+            "metrics": {"request_counter": 5},
+            "stored": {"health": True},
+        }
+        with open(
+            os.path.join(MULTIPROCESS_DIR, f"hurricane_{os.getpid()}.json"), "w"
+        ) as f:
+            json.dump(state, f)
+        self.app_client.get("/")
+        response = requests.get("http://localhost:8001/metrics")
+        self.assertIn("request_counter_total 6.0", response.text)
+        res = self.probe_client.get(self.alive_route)
+        self.assertEqual(res.status, 200)
+        state["timestamp"] = time.time() - 20
+        with open(
+            os.path.join(MULTIPROCESS_DIR, f"hurricane_{os.getpid()}.json"), "w"
+        ) as f:
+            json.dump(state, f)
+        time.sleep(1)
+        res = self.probe_client.get(self.alive_route)
+        self.assertEqual(res.status, 500)
+        self.assertIn(f"{os.getpid()} (stale)", res.text)
+        shutil.rmtree(MULTIPROCESS_DIR)
+
     @HurricanServerTest.cycle_server(args=["--max-lifetime", "2"])
     def test_max_lifetime(self):
         self.app_client.get("/")
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+
+class HurricaneImportTimeTest(SimpleTestCase):
+    # modules of optional subsystems, which must only be imported once their feature is used
+    lazy_modules = [
+        "psutil",
+        "prometheus_client",
+        "requests",
+        "django.db.migrations.executor",
+    ]
+
+    def _import_time(self, module):
+        env = os.environ.copy()
+        env["DJANGO_SETTINGS_MODULE"] = "tests.testapp.settings"
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            env=env,
+            text=True,
+        )
+        self.assertEqual(proc.returncode, 0, msg=proc.stderr)
+        imported = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative)
+        return imported
+
+    def test_serve_command_import_is_lazy(self):
+        imported = self._import_time("hurricane.management.commands.serve")
+        self.assertIn("hurricane.management.commands.serve", imported)
+        for module in self.lazy_modules:
+            self.assertNotIn(module, imported)
+
+    def test_server_import_is_lazy(self):
+        imported = self._import_time("hurricane.server")
+        self.assertIn("hurricane.server", imported)
+        for module in self.lazy_modules:
+            self.assertNotIn(module, imported)
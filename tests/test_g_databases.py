@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from hurricane.server.databases import DatabaseChecker, migration_fingerprint
+
+
+class HurricaneDatabaseCheckerTest(SimpleTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.checker = DatabaseChecker()
+
+    def tearDown(self):
+        self.checker.close()
+
+    def test_check_databases(self):
+        self.assertTrue(self.checker.check_databases())
+
+    def test_migration_fingerprint_is_stable(self):
+        self.assertEqual(migration_fingerprint(), migration_fingerprint())
+
+    def test_migration_graph_is_cached(self):
+        from django.db.migrations import executor
+
+        with mock.patch(
+            "django.db.migrations.executor.MigrationExecutor",
+            wraps=executor.MigrationExecutor,
+        ) as migration_executor:
+            pending = self.checker.count_migrations()
+            self.assertEqual(self.checker.count_migrations(), pending)
+            self.assertEqual(migration_executor.call_count, 1)
+
+    def test_migration_graph_is_reloaded_on_changes(self):
+        from django.db.migrations import executor
+
+        with mock.patch(
+            "django.db.migrations.executor.MigrationExecutor",
+            wraps=executor.MigrationExecutor,
+        ) as migration_executor:
+            self.checker.count_migrations()
+            with mock.patch(
+                "hurricane.server.databases.migration_fingerprint",
+                return_value="changed",
+            ):
+                self.checker.count_migrations()
+            self.assertEqual(migration_executor.call_count, 2)
@@ -0,0 +1,148 @@
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from hurricane.metrics.base import (
+    ShardedCounterMetric,
+    ShardedHistogramMetric,
+    ShardedLabeledCounterMetric,
+    ShardedLabeledHistogramMetric,
+    buckets_from_settings,
+)
+from hurricane.metrics.windowed import WindowedHistogramMetric, bin_value, value_bin
+
+
+class ShardedMetricsTest(SimpleTestCase):
+    def _run_threads(self, func, count=4):
+        threads = [threading.Thread(target=func) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_counter_merges_shards(self):
+        class Counter(ShardedCounterMetric):
+            code = "test_sharded_counter"
+
+        def increment():
+            for _ in range(1000):
+                Counter.increment()
+
+        self._run_threads(increment)
+        self.assertEqual(Counter.get(), 4000)
+        Counter.decrement()
+        Counter.set(10)
+        self.assertEqual(Counter.get(), 10)
+
+    def test_labeled_counter_merges_shards(self):
+        class Counter(ShardedLabeledCounterMetric):
+            code = "test_sharded_labeled_counter"
+
+        def increment():
+            for _ in range(100):
+                Counter.increment("GET", "/")
+            Counter.increment("POST", "/")
+
+        self._run_threads(increment)
+        self.assertEqual(Counter.get_labeled(), {("GET", "/"): 400, ("POST", "/"): 4})
+        self.assertEqual(Counter.get(), 404)
+        self.assertEqual(Counter.get("POST", "/"), 4)
+        Counter.set(10, "POST", "/")
+        self.assertEqual(Counter.get("POST", "/"), 10)
+        self.assertEqual(Counter.get(), 410)
+        # the stored metric API without labels keeps working
+        Counter.set(500)
+        self.assertEqual(Counter.get(), 500)
+
+    def test_histogram_buckets(self):
+        class Histogram(ShardedHistogramMetric):
+            code = "test_sharded_histogram"
+            buckets = (0.1, 1.0, float("inf"))
+
+        self._run_threads(lambda: [Histogram.observe(v) for v in (0.05, 0.1, 0.5, 5)])
+        merged = Histogram.merge()
+        self.assertEqual(merged.buckets, [8, 4, 4])
+        self.assertEqual(merged.count, 16)
+        self.assertAlmostEqual(merged.sum, 4 * 5.65)
+        self.assertEqual(Histogram.get(), 5)
+
+    def test_labeled_histogram_limit(self):
+        class Histogram(ShardedLabeledHistogramMetric):
+            code = "test_sharded_labeled_histogram"
+            buckets = (1.0, float("inf"))
+            labelnames = ("route",)
+
+            @classmethod
+            def max_label_sets(cls):
+                return 1
+
+        self._run_threads(lambda: [Histogram.observe(v, "/a") for v in (0.5, 2)])
+        Histogram.observe(0.5, "/b")
+        merged = Histogram.merge_labeled()
+        self.assertEqual(merged[("/a",)].buckets, [4, 4])
+        self.assertEqual(merged[("overflow",)].count, 1)
+        self.assertEqual(Histogram.merge().count, 9)
+
+    @override_settings(METRICS_BUCKETS=[0.1, 0.01])
+    def test_buckets_from_settings(self):
+        self.assertEqual(
+            buckets_from_settings("METRICS_BUCKETS", (1,)), (0.01, 0.1, float("inf"))
+        )
+        self.assertEqual(
+            buckets_from_settings("METRICS_UNKNOWN_BUCKETS", (1,)), (1.0, float("inf"))
+        )
+
+
+class WindowedMetricsTest(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+
+        class Window(WindowedHistogramMetric):
+            code = "test_windowed"
+            windows = (("10s", 10), ("1m", 60))
+            clock = lambda: self.now  # noqa: E731
+
+        self.window = Window
+
+    def test_value_bins(self):
+        for value in (0.0002, 0.0015, 0.02, 0.3, 4.5):
+            self.assertAlmostEqual(
+                bin_value(value_bin(value)), value, delta=value * 0.03
+            )
+        self.assertEqual(value_bin(0), 0)
+        self.assertEqual(value_bin(10**9), value_bin(10**10))
+
+    def test_quantiles_and_rate(self):
+        for i in range(1, 101):
+            self.window.observe(i / 1000)
+        stats = self.window.get()["10s"]
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["rate"], 10)
+        self.assertAlmostEqual(stats["quantiles"][0.5], 0.05, delta=0.0015)
+        self.assertAlmostEqual(stats["quantiles"][0.99], 0.099, delta=0.003)
+
+    def test_set_observes(self):
+        self.window.set(0.2)
+        self.assertEqual(self.window.get()["10s"]["count"], 1)
+
+    def test_windows_expire(self):
+        self.window.observe(1.0)
+        self.now += 30
+        self.window.observe(0.01)
+        stats = self.window.get()
+        self.assertEqual(stats["10s"]["count"], 1)
+        self.assertEqual(stats["1m"]["count"], 2)
+        self.now += 60
+        stats = self.window.get()
+        self.assertEqual(stats["1m"]["count"], 0)
+        self.assertEqual(stats["1m"]["quantiles"], {})
+        # a slot, which is reused after a full rotation, starts empty
+        self.now += 30
+        self.window.observe(0.5)
+        self.assertEqual(self.window.get()["1m"]["count"], 1)
+
+    def test_combine_processes(self):
+        self.window.observe(0.01)
+        state = self.window.local_state()
+        stats = self.window.combine([state, state])
+        self.assertEqual(stats["10s"]["count"], 2)
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from hurricane.metrics import multiprocess
+from hurricane.metrics.base import ShardedCounterMetric, ShardedHistogramMetric
+from hurricane.metrics.multiprocess import (
+    MultiProcessStore,
+    MultiProcessWriter,
+    enable_multiprocess,
+)
+
+
+class MultiProcessStoreTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = enable_multiprocess(self.directory)
+
+    def tearDown(self):
+        multiprocess.MULTIPROCESS_STORE = None
+        for name in os.listdir(self.directory):
+            os.unlink(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def _write_state(self, instance, metrics=None, stored=None, timestamp=None):
+        state = {
+            "id": instance,
+            "pid": 1,
+            "timestamp": timestamp or time.time(),
+            "metrics": metrics or {},
+            "stored": stored or {},
+        }
+        path = os.path.join(self.directory, f"hurricane_{instance}.json")
+        with open(path, "w") as f:
+            json.dump(state, f)
+        return path
+
+    def test_write_and_read(self):
+        self.store.write()
+        self.assertTrue(os.path.exists(self.store.path))
+        other = MultiProcessStore(self.directory)
+        states = other.read()
+        self.assertEqual([state["id"] for state in states], [self.store.instance])
+        self.assertEqual(states[0]["pid"], os.getpid())
+        self.store.remove()
+        self.assertFalse(os.path.exists(self.store.path))
+
+    def test_combine_counters_and_histograms(self):
+        class Counter(ShardedCounterMetric):
+            code = "test_multiprocess_counter"
+
+        class Histogram(ShardedHistogramMetric):
+            code = "test_multiprocess_histogram"
+            buckets = (1.0, float("inf"))
+
+        Counter.increment()
+        Histogram.observe(0.5)
+        self._write_state(
+            "other",
+            metrics={
+                "test_multiprocess_counter": 4,
+                "test_multiprocess_histogram": [[1, 2], 3, 10.0],
+            },
+        )
+        self.assertEqual(Counter.merged_state(), 5)
+        merged = Histogram.merged_state()
+        self.assertEqual(merged.buckets, [2, 2])
+        self.assertEqual(merged.count, 4)
+        self.assertEqual(Counter.get(), 1)
+
+    def test_dead_processes_are_removed(self):
+        path = self._write_state(
+            "dead", metrics={"request_counter": 100}, timestamp=time.time() - 60
+        )
+        self.assertEqual(self.store.read(), [])
+        self.assertFalse(os.path.exists(path))
+
+    def test_same_pid_in_other_namespace(self):
+        # servers in other containers may run with the same pid, their files are kept apart by the instance id
+        self.store.write()
+        other = MultiProcessStore(self.directory)
+        other.write()
+        self.assertNotEqual(other.path, self.store.path)
+        self.assertEqual([state["id"] for state in self.store.read()], [other.instance])
+        self.assertTrue(os.path.exists(other.path))
+
+    def test_unhealthy_processes(self):
+        self._write_state("other", stored={"health": False})
+        self.assertEqual(
+            self.store.unhealthy("health", stale_after=10),
+            {"other": "health failed"},
+        )
+        self.store._cache = None
+        self._write_state("other", timestamp=time.time() - 20)
+        self.assertEqual(
+            self.store.unhealthy("health", stale_after=10), {"other": "stale"}
+        )
+
+    def test_writer(self):
+        writer = MultiProcessWriter(MultiProcessStore(self.directory, interval=0.05))
+        writer.start()
+        time.sleep(0.2)
+        self.assertTrue(os.path.exists(writer.store.path))
+        writer.stop()
+        self.assertFalse(writer.is_alive())
+        self.assertFalse(os.path.exists(writer.store.path))
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from hurricane.server.readiness import (
+    ErrorRatePolicy,
+    EventLoopLagPolicy,
+    LatencyPolicy,
+    ReadinessPolicy,
+    make_readiness_policies,
+)
+
+
+class StaticPolicy(ReadinessPolicy):
+    name = "static"
+    current = None
+
+    def value(self):
+        return self.current
+
+
+class ReadinessPolicyTest(SimpleTestCase):
+    def test_hysteresis(self):
+        policy = StaticPolicy(1.0, recovery=0.5)
+        self.assertTrue(policy.check())
+        policy.current = 1.0
+        self.assertFalse(policy.check())
+        self.assertEqual(policy.describe(), "static 1.000 >= 1")
+        # stays not ready between recovery and threshold
+        policy.current = 0.7
+        self.assertFalse(policy.check())
+        policy.current = 0.4
+        self.assertTrue(policy.check())
+        policy.current = 0.7
+        self.assertTrue(policy.check())
+
+    def test_no_observations_recover(self):
+        policy = StaticPolicy(1.0)
+        policy.current = 2.0
+        self.assertFalse(policy.check())
+        policy.current = None
+        self.assertTrue(policy.check())
+
+    def test_monitored_policy_is_only_read(self):
+        policy = StaticPolicy(1.0)
+        policy.current = 2.0
+        self.assertFalse(policy.probe())
+        policy.monitored = True
+        policy.current = 0.0
+        # the state is only updated by the monitor
+        self.assertFalse(policy.probe())
+        self.assertTrue(policy.check())
+        self.assertTrue(policy.probe())
+
+    def test_unknown_window(self):
+        with self.assertRaises(ValueError):
+            StaticPolicy(1.0, window="1h")
+
+    def test_make_policies(self):
+        policies = make_readiness_policies(
+            {
+                "readiness_max_latency": "0.5",
+                "readiness_max_loop_lag": 0.1,
+                "readiness_max_error_rate": None,
+                "readiness_recovery": 0.5,
+                "readiness_window": "10s",
+            }
+        )
+        self.assertEqual(
+            [type(p) for p in policies], [LatencyPolicy, EventLoopLagPolicy]
+        )
+        self.assertEqual(policies[0].threshold, 0.5)
+        self.assertEqual(policies[0].recovery, 0.25)
+        self.assertEqual(policies[0].window, "10s")
+
+    def test_error_rate(self):
+        stats = {"1m": {"count": 20}}
+        errors = {"1m": {"count": 5}}
+        with mock.patch(
+            "hurricane.server.readiness.ResponseTimeWindowMetric.get",
+            return_value=stats,
+        ), mock.patch(
+            "hurricane.server.readiness.ResponseErrorWindowMetric.get",
+            return_value=errors,
+        ):
+            policy = ErrorRatePolicy(0.2)
+            self.assertEqual(policy.value(), 0.25)
+            self.assertFalse(policy.check())
+            stats["1m"]["count"] = 5
+            self.assertIsNone(policy.value())
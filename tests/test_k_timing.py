@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from hurricane.server.timing import (
+    RequestTimeline,
+    ServerTiming,
+    ingress_start,
+    make_server_timing,
+    parse_request_start,
+)
+
+
+class RequestTimingTest(SimpleTestCase):
+    def test_parse_request_start(self):
+        expected = 1700000000.25
+        for value in (
+            "t=1700000000.25",
+            "1700000000.250",
+            "t=1700000000250",
+            "t=1700000000250000",
+            "t=1700000000250000000",
+        ):
+            self.assertAlmostEqual(parse_request_start(value), expected, places=3)
+        self.assertIsNone(parse_request_start("t=abc"))
+        self.assertIsNone(parse_request_start("t=0"))
+
+    def test_ingress_start_headers(self):
+        self.assertEqual(ingress_start({"X-Queue-Start": "t=1700000000"}), 1700000000)
+        self.assertIsNone(ingress_start({}))
+
+    def test_phases(self):
+        timeline = RequestTimeline(accept=100.0, ingress=99.5)
+        timeline.dispatch = 100.1
+        timeline.app_start = 100.3
+        timeline.app_return = 101.3
+        phases = dict(timeline.phases())
+        self.assertEqual(set(phases), {"queue", "dispatch", "executor", "app"})
+        self.assertAlmostEqual(phases["queue"], 0.5)
+        self.assertAlmostEqual(phases["executor"], 0.2)
+        self.assertAlmostEqual(phases["app"], 1.0)
+
+    def test_queue_time_is_clamped(self):
+        self.assertEqual(
+            RequestTimeline(accept=100.0, ingress=100.2).phases(), [("queue", 0.0)]
+        )
+        self.assertEqual(RequestTimeline(accept=5000.0, ingress=1.0).phases(), [])
+
+    def test_mark(self):
+        timeline = RequestTimeline(accept=100.0)
+        with mock.patch("hurricane.server.timing.time.time", return_value=100.5):
+            self.assertEqual(timeline.mark("dispatch"), 100.5)
+        self.assertEqual(timeline.phases(), [("dispatch", 0.5)])
+
+
+class ServerTimingTest(SimpleTestCase):
+    def test_disabled_by_default(self):
+        self.assertIsNone(make_server_timing({}))
+        self.assertIsNone(make_server_timing({"server_timing_rate": 0.0}))
+        self.assertEqual(make_server_timing({"server_timing_rate": "2"}).rate, 1.0)
+
+    def test_sample(self):
+        request = mock.Mock(headers={"X-Server-Timing": "secret"})
+        self.assertTrue(ServerTiming(token="secret").sample(request))
+        self.assertFalse(ServerTiming(token="other").sample(request))
+        self.assertTrue(ServerTiming(rate=1.0).sample(mock.Mock(headers={})))
+
+    def test_header(self):
+        timeline = RequestTimeline(accept=100.0, ingress=99.99)
+        timeline.dispatch = 100.001
+        timeline.app_start = 100.002
+        timeline.app_return = 100.012
+        timeline.db = 0.004
+        with mock.patch("hurricane.server.timing.time.time", return_value=100.02):
+            header = ServerTiming.header(timeline)
+        self.assertEqual(
+            header,
+            "queue;dur=10.00, executor;dur=1.00, app;dur=10.00, db;dur=4.00, total;dur=20.00",
+        )
+
+    def test_merge(self):
+        headers = [("Content-Type", "text/plain"), ("server-timing", "cache;dur=1")]
+        self.assertEqual(
+            ServerTiming.merge(headers, "total;dur=2"),
+            [
+                ("Content-Type", "text/plain"),
+                ("Server-Timing", "cache;dur=1, total;dur=2"),
+            ],
+        )
+        self.assertEqual(
+            ServerTiming.merge([], "total;dur=2"), [("Server-Timing", "total;dur=2")]
+        )
@@ -0,0 +1,116 @@
+import io
+import json
+import logging
+
+from django.test import SimpleTestCase
+
+from hurricane.metrics import AccessLogDroppedMetric
+from hurricane.server.accesslog import (
+    ACCESS_LOGGER,
+    AccessLogRecord,
+    AccessLogSampler,
+    AccessLogWriter,
+    make_access_log,
+)
+from hurricane.server.loggers import STRUCTLOG_ENABLED
+
+
+def make_record(status=200, request_time=1.5):
+    return AccessLogRecord(
+        1700000000.0,
+        status,
+        "GET",
+        "/items/1",
+        request_time,
+        "127.0.0.1",
+        "n/a",
+        "n/a",
+        "HTTP/1.1",
+    )
+
+
+class AccessLogSamplerTest(SimpleTestCase):
+    def test_errors_and_slow_requests_are_always_logged(self):
+        sampler = AccessLogSampler(rate=0.0, slow=100)
+        self.assertFalse(sampler.sample(200, 1))
+        self.assertTrue(sampler.sample(404, 1))
+        self.assertTrue(sampler.sample(503, 1))
+        self.assertTrue(sampler.sample(200, 100))
+
+    def test_no_sampler_by_default(self):
+        self.assertEqual(make_access_log({}), (None, None))
+        sampler, writer = make_access_log(
+            {"access_log_sample": "0.5", "access_log_slow": 10}
+        )
+        self.assertEqual((sampler.rate, sampler.slow), (0.5, 10.0))
+        self.assertIsNone(writer)
+
+
+class AccessLogWriterTest(SimpleTestCase):
+    def setUp(self):
+        # the level of the access logger applies to the asynchronous access log
+        self.logger = logging.getLogger(ACCESS_LOGGER)
+        self.level = self.logger.level
+        self.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        self.logger.setLevel(self.level)
+
+    def test_batches_json_lines(self):
+        stream = io.StringIO()
+        writer = AccessLogWriter(stream=stream, batch_size=2)
+        for status in (200, 404, 500):
+            writer.push(make_record(status))
+        writer.flush()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(
+            [line["level"] for line in lines], ["info", "warning", "error"]
+        )
+        self.assertEqual(lines[0]["event"], "TX GET /items/1 1.5ms")
+        self.assertEqual(lines[0]["path"], "/items/1")
+        self.assertEqual(len(writer.queue), 0)
+
+    def test_drops_records_when_full(self):
+        dropped = AccessLogDroppedMetric.get()
+        writer = AccessLogWriter(stream=io.StringIO(), max_queue=1)
+        writer.push(make_record())
+        writer.push(make_record())
+        self.assertEqual(len(writer.queue), 1)
+        self.assertEqual(AccessLogDroppedMetric.get(), dropped + 1)
+
+    def test_stop_flushes(self):
+        stream = io.StringIO()
+        writer = AccessLogWriter(stream=stream, interval=60)
+        writer.start()
+        writer.push(make_record())
+        writer.stop()
+        self.assertEqual(len(stream.getvalue().splitlines()), 1)
+
+    def test_writes_to_handlers_of_the_access_logger(self):
+        logger = self.logger
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        handler.setLevel(logging.WARNING)
+        propagate = logger.propagate
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            writer = AccessLogWriter()
+            for status in (200, 404):
+                writer.push(make_record(status))
+            writer.flush()
+            lines = stream.getvalue().splitlines()
+            # the level of the handler applies
+            self.assertEqual(len(lines), 1)
+            if not STRUCTLOG_ENABLED:
+                self.assertEqual(
+                    lines[0], "WARNING 404 GET /items/1 (127.0.0.1) 1.50ms"
+                )
+            # a silenced access logger does not queue records
+            logger.setLevel(logging.CRITICAL)
+            writer.push(make_record(500))
+            self.assertEqual(len(writer.queue), 0)
+        finally:
+            logger.removeHandler(handler)
+            logger.propagate = propagate
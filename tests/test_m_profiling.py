@@ -0,0 +1,56 @@
+import json
+import threading
+
+from django.test import SimpleTestCase
+
+from hurricane.server.profiling import StackProfile, StackSampler
+
+
+def wait_for(event):
+    event.wait()
+
+
+class StackSamplerTest(SimpleTestCase):
+    def test_profile_samples_all_threads(self):
+        event = threading.Event()
+        thread = threading.Thread(target=wait_for, args=(event,), name="test-worker")
+        thread.start()
+        try:
+            profile = StackSampler().profile(0.1, 100)
+        finally:
+            event.set()
+            thread.join()
+        self.assertGreaterEqual(profile.sample_count, 5)
+        lines = profile.collapsed().splitlines()
+        worker_lines = [line for line in lines if line.startswith("test-worker;")]
+        self.assertTrue(worker_lines)
+        self.assertIn("wait_for (", worker_lines[0])
+        self.assertFalse(
+            any("StackSampler" in line for line in lines if "profile (" in line)
+        )
+
+    def test_only_one_profile(self):
+        sampler = StackSampler()
+        sampler._lock.acquire()
+        self.assertTrue(sampler.running)
+        with self.assertRaises(Exception):
+            sampler.profile(0.01, 10)
+
+    def test_speedscope(self):
+        profile = StackProfile(1, 10)
+        profile.samples[("main", (("a", "x.py", 1), ("b", "x.py", 5)))] = 3
+        profile.samples[("main", (("a", "x.py", 1),))] = 1
+        speedscope = json.loads(json.dumps(profile.speedscope()))
+        self.assertEqual(
+            speedscope["shared"]["frames"],
+            [
+                {"name": "a", "file": "x.py", "line": 1},
+                {"name": "b", "file": "x.py", "line": 5},
+            ],
+        )
+        main = speedscope["profiles"][0]
+        self.assertEqual(main["samples"], [[0], [0, 1]])
+        self.assertAlmostEqual(main["endValue"], 0.4)
+        self.assertEqual(
+            profile.collapsed(), "main;a (x.py:1) 1\nmain;a (x.py:1);b (x.py:5) 3\n"
+        )
@@ -0,0 +1,148 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from hurricane.metrics import SlowRequestMetric
+from hurricane.server.loggers import logger
+from hurricane.server.memory import RouteMemorySampler
+from hurricane.server.timing import RequestTimeline
+from hurricane.server.watchdog import (
+    RequestWatchdog,
+    make_request_watchdog,
+    thread_dump,
+)
+from hurricane.server.wsgi import HurricaneWSGIContainer
+
+ENVIRON = {"REQUEST_METHOD": "GET", "PATH_INFO": "/slow", "HTTP_X_REQUEST_ID": "abc"}
+
+
+def run_request(watchdog, event):
+    active = watchdog.started(ENVIRON)
+    event.wait()
+    watchdog.finished(active)
+
+
+class RequestWatchdogTest(SimpleTestCase):
+    def test_slow_request_is_reported_once(self):
+        watchdog = RequestWatchdog(slow_threshold=0.01)
+        event = threading.Event()
+        thread = threading.Thread(target=run_request, args=(watchdog, event))
+        watchdog.dispatched()
+        thread.start()
+        slow_requests = SlowRequestMetric.get()
+        try:
+            with self.assertLogs("hurricane.server", "WARNING") as logs:
+                event.wait(0.05)
+                watchdog.check()
+                watchdog.check()
+        finally:
+            event.set()
+            thread.join()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Slow request GET /slow (id abc)", logs.output[0])
+        self.assertIn("in run_request", logs.output[0])
+        self.assertEqual(SlowRequestMetric.get(), slow_requests + 1)
+        self.assertEqual(watchdog.active, {})
+
+    def test_finished_slow_request_is_counted(self):
+        watchdog = RequestWatchdog(slow_threshold=0.01)
+        active = watchdog.started(ENVIRON)
+        active.started -= 1
+        slow_requests = SlowRequestMetric.get()
+        watchdog.finished(active)
+        self.assertEqual(SlowRequestMetric.get(), slow_requests + 1)
+
+    def test_concurrently_finished_slow_request_is_counted_once(self):
+        watchdog = RequestWatchdog(slow_threshold=0.01)
+        slow_requests = SlowRequestMetric.get()
+        for _ in range(20):
+            active = watchdog.started(ENVIRON)
+            active.started -= 1
+            barrier = threading.Barrier(2)
+
+            def finish(active=active, barrier=barrier):
+                barrier.wait()
+                watchdog.finished(active)
+
+            thread = threading.Thread(target=finish)
+            thread.start()
+            with self.assertLogs("hurricane.server", "INFO"):
+                barrier.wait()
+                watchdog.check()
+                # the check may run after the request finished and log nothing
+                logger.info("checked")
+            thread.join()
+        self.assertEqual(SlowRequestMetric.get(), slow_requests + 20)
+
+    def test_failing_memory_sample_finishes_request(self):
+        watchdog = RequestWatchdog(stuck_timeout=10)
+        container = HurricaneWSGIContainer(
+            None,
+            lambda environ, start_response: [b"ok"],
+            observe=False,
+            watchdog=watchdog,
+            memory_sampler=RouteMemorySampler(1),
+        )
+        watchdog.dispatched()
+        with mock.patch(
+            "hurricane.server.memory.process_rss", side_effect=OSError("no rss")
+        ):
+            with self.assertRaises(OSError):
+                container._run_application(
+                    RequestTimeline(time.time()), False, ENVIRON, None
+                )
+        self.assertEqual((watchdog.waiting, watchdog.active), (0, {}))
+
+    def test_failing_memory_finish_keeps_response(self):
+        container = HurricaneWSGIContainer(
+            None,
+            lambda environ, start_response: [b"ok"],
+            observe=False,
+            memory_sampler=RouteMemorySampler(1),
+        )
+        with mock.patch(
+            "hurricane.server.memory.RequestMemory.finish",
+            side_effect=OSError("no rss"),
+        ):
+            with self.assertLogs("hurricane.server", "ERROR"):
+                response = container._run_application(
+                    RequestTimeline(time.time()), False, ENVIRON, None
+                )
+        self.assertEqual(response, [b"ok"])
+
+    def test_stuck_executor(self):
+        watchdog = RequestWatchdog(stuck_timeout=10)
+        active = watchdog.started(ENVIRON)
+        watchdog.dispatched()
+        watchdog.check()
+        self.assertFalse(watchdog.stuck)
+        watchdog.last_finished -= 20
+        watchdog.waiting_since -= 20
+        with self.assertLogs("hurricane.server", "ERROR"):
+            watchdog.check()
+        self.assertTrue(watchdog.stuck)
+        self.assertIn("test_stuck_executor", watchdog.stuck_dump)
+        watchdog.finished(active)
+        watchdog.check()
+        self.assertFalse(watchdog.stuck)
+
+    def test_idle_executor_is_not_stuck(self):
+        watchdog = RequestWatchdog(stuck_timeout=10)
+        watchdog.last_finished -= 20
+        watchdog.check()
+        self.assertFalse(watchdog.stuck)
+        # a request queued after a long idle period does not count as stuck immediately
+        watchdog.dispatched()
+        watchdog.check()
+        self.assertFalse(watchdog.stuck)
+
+    def test_interval(self):
+        self.assertEqual(RequestWatchdog(slow_threshold=30).interval, 1.0)
+        self.assertEqual(RequestWatchdog(slow_threshold=0.5).interval, 0.25)
+        self.assertEqual(RequestWatchdog(stuck_timeout=0.01).interval, 0.05)
+        self.assertIsNone(make_request_watchdog({}))
+
+    def test_thread_dump(self):
+        self.assertIn('Thread "MainThread"', thread_dump())
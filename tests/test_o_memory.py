@@ -0,0 +1,101 @@
+import os
+import tempfile
+import tracemalloc
+
+from django.test import SimpleTestCase
+
+from hurricane.metrics import RouteMemoryMetric
+from hurricane.server.memory import (
+    RequestMemory,
+    RouteMemorySampler,
+    SnapshotStore,
+    TracemallocNotTracing,
+    make_route_memory_sampler,
+)
+
+
+def allocate():
+    return [str(i) * 10 for i in range(10000)]
+
+
+class SnapshotStoreTest(SimpleTestCase):
+    def setUp(self):
+        self.store = SnapshotStore(max_snapshots=2)
+
+    def tearDown(self):
+        self.store.stop()
+
+    def test_not_tracing(self):
+        self.assertFalse(self.store.tracing)
+        with self.assertRaises(TracemallocNotTracing):
+            self.store.take()
+        self.assertIsNone(self.store.dump(tempfile.gettempdir()))
+
+    def test_statistics_and_diff(self):
+        self.store.start(5)
+        self.assertEqual(tracemalloc.get_traceback_limit(), 5)
+        first = self.store.take()
+        allocated = allocate()
+        second = self.store.take()
+        top = self.store.statistics(second, limit=5)
+        self.assertLessEqual(len(top), 5)
+        self.assertTrue(
+            any("test_o_memory.py" in entry["traceback"][0] for entry in top)
+        )
+        diff = self.store.statistics(second, limit=1, compare=first)
+        self.assertIn("test_o_memory.py", diff[0]["traceback"][0])
+        self.assertGreater(diff[0]["size_diff"], 0)
+        self.assertEqual(len(allocated), 10000)
+
+    def test_old_snapshots_are_discarded(self):
+        self.store.start()
+        ids = [self.store.take() for _ in range(3)]
+        self.assertEqual(list(self.store.snapshots), ids[1:])
+        with self.assertRaises(KeyError):
+            self.store.statistics(ids[0])
+        status = self.store.status()
+        self.assertTrue(status["tracing"])
+        self.assertEqual([snapshot["id"] for snapshot in status["snapshots"]], ids[1:])
+
+    def test_dump(self):
+        self.store.start()
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.store.dump(os.path.join(directory, "snapshots"))
+            self.assertTrue(path.endswith(".tracemalloc"))
+            tracemalloc.Snapshot.load(path)
+
+
+class RouteMemoryTest(SimpleTestCase):
+    def test_every_nth_request_is_sampled(self):
+        sampler = RouteMemorySampler(3)
+        samples = [sampler.sample() for _ in range(6)]
+        self.assertEqual(
+            [sample is not None for sample in samples], [True, False, False] * 2
+        )
+        self.assertIsNone(
+            make_route_memory_sampler({"route_memory_sample": 10, "no_metrics": True})
+        )
+
+    def test_attribution(self):
+        store = SnapshotStore()
+        store.start(1)
+        try:
+            memory = RequestMemory()
+            leaked = [str(i) * 10 for i in range(10000)]
+            memory.finish("/leak")
+        finally:
+            store.stop()
+        report = {entry["route"]: entry for entry in RouteMemoryMetric.report()}
+        self.assertGreaterEqual(report["/leak"]["samples"], 1)
+        self.assertGreater(report["/leak"]["retained_bytes"], 100000)
+        self.assertGreaterEqual(
+            report["/leak"]["allocated_bytes"], report["/leak"]["retained_bytes"]
+        )
+        self.assertIn("rss_bytes", report["/leak"])
+        self.assertEqual(len(leaked), 10000)
+
+        memory = RequestMemory()
+        self.assertIsNone(memory.traced)
+        memory.finish("/untraced")
+        report = {entry["route"]: entry for entry in RouteMemoryMetric.report()}
+        self.assertNotIn("retained_bytes", report["/untraced"])
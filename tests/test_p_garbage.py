@@ -0,0 +1,91 @@
+import gc
+
+from django.test import SimpleTestCase
+
+from hurricane.metrics import GCCollectionsMetric, GCPauseMetric
+from hurricane.server.garbage import (
+    GC_MONITOR,
+    GCMonitor,
+    configure_gc,
+    freeze_gc,
+    parse_gc_thresholds,
+)
+
+
+class GCMonitorTest(SimpleTestCase):
+    def test_collections_are_observed(self):
+        monitor = GCMonitor()
+        monitor.install()
+        try:
+            self.assertTrue(monitor.installed)
+            gc.collect(0)
+            gc.collect()
+        finally:
+            monitor.uninstall()
+        self.assertFalse(monitor.installed)
+        histograms = monitor.histograms()
+        self.assertGreaterEqual(histograms[("0",)].count, 1)
+        self.assertGreaterEqual(histograms[("2",)].count, 1)
+        self.assertEqual(sum(histograms[("2",)].buckets), histograms[("2",)].count)
+        self.assertGreater(histograms[("2",)].sum, 0)
+
+    def test_histograms_are_copies(self):
+        monitor = GCMonitor()
+        self.assertEqual(monitor.histograms(), {})
+        monitor.callback("start", {"generation": 1})
+        monitor.callback("stop", {"generation": 1})
+        histograms = monitor.histograms()
+        monitor.callback("start", {"generation": 1})
+        monitor.callback("stop", {"generation": 1})
+        self.assertEqual(histograms[("1",)].count, 1)
+        self.assertEqual(monitor.histograms()[("1",)].count, 2)
+
+    def test_metrics(self):
+        installed = GC_MONITOR.installed
+        GC_MONITOR.install()
+        try:
+            gc.collect()
+        finally:
+            if not installed:
+                GC_MONITOR.uninstall()
+        self.assertGreaterEqual(GCCollectionsMetric.get_labeled()[("2",)], 1)
+        self.assertGreaterEqual(GCPauseMetric.merge_labeled()[("2",)].count, 1)
+
+
+class GCConfigurationTest(SimpleTestCase):
+    def test_parse_gc_thresholds(self):
+        self.assertEqual(parse_gc_thresholds("50000,20,100"), (50000, 20, 100))
+        self.assertEqual(parse_gc_thresholds("1000"), (1000,))
+        self.assertEqual(parse_gc_thresholds(700), (700,))
+        self.assertEqual(parse_gc_thresholds([700, 10]), (700, 10))
+        for value in ("", "a,b", "1,2,3,4", "-1", []):
+            with self.assertRaises(ValueError):
+                parse_gc_thresholds(value)
+
+    def test_configure_gc(self):
+        thresholds = gc.get_threshold()
+        installed = GC_MONITOR.installed
+        GC_MONITOR.uninstall()
+        try:
+            with self.assertLogs("hurricane.server", "INFO") as logs:
+                configure_gc({"gc_thresholds": "5000,15,15", "no_metrics": True})
+            self.assertEqual(gc.get_threshold(), (5000, 15, 15))
+            self.assertIn("GC thresholds set to (5000, 15, 15)", logs.output[0])
+            self.assertFalse(GC_MONITOR.installed)
+            configure_gc({"gc_thresholds": None, "no_metrics": False})
+            self.assertTrue(GC_MONITOR.installed)
+        finally:
+            gc.set_threshold(*thresholds)
+            if not installed:
+                GC_MONITOR.uninstall()
+
+    def test_freeze_gc(self):
+        try:
+            with self.assertLogs("hurricane.server", "INFO") as logs:
+                freeze_gc()
+            self.assertGreater(gc.get_freeze_count(), 0)
+            self.assertIn(
+                "objects of the startup to the permanent GC generation", logs.output[0]
+            )
+        finally:
+            gc.unfreeze()
@@ -0,0 +1,62 @@
+import time
+
+from django.test import SimpleTestCase
+
+from hurricane.metrics import (
+    MallocFreeChunksMetric,
+    MallocMemoryMetric,
+    MallocTrimMetric,
+    MallocTrimRSSMetric,
+)
+from hurricane.server.allocator import MallocTrimmer, make_malloc_trimmer, malloc_info
+
+
+class MallocTrimmerTest(SimpleTestCase):
+    def test_trim(self):
+        trims = MallocTrimMetric.get()
+        # fragment the heap with many small objects, of which every second one stays alive
+        objects = [bytearray(512) for _ in range(100000)]
+        del objects[::2]
+        trimmer = MallocTrimmer()
+        with self.assertLogs("hurricane.server", "INFO") as logs:
+            before, after = trimmer.trim()
+        self.assertGreater(before, 0)
+        self.assertGreater(after, 0)
+        self.assertIn("Heap trimmed", logs.output[0])
+        self.assertEqual(MallocTrimMetric.get(), trims + 1)
+        self.assertEqual(MallocTrimRSSMetric.get(), {"before": before, "after": after})
+        self.assertAlmostEqual(trimmer.last_rss_mb, after / (1024 * 1024))
+
+    def test_due(self):
+        trimmer = MallocTrimmer(interval=60, spike=100)
+        self.assertFalse(trimmer.due(500))
+        self.assertFalse(trimmer.due(599))
+        self.assertTrue(trimmer.due(600))
+        trimmer.last_trim = time.monotonic() - 60
+        self.assertTrue(trimmer.due(500))
+        self.assertFalse(MallocTrimmer().due(10000))
+
+    def test_make_malloc_trimmer(self):
+        self.assertIsNone(make_malloc_trimmer({"malloc_trim": False}))
+        with self.assertLogs("hurricane.server", "INFO"):
+            trimmer = make_malloc_trimmer(
+                {
+                    "malloc_trim": False,
+                    "malloc_trim_interval": "30",
+                    "malloc_trim_spike": None,
+                }
+            )
+        self.assertEqual(trimmer.interval, 30.0)
+        self.assertIsNone(trimmer.spike)
+
+
+class MallocInfoTest(SimpleTestCase):
+    def test_malloc_info(self):
+        info = malloc_info()
+        self.assertGreater(info["arena"], 0)
+        self.assertGreater(info["uordblks"], 0)
+        self.assertEqual(
+            set(MallocMemoryMetric.get()),
+            {"arena", "mmap", "in_use", "free", "fastbin_free", "releasable"},
+        )
+        self.assertEqual(set(MallocFreeChunksMetric.get()), {"regular", "fast"})
@@ -0,0 +1,358 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from hurricane.metrics import (
+    CgroupCPUThrottlingMetric,
+    CgroupMemoryMetric,
+    CgroupPressureMetric,
+    CPUCountMetric,
+    ExecutorWorkersMetric,
+)
+from hurricane.server import cgroup as cgroup_module
+from hurricane.server import command_task, recycle_cgroup
+from hurricane.server.cgroup import (
+    Cgroup,
+    CgroupMonitor,
+    configure_workers,
+    cpu_allocation,
+    default_workers,
+    make_cgroup_monitor,
+    parse_flat_keyed,
+    parse_pressure,
+)
+from hurricane.server.readiness import PressurePolicy
+from hurricane.testing.testcases import HurricanServerTest
+
+MB = 1024 * 1024
+CGROUP_ROOT = os.path.join(tempfile.gettempdir(), "hurricane-cgroup")
+
+
+def pressure(some, full=0.0):
+    return (
+        f"some avg10={some:.2f} avg60=0.00 avg300=0.00 total=1000\n"
+        f"full avg10={full:.2f} avg60=0.00 avg300=0.00 total=500\n"
+    )
+
+
+def write_cgroup(directory, **files):
+    os.makedirs(directory, exist_ok=True)
+    defaults = {
+        "memory.max": f"{512 * MB}\n",
+        "memory.current": f"{300 * MB}\n",
+        "memory.stat": f"anon {200 * MB}\ninactive_file {100 * MB}\n",
+        "memory.events": "low 0\nhigh 0\nmax 0\noom 0\noom_kill 0\n",
+        "memory.pressure": pressure(0.0),
+        "cpu.stat": "usage_usec 5000000\nnr_periods 100\nnr_throttled 25\nthrottled_usec 1500000\n",
+        "cpu.pressure": pressure(0.0),
+        "io.pressure": pressure(0.0),
+    }
+    defaults.update(files)
+    for name, content in defaults.items():
+        with open(os.path.join(directory, name.replace("_", ".", 1)), "w") as f:
+            f.write(content)
+
+
+class CgroupTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parse(self):
+        self.assertEqual(
+            parse_pressure(pressure(1.5, 0.25))["some"],
+            {"avg10": 1.5, "avg60": 0.0, "avg300": 0.0, "total": 1000.0},
+        )
+        self.assertEqual(parse_pressure(pressure(1.5, 0.25))["full"]["avg10"], 0.25)
+        self.assertEqual(
+            parse_flat_keyed("max 3\noom_kill 1\n"), {"max": 3, "oom_kill": 1}
+        )
+
+    def test_memory(self):
+        write_cgroup(self.directory)
+        cgroup = Cgroup(self.directory)
+        self.assertTrue(cgroup.available)
+        self.assertEqual(
+            cgroup.memory(),
+            {"limit": 512 * MB, "current": 300 * MB, "working_set": 200 * MB},
+        )
+        write_cgroup(self.directory, memory_max="max\n")
+        self.assertIsNone(cgroup.memory()["limit"])
+        self.assertEqual(cgroup.pressure("memory")["some"]["avg10"], 0.0)
+        self.assertIsNone(cgroup.pressure("irq"))
+        self.assertFalse(Cgroup(os.path.join(self.directory, "missing")).available)
+
+    def test_shedding(self):
+        write_cgroup(self.directory, memory_pressure=pressure(30.0))
+        monitor = CgroupMonitor(Cgroup(self.directory), recycle=self.fail)
+        monitor.policies.append(PressurePolicy(monitor, "memory", 20.0, 0.5))
+        with self.assertLogs("hurricane.server", "WARNING"):
+            monitor.check()
+        self.assertEqual(monitor.shedding(), "memory pressure")
+        write_cgroup(self.directory, memory_pressure=pressure(15.0))
+        monitor.check()
+        self.assertEqual(monitor.shedding(), "memory pressure")
+        write_cgroup(self.directory, memory_pressure=pressure(5.0))
+        monitor.check()
+        self.assertIsNone(monitor.shedding())
+
+    def test_recycle(self):
+        reasons = []
+        write_cgroup(self.directory)
+        monitor = CgroupMonitor(
+            Cgroup(self.directory),
+            max_memory_fraction=0.5,
+            memory_pressure_recycle=40.0,
+            recycle=reasons.append,
+        )
+        monitor.check()
+        self.assertEqual(reasons, [])
+        write_cgroup(self.directory, memory_current=f"{400 * MB}\n")
+        monitor.check()
+        self.assertEqual(
+            reasons, ["working set 300MB exceeds 0.5 of the memory limit 512MB"]
+        )
+        # the process is recycled only once
+        monitor.check()
+        self.assertEqual(len(reasons), 1)
+        monitor = CgroupMonitor(
+            Cgroup(self.directory),
+            memory_pressure_recycle=40.0,
+            recycle=reasons.append,
+        )
+        write_cgroup(self.directory, memory_pressure=pressure(60.0, 45.0))
+        monitor.check()
+        self.assertEqual(reasons[-1], "memory pressure 45% >= 40%")
+
+    def test_memory_events(self):
+        write_cgroup(self.directory)
+        monitor = CgroupMonitor(Cgroup(self.directory))
+        monitor.read()
+        write_cgroup(self.directory, memory_events="max 2\noom 1\noom_kill 1\n")
+        with self.assertLogs("hurricane.server", "WARNING") as logs:
+            monitor.read()
+        self.assertIn("Memory limit of the cgroup reached (max: 2)", logs.output[0])
+        self.assertIn("oom_kill: 1", logs.output[2])
+
+    def test_cpu_throttling(self):
+        write_cgroup(self.directory)
+        cgroup = Cgroup(self.directory)
+        self.assertEqual(
+            cgroup.cpu_throttling(),
+            {"periods": 100, "throttled_periods": 25, "throttled_seconds": 1.5},
+        )
+        os.remove(os.path.join(self.directory, "memory.current"))
+        # the CPU controller is enough
+        self.assertTrue(cgroup.available)
+        write_cgroup(self.directory, cpu_stat="usage_usec 5000000\n")
+        self.assertEqual(cgroup.cpu_throttling(), {})
+
+    def test_sustained_cpu_pressure(self):
+        write_cgroup(self.directory, cpu_pressure=pressure(80.0))
+        monitor = CgroupMonitor(Cgroup(self.directory))
+        policy = PressurePolicy(monitor, "cpu", 50.0, window="1m")
+        monitor.policies.append(policy)
+        # the short spike does not shed load, as the minute average is low
+        monitor.check()
+        self.assertIsNone(monitor.shedding())
+        write_cgroup(
+            self.directory,
+            cpu_pressure="some avg10=80.00 avg60=60.00 avg300=10.00 total=1000\n",
+        )
+        with self.assertLogs("hurricane.server", "WARNING") as logs:
+            monitor.check()
+        self.assertEqual(monitor.shedding(), "cpu pressure")
+        self.assertIn("cpu pressure 60.000 >= 50", logs.output[0])
+        self.assertEqual(monitor.cpu_throttling["throttled_periods"], 25)
+
+    def test_recycle_cgroup(self):
+        write_cgroup(self.directory, memory_current=f"{400 * MB}\n")
+        monitor = CgroupMonitor(Cgroup(self.directory), max_memory_fraction=0.5)
+        monitor.recycled = True
+        # trimming the heap releases enough memory
+        trimmer = mock.Mock(trim=lambda: write_cgroup(self.directory))
+        cgroup_module.CGROUP_MONITOR = monitor
+        loop = asyncio.new_event_loop()
+        try:
+            with mock.patch(
+                "hurricane.server.get_malloc_trimmer", return_value=trimmer
+            ), mock.patch("hurricane.server._reload") as reload:
+                loop.run_until_complete(recycle_cgroup("working set"))
+                reload.assert_not_called()
+                self.assertFalse(monitor.recycled)
+                write_cgroup(self.directory, memory_current=f"{400 * MB}\n")
+                trimmer.trim = lambda: None
+                with self.assertLogs("hurricane.server", "WARNING") as logs:
+                    loop.run_until_complete(recycle_cgroup("working set"))
+                reload.assert_called_once()
+                self.assertIn(
+                    "Recycling the process: working set 300MB exceeds 0.5",
+                    logs.output[0],
+                )
+        finally:
+            loop.close()
+            cgroup_module.CGROUP_MONITOR = None
+
+    def test_make_cgroup_monitor(self):
+        write_cgroup(self.directory)
+        # without a threshold or cgroup root, the cgroup is not monitored
+        self.assertIsNone(make_cgroup_monitor({"no_metrics": False}))
+        self.assertIsNone(
+            make_cgroup_monitor(
+                {"cgroup_root": os.path.join(self.directory, "missing")}
+            )
+        )
+        try:
+            with self.assertLogs("hurricane.server", "INFO"):
+                monitor = make_cgroup_monitor(
+                    {
+                        "cgroup_root": self.directory,
+                        "memory_pressure_shed": "20",
+                        "io_pressure_shed": 30,
+                        "readiness_window": "5m",
+                    }
+                )
+            self.assertEqual(monitor.memory["limit"], 512 * MB)
+            self.assertEqual(
+                [(policy.name, policy.window) for policy in monitor.policies],
+                [("memory pressure", "10s"), ("io pressure", "5m")],
+            )
+            self.assertIs(make_cgroup_monitor({}), monitor)
+            self.assertEqual(CgroupMemoryMetric.get()["working_set"], 200 * MB)
+            self.assertEqual(CgroupPressureMetric.get()["cpu"]["some"]["avg10"], 0.0)
+            self.assertEqual(CgroupCPUThrottlingMetric.get()["periods"], 100)
+        finally:
+            monitor.stop()
+            cgroup_module.CGROUP_MONITOR = None
+
+
+class CPUAllocationTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_cpu_quota(self):
+        cgroup = Cgroup(self.directory)
+        self.assertIsNone(cgroup.cpu_quota())
+        self.write("cpu/cpu.cfs_quota_us", "-1\n")
+        self.write("cpu/cpu.cfs_period_us", "100000\n")
+        self.assertIsNone(cgroup.cpu_quota())
+        self.write("cpu/cpu.cfs_quota_us", "50000\n")
+        self.assertEqual(cgroup.cpu_quota(), 0.5)
+        # cgroup v2 takes precedence
+        self.write("cpu.max", "max 100000\n")
+        self.assertIsNone(cgroup.cpu_quota())
+        self.write("cpu.max", "150000 100000\n")
+        self.assertEqual(cgroup.cpu_quota(), 1.5)
+
+    def test_cpu_allocation(self):
+        self.write("cpu.max", "150000 100000\n")
+        allocation = cpu_allocation(self.directory)
+        self.assertEqual(allocation.quota, 1.5)
+        self.assertEqual(allocation.affinity, len(os.sched_getaffinity(0)))
+        self.assertEqual(allocation.effective, min(1.5, allocation.affinity))
+        self.write("cpu.max", "max 100000\n")
+        self.assertEqual(
+            cpu_allocation(self.directory).effective, len(os.sched_getaffinity(0))
+        )
+
+    def test_command_group_pool_uses_cgroup_root(self):
+        self.write("cpu.max", "100000 100000\n")
+        pools = []
+
+        def process_pool(max_workers, mp_context):
+            pools.append(max_workers)
+            return ThreadPoolExecutor(max_workers)
+
+        # the quota of the given cgroup limits the pool, not the CPUs of the host
+        for root in (self.directory, os.path.join(self.directory, "missing")):
+            with mock.patch(
+                "os.sched_getaffinity", return_value={0, 1, 2, 3}
+            ), mock.patch(
+                "concurrent.futures.ProcessPoolExecutor", side_effect=process_pool
+            ), mock.patch(
+                "hurricane.server.run_management_command", return_value=0.1
+            ), self.assertLogs(
+                "hurricane.server", "INFO"
+            ):
+                command_task([["check", "makemigrations"]], cgroup_root=root)
+        self.assertEqual(pools, [1, 2])
+
+    def test_default_workers(self):
+        self.assertEqual(default_workers(0.5), 5)
+        self.assertEqual(default_workers(2), 6)
+        self.assertEqual(default_workers(1.5), 6)
+        self.assertEqual(default_workers(64), 32)
+
+    def test_configure_workers(self):
+        self.write("cpu.max", "50000 100000\n")
+        options = {"cgroup_root": self.directory, "workers": None}
+        with self.assertLogs("hurricane.server", "INFO") as logs:
+            configure_workers(options)
+        self.assertEqual(options["workers"], 5)
+        self.assertIn(
+            "Using 5 executor workers; 0.5 effective CPUs (quota: 0.5", logs.output[0]
+        )
+        self.assertEqual(ExecutorWorkersMetric.get(), 5)
+        self.assertEqual(CPUCountMetric.get()["effective"], 0.5)
+        options = {"cgroup_root": self.directory, "workers": 12}
+        with self.assertLogs("hurricane.server", "INFO") as logs:
+            configure_workers(options)
+        self.assertEqual(options["workers"], 12)
+        self.assertIn("Using 12 executor workers (configured)", logs.output[0])
+
+
+class CgroupServerTest(HurricanServerTest):
+    alive_route = "/alive"
+    ready_route = "/ready"
+
+    @classmethod
+    def setUpClass(cls):
+        write_cgroup(CGROUP_ROOT, memory_pressure=pressure(50.0))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CGROUP_ROOT, ignore_errors=True)
+
+    @HurricanServerTest.cycle_server(
+        args=["--cgroup-root", CGROUP_ROOT, "--memory-pressure-shed", "20"]
+    )
+    def test_memory_pressure_shedding(self):
+        # the monitor reads the cgroup every second
+        time.sleep(1.5)
+        res = self.app_client.get("/")
+        self.assertEqual(res.status, 503)
+        self.assertEqual(res.text, "overloaded: memory pressure")
+        res = self.probe_client.get(self.ready_route)
+        self.assertEqual(res.status, 400)
+        self.assertIn("memory pressure 50.000 >= 20", res.text)
+        write_cgroup(CGROUP_ROOT, memory_pressure=pressure(1.0))
+        time.sleep(1.5)
+        self.assertEqual(self.app_client.get("/").status, 200)
+        res = self.probe_client.get("/metrics")
+        self.assertIn('shed_requests_total{reason="memory pressure"} 1.0', res.text)
+        self.assertIn('cgroup_memory_bytes{kind="limit"} 5.36870912e+08', res.text)
+        self.assertIn(
+            'cgroup_pressure{kind="some",resource="memory",window="10s"} 1.0', res.text
+        )
+        self.assertIn('cgroup_cpu_throttling{stat="throttled_seconds"} 1.5', res.text)
+        self.assertIn('cpu_count{source="effective"}', res.text)
+        self.assertIn("executor_workers ", res.text)
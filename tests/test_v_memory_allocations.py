@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 from time import sleep
 
 from hurricane.server.loggers import STRUCTLOG_ENABLED
@@ -38,6 +41,53 @@ class HurricanMemoryAllocationTests(HurricanServerTest):
         else:
             raise AssertionError("No reload detected within 60 seconds")
 
+    @HurricanServerTest.cycle_server(
+        args=[
+            "--max-memory",
+            "200",
+            "--tracemalloc-frames",
+            "1",
+            "--memory-snapshot-dir",
+            os.path.join(tempfile.gettempdir(), "hurricane-snapshots"),
+        ]
+    )
+    def test_snapshot_on_max_memory(self):
+        directory = os.path.join(tempfile.gettempdir(), "hurricane-snapshots")
+        for _ in range(60):
+            try:
+                self.app_client.get("/memory")
+            except (ConnectionRefusedError, ConnectionResetError):
+                # the process is reloading
+                sleep(0.5)
+            out, _ = self.driver.get_output(read_all=True)
+            if "Memory snapshot written" in out:
+                break
+            sleep(1)
+        else:
+            raise AssertionError("No memory snapshot written within 60 seconds")
+        self.assertTrue(os.listdir(directory))
+        shutil.rmtree(directory)
+
+    @HurricanServerTest.cycle_server(args=["--max-memory", "200", "--malloc-trim"])
+    def test_trim_before_reload(self):
+        for _ in range(60):
+            try:
+                self.app_client.get("/memory")
+            except (ConnectionRefusedError, ConnectionResetError):
+                # the process is reloading
+                sleep(0.5)
+            out, _ = self.driver.get_output(read_all=True)
+            if "Memory (rss) usage is too high. Restarting" in out:
+                break
+            sleep(1)
+        else:
+            raise AssertionError("No reload detected within 60 seconds")
+        # the memory of the test application leaks, so it is still too high after trimming the heap
+        self.assertIn("Heap trimmed", out)
+        self.assertLess(
+            out.index("Heap trimmed"), out.index("Memory (rss) usage is too high")
+        )
+
     @HurricanServerTest.cycle_server
     def test_no_reload(self):
         for _ in range(10):
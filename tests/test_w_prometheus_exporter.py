@@ -1,3 +1,6 @@
+import time
+
+import requests
 from prometheus_client.parser import text_string_to_metric_families
 
 from hurricane.testing.testcases import HurricanServerTest
@@ -64,7 +67,7 @@ class HurricanStartServerTests(HurricanServerTest):
     def test_export_families_len(self):
         res = self.probe_client.get(self.metrics_route)
         families = list(text_string_to_metric_families(res.text))
-        self.assertEqual(len(families), 20)
+        self.assertEqual(len(families), 53)
 
     @HurricanServerTest.cycle_server()
     def test_exporter_request(self):
@@ -148,3 +151,193 @@ class HurricanStartServerTests(HurricanServerTest):
                 self.assertEqual(family.samples[0].labels["server_port"], "8010")
                 self.assertEqual(family.samples[0].labels["serve_static"], "true")
                 self.assertEqual(family.samples[0].labels["serve_media"], "true")
+
+    @HurricanServerTest.cycle_server(
+        env={"DJANGO_SETTINGS_MODULE": "tests.testapp.settings_commands"}
+    )
+    def test_exporter_hurricane_commands(self):
+        for _ in range(30):
+            res = self.probe_client.get("/startup")
+            if res.status == 200:
+                break
+            time.sleep(0.5)
+        res = self.probe_client.get(self.metrics_route)
+        families = text_string_to_metric_families(res.text)
+        commands = None
+        for family in families:
+            if family.name == "hurricane_info":
+                commands = family.samples[0].labels["commands"]
+        self.assertEqual(commands, "makemigrations,check,check")
+
+    @HurricanServerTest.cycle_server(args=["--command", "makemigrations"])
+    def test_exporter_startup_phases(self):
+        out, err = self.driver.get_output(read_all=True)
+        self.assertIn("Startup profile", out)
+        res = self.probe_client.get(self.metrics_route)
+        families = text_string_to_metric_families(res.text)
+        phases = {}
+        for family in families:
+            if family.name == "startup_phase_seconds":
+                phases = {s.labels["phase"]: s.value for s in family.samples}
+        for phase in ("command:makemigrations", "commands", "listen", "total"):
+            self.assertIn(phase, phases)
+        self.assertGreaterEqual(phases["commands"], phases["command:makemigrations"])
+        # the overall startup time includes all phases, the bootstrap as well
+        for phase in ("bootstrap", "commands", "listen"):
+            self.assertGreaterEqual(phases["total"], phases[phase])
+
+    @HurricanServerTest.cycle_server()
+    def test_exporter_openmetrics(self):
+        response = requests.get(
+            "http://localhost:8001/metrics",
+            headers={"Accept": "application/openmetrics-text; version=1.0.0"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response.headers["Content-Type"].startswith("application/openmetrics-text")
+        )
+        self.assertTrue(response.text.endswith("# EOF\n"))
+        response = requests.get("http://localhost:8001/metrics")
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+
+    @HurricanServerTest.cycle_server()
+    def test_exporter_gzip(self):
+        response = requests.get(
+            "http://localhost:8001/metrics", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        families = list(text_string_to_metric_families(response.text))
+        self.assertEqual(len(families), 53)
+        response = requests.get(
+            "http://localhost:8001/metrics", headers={"Accept-Encoding": "identity"}
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    @HurricanServerTest.cycle_server()
+    def test_exporter_restricted_names(self):
+        response = requests.get(
+            "http://localhost:8001/metrics?name[]=request_counter_total"
+        )
+        families = list(text_string_to_metric_families(response.text))
+        self.assertEqual([family.name for family in families], ["request_counter"])
+
+    @HurricanServerTest.cycle_server(args=["--metrics-cache-ttl", "60"])
+    def test_exporter_cache_ttl(self):
+        res = self.probe_client.get(self.metrics_route)
+        self.app_client.get("/")
+        self.assertEqual(self.probe_client.get(self.metrics_route).text, res.text)
+
+    def _path_requests(self):
+        res = self.probe_client.get(self.metrics_route)
+        for family in text_string_to_metric_families(res.text):
+            if family.name == "path_requests":
+                return {
+                    (s.labels["method"], s.labels["path"]): s.value
+                    for s in family.samples
+                    if s.name == "path_requests_total"
+                }
+        return {}
+
+    @HurricanServerTest.cycle_server()
+    def test_exporter_path_requests_route_labels(self):
+        self.app_client.get("/items/1")
+        self.app_client.get("/items/2")
+        self.app_client.get("/does/not/exist")
+        path_requests = self._path_requests()
+        self.assertEqual(path_requests[("GET", "/items/<int:pk>")], 2)
+        self.assertEqual(path_requests[("GET", "unmatched")], 1)
+        self.assertNotIn(("GET", "/items/1"), path_requests)
+
+    @HurricanServerTest.cycle_server(
+        env={"DJANGO_SETTINGS_MODULE": "tests.testapp.settings_metrics_paths"}
+    )
+    def test_exporter_path_requests_limit(self):
+        self.app_client.get("/items/1")
+        self.app_client.get("/")
+        self.app_client.get("/heavy")
+        self.app_client.get("/medium")
+        path_requests = self._path_requests()
+        self.assertEqual(path_requests[("GET", "item")], 1)
+        self.assertEqual(path_requests[("overflow", "overflow")], 2)
+        self.assertEqual(len(path_requests), 3)
+
+    def _route_histogram(self, name):
+        res = self.probe_client.get(self.metrics_route)
+        for family in text_string_to_metric_families(res.text):
+            if family.name == name:
+                return family.samples
+        return []
+
+    @HurricanServerTest.cycle_server()
+    def test_exporter_route_histograms(self):
+        self.app_client.get("/items/1")
+        self.app_client.get("/does/not/exist")
+        samples = self._route_histogram("route_response_time_seconds")
+        counts = {
+            (s.labels["route"], s.labels["status"]): s.value
+            for s in samples
+            if s.name == "route_response_time_seconds_count"
+        }
+        self.assertEqual(
+            counts, {("/items/<int:pk>", "2xx"): 1, ("unmatched", "4xx"): 1}
+        )
+        self.assertIn(
+            "0.0025",
+            {s.labels["le"] for s in samples if s.name.endswith("_bucket")},
+        )
+        samples = self._route_histogram("route_response_size_bytes")
+        sizes = {
+            s.labels["route"]: s.value
+            for s in samples
+            if s.name == "route_response_size_bytes_sum"
+        }
+        self.assertEqual(sizes["/items/<int:pk>"], len("Item 1"))
+
+    @HurricanServerTest.cycle_server(
+        env={"DJANGO_SETTINGS_MODULE": "tests.testapp.settings_metrics_routes"}
+    )
+    def test_exporter_route_histograms_settings(self):
+        self.app_client.get("/items/1")
+        samples = self._route_histogram("route_response_time_seconds")
+        buckets = [s.labels["le"] for s in samples if s.name.endswith("_bucket")]
+        self.assertEqual(buckets, ["0.001", "0.01", "0.5", "+Inf"])
+        self.assertEqual(samples[0].labels["method"], "GET")
+
+    @HurricanServerTest.cycle_server()
+    def test_exporter_windowed_quantiles(self):
+        self.app_client.get("/")
+        samples = self._route_histogram("response_time_window_seconds")
+        self.assertIn(
+            ("1m", "0.99"),
+            {(s.labels["window"], s.labels["quantile"]) for s in samples},
+        )
+        rates = {
+            s.labels["window"]: s.value for s in self._route_histogram("request_rate")
+        }
+        self.assertEqual(set(rates), {"10s", "1m", "5m"})
+        self.assertGreater(rates["10s"], 0)
+        res = self.probe_client.get("/alive")
+        self.assertIn(" 1m: p50 ", res.text)
+
+    @HurricanServerTest.cycle_server()
+    def test_exporter_request_phases(self):
+        requests.get(
+            "http://localhost:8000/",
+            headers={"X-Request-Start": f"t={int((time.time() - 0.5) * 1e6)}"},
+        )
+        samples = self._route_histogram("request_phase_seconds")
+        counts = {
+            s.labels["phase"]: s.value
+            for s in samples
+            if s.name == "request_phase_seconds_count"
+        }
+        self.assertEqual(
+            counts, {"queue": 1, "dispatch": 1, "executor": 1, "app": 1, "write": 1}
+        )
+        queue_time = [
+            s.value
+            for s in samples
+            if s.name == "request_phase_seconds_sum" and s.labels["phase"] == "queue"
+        ]
+        self.assertGreaterEqual(queue_time[0], 0.5)
@@ -0,0 +1,3 @@
+from .settings import *
+
+COMMAND = [["makemigrations", "check"], "check"]
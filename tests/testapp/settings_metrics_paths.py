@@ -0,0 +1,4 @@
+from .settings import *
+
+METRICS_PATH_LABEL = "name"
+METRICS_PATH_LIMIT = 2
@@ -0,0 +1,4 @@
+from .settings import *
+
+METRICS_BUCKETS = [0.5, 0.001, 0.01]
+METRICS_ROUTE_METHODS = True
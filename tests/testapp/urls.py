@@ -1,4 +1,5 @@
 import ctypes
+import time
 
 from django.conf import settings
 from django.conf.urls.static import static
@@ -10,6 +11,21 @@ def test_view(request):
     return HttpResponse("Hello world!", status=200)
 
 
+def item_view(request, pk):
+    return HttpResponse(f"Item {pk}", status=200)
+
+
+def server_timing_view(request):
+    response = HttpResponse("Timed", status=200)
+    response["Server-Timing"] = "cache;desc=hit;dur=1"
+    return response
+
+
+def slow_view(request):
+    time.sleep(min(5.0, float(request.GET.get("seconds", 0.5))))
+    return HttpResponse("Slow", status=200)
+
+
 def medium_view(request):
     from django.contrib.contenttypes.models import ContentType
 
@@ -62,6 +78,9 @@ urlpatterns = [
     path("heavy", heavy_view),
     path("memory", memory_leak_view),
     path("upload", upload_file),
+    path("items/<int:pk>", item_view, name="item"),
+    path("timing", server_timing_view),
+    path("slow", slow_view),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)